@@ -1,25 +1,321 @@
-from flask import Flask, request, jsonify
+import json, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from urllib.parse import quote
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
-import requests
+import batch, m3u8, segments, upstream
+from cache import ResponseCache
+from limiter import Rejected, limiter
+from metrics import error_status, metrics, stat_gauges
+from revocations import Revocations
+from segments import Playlists, SegmentStore, byte_range
+from singleflight import PUMP_WORKERS, SingleFlight, can_resume, request_key, resume_headers, resume_skip
 
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+CORS(app, resources={
+    r"/api/*": {"origins": "*"},
+    r"/m3u8-proxy": {"origins": "*", "expose_headers": ["Content-Length", "Content-Range", "Accept-Ranges"]},
+})
+
+CHUNK_SIZE = 64 * 1024
+PASSTHROUGH_HEADERS = ('Content-Type', 'Content-Length', 'Content-Encoding')
+SEGMENT_HEADERS = PASSTHROUGH_HEADERS + ('Content-Range', 'Accept-Ranges')
+
+cache = ResponseCache.from_env()
+flights = SingleFlight(replay_bytes=cache.max_entry_bytes)
+pump_pool = ThreadPoolExecutor(max_workers=PUMP_WORKERS)
+revocations = Revocations.from_env()
+batch_pool = ThreadPoolExecutor(max_workers=batch.WORKERS)
+batch_hosts = batch.HostSemaphores(batch.PER_HOST, threading.BoundedSemaphore)
+segment_store = SegmentStore.from_env()
+playlists = Playlists()
+prefetch_pool = ThreadPoolExecutor(max_workers=segments.PREFETCH_WORKERS)
+
+def passthrough(resp, names=PASSTHROUGH_HEADERS):
+    return {name: resp.headers[name] for name in names if name in resp.headers}
+
+def stream_response(resp, names=PASSTHROUGH_HEADERS, chunks=None, extra=None):
+    headers = passthrough(resp, names)
+    headers.update(extra or {})
+
+    # raw.stream keeps the upstream encoding intact so Content-Encoding/Content-Length stay truthful
+    def generate():
+        try:
+            for chunk in chunks or upstream.metered(resp, resp.raw.stream(CHUNK_SIZE, decode_content=False)): yield chunk
+        finally: resp.close()
+
+    return Response(generate(), status=resp.status_code, headers=headers)
+
+def playlist_response(resp, chunks, encoded_headers, headers=None):
+    # a media playlist read to the end is indexed for segment prefetching
+    def generate():
+        scan = m3u8.PlaylistScan(resp.url)
+        try:
+            yield from m3u8.rewrite_chunks(chunks, resp.url, encoded_headers, scan)
+            prefetch(playlists.served(resp.url, headers, scan))
+        finally: resp.close()
+
+    return Response(generate(), status=resp.status_code, mimetype=m3u8.PLAYLIST_TYPE)
+
+def refresh(key, ttl, url, headers):
+    try:
+        resp = upstream.fetch('GET', url, headers=headers, stream=True)
+        with resp:
+            body = b''.join(upstream.metered(resp, resp.raw.stream(CHUNK_SIZE, decode_content=False)))
+            if resp.status_code == 200: cache.put(key, ttl, resp.status_code, passthrough(resp), body)
+    except Exception as e: print(f"Cache refresh failed for {url}: {e}")
+    finally: cache.end_refresh(key)
+
+def pump(key, flight_key, flight, ttl, url, headers):
+    try:
+        resp = upstream.fetch('GET', url, headers=headers, stream=True)
+        with resp:
+            status, names = resp.status_code, passthrough(resp)
+            flight.start(status, names)
+            raw = upstream.metered(resp, resp.raw.stream(CHUNK_SIZE, decode_content=False))
+            for chunk in cache.tee(key, ttl, status, names, raw) if ttl and status == 200 else raw:
+                if not flight.append(chunk): break  # every reader left
+        flight.finish()
+    except Exception as e: flight.finish(e)
+    finally: flights.forget(flight_key, flight)
+
+def resumed(url, headers, status, offset):
+    # the rest of a body for a reader the flight left behind, fetched on its own from byte offset
+    resp = upstream.fetch('GET', url, headers=resume_headers(headers, status, offset), stream=True)
+    with resp:
+        skip = resume_skip(status, resp.status_code, offset)
+        for chunk in upstream.metered(resp, resp.raw.stream(CHUNK_SIZE, decode_content=False)):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk[skip:]
+            skip = 0
+
+def shared_fetch(url, headers, ttl):
+    # -> (status, headers, chunks) from the cache or from a coalesced upstream fetch
+    key = cache.key(url, headers)
+    if ttl:
+        entry, state = cache.lookup(key)
+        if entry:
+            if state == 'stale' and cache.begin_refresh(key): threading.Thread(target=refresh, args=(key, ttl, url, headers), daemon=True).start()
+            return entry.status, dict(entry.headers, **{'X-Cache': 'HIT' if state == 'fresh' else 'STALE'}), [entry.body]
+
+    # identical concurrent GETs ride on one upstream fetch; the pump runs on a pool thread
+    # so the first client disconnecting doesn't cut the body off for everyone else
+    flight_key = request_key(url, headers)
+    resume = (lambda status, offset: resumed(url, headers, status, offset)) if can_resume(headers) else None
+    reader, leader = flights.join(flight_key, resume)
+    if leader: pump_pool.submit(pump, key, flight_key, reader.flight, ttl, url, headers)
+
+    try: status, names = reader.flight.wait_started()
+    except Exception:
+        reader.close()
+        raise
+    return status, dict(names, **({'X-Cache': 'MISS'} if ttl else {})), reader
+
+def shared_get(url, headers, ttl):
+    status, names, chunks = shared_fetch(url, headers, ttl)
+    response = Response(chunks, status=status, headers=names)
+    # a client that goes away stops reading the flight, so the fetch ends once nobody is left
+    if hasattr(chunks, 'close'): response.call_on_close(chunks.close)
+    return response
+
+def batch_fetch(item):
+    url, headers = item['url'], item.get('headers', {})
+    with batch_hosts.get(url):
+        if item.get('method', '').upper() == 'GET':
+            status, names, chunks = shared_fetch(url, headers, cache.ttl_for(url))
+            return status, names, b''.join(chunks)
+
+        resp = upstream.fetch('POST', url, data=item.get('form_data', {}), headers=headers)
+        return resp.status_code, passthrough(resp, ('Content-Type',)), resp.content
+
+def prefetch(items):
+    for url, headers in items:
+        key = segment_store.key(url)
+        if segment_store.claim(key, prefetch=True): prefetch_pool.submit(prefetch_segment, key, url, headers)
+
+def prefetch_segment(key, url, headers):
+    try:
+        resp = upstream.fetch('GET', url, headers=headers, stream=True)
+        with resp:
+            if resp.status_code != 200: return
+            for _ in segment_store.tee(key, resp.headers, upstream.metered(resp, resp.raw.stream(CHUNK_SIZE, decode_content=False))): pass
+    except Exception as e: print(f"Segment prefetch failed for {url}: {e}")
+    finally: segment_store.release(key)
+
+def cached_segment(key):
+    # a segment being prefetched is worth waiting for rather than fetching again
+    segment = segment_store.get(key)
+    if segment is None:
+        waiter = segment_store.waiter(key)
+        if waiter is not None and waiter.wait(segments.PREFETCH_WAIT): segment = segment_store.get(key)
+    return segment
+
+def segment_response(segment):
+    headers = {'X-Cache': 'HIT'}
+    if segment.path:
+        # a file body lets the WSGI server's file_wrapper use sendfile; ranges are handled by send_file
+        resp = send_file(segment.path, mimetype=segment.headers.get('Content-Type', 'video/mp2t'), conditional=True, etag=False, max_age=None)
+        resp.headers.pop('Content-Disposition', None)
+        resp.headers.pop('Last-Modified', None)
+        resp.headers.update(headers)
+        if 'Content-Encoding' in segment.headers: resp.headers['Content-Encoding'] = segment.headers['Content-Encoding']
+        return resp
+
+    headers.update(segment.headers, **{'Accept-Ranges': 'bytes'})
+    span = byte_range(request.headers.get('Range'), segment.size)
+    if span is None: return Response(segment.body, status=200, headers=headers)
+    start, end = span
+    headers['Content-Range'] = f'bytes {start}-{end}/{segment.size}'
+    return Response(segment.body[start:end + 1], status=206, headers=headers)
+
+def failure(message, status):
+    return jsonify({'error': message}), status
+
+def upstream_failure(e):
+    # 502/504 when the upstream fetch broke, 429/503 when the limiter turned it away, 500 for our own bugs
+    if isinstance(e, Rejected): return failure(str(e), e.status) + ({'Retry-After': str(max(round(e.retry_after), 1))},)
+    return failure(str(e), error_status(e))
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    # streamed bodies finish long after this hook, so the request is recorded when the body is closed
+    # file responses stay untouched so the server can sendfile them; their length is the byte count
+    if response.direct_passthrough: sent = [response.content_length or 0]
+    else: sent = [0 if response.is_streamed else len(response.get_data())]
+    if response.is_streamed and not response.direct_passthrough:
+        body = response.response
+        def counted():
+            for chunk in body:
+                sent[0] += len(chunk)
+                yield chunk
+        response.response = counted()
+
+    route, status, started = request.path, response.status_code, g.get('started', time.perf_counter())
+    url, cache_state = g.get('upstream_url'), response.headers.get('X-Cache')
+    response.call_on_close(lambda: metrics.request(route, status, time.perf_counter() - started, sent[0], url, cache_state))
+    return response
+
+def parse_headers(raw):
+    try: headers = json.loads(raw) if raw else {}
+    except ValueError: headers = {}
+    return headers if isinstance(headers, dict) else {}
 
 @app.route('/proxy', methods=['POST'])
 def proxy():
     try:
-        data = request.get_json()
-        url = data.get('url')
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict): return failure('JSON body is required', 400)
+        url = g.upstream_url = data.get('url')
         method = data.get('method', '').upper()
         headers = data.get('headers', {})
-        
-        if not url: return jsonify({'error': 'URL is required'})
-        if method not in ['GET', 'POST']: return jsonify({'error': 'Only GET and POST methods are allowed'})
-
-        if method == 'GET': return requests.get(url, headers=headers).content
-        else: form_data = data.get('form_data', {}); return requests.post(url, data=form_data, headers=headers).content
-            
-    except Exception as e: return jsonify({'error': str(e)})
+        stream = data.get('stream', True)
+
+        if not url: return failure('URL is required', 400)
+        if method not in ['GET', 'POST']: return failure('Only GET and POST methods are allowed', 405)
+
+        if method == 'GET': return shared_get(url, headers, cache.ttl_for(url))
+
+        resp = upstream.fetch('POST', url, data=data.get('form_data', {}), headers=headers, stream=stream)
+
+        if stream: return stream_response(resp)
+        return resp.content
+
+    except Exception as e: return upstream_failure(e)
+
+@app.route('/proxy/batch', methods=['POST'])
+def proxy_batch():
+    try:
+        data = request.get_json(silent=True)
+        items, error = batch.parse_items(data)
+        if error: return failure(error, 400)
+
+        writer = batch.Writer(data.get('format', 'json') if isinstance(data, dict) else 'json')
+        futures = {}
+        for index, item in enumerate(items):
+            if not batch.item_error(item): futures[batch_pool.submit(batch_fetch, item)] = index
+
+        # results go out in completion order; invalid items are answered straight away
+        def generate():
+            yield writer.start()
+            for index, item in enumerate(items):
+                error = batch.item_error(item)
+                if error: yield writer.part(index, item, error=error)
+
+            for future in as_completed(futures):
+                index = futures[future]
+                try: yield writer.part(index, items[index], *future.result())
+                except Exception as e: yield writer.part(index, items[index], error=str(e))
+            yield writer.end()
+
+        return Response(generate(), mimetype=writer.content_type)
+
+    except Exception as e: return upstream_failure(e)
+
+@app.route('/m3u8-proxy', methods=['GET'])
+def m3u8_proxy():
+    try:
+        url = g.upstream_url = request.args.get('url')
+        raw_headers = request.args.get('headers', '')
+        if not url: return failure('URL is required', 400)
+
+        upstream_headers = parse_headers(raw_headers)
+        headers = dict(upstream_headers)
+        for name in ('Range', 'If-Range'):
+            if name in request.headers: headers[name] = request.headers[name]
+
+        # segments of playlists served earlier: move the prefetch window along, then try the shared cache
+        key = segment_store.key(url)
+        known = playlists.known(url)
+        if known: prefetch(playlists.upcoming(url))
+        segment = cached_segment(key)
+        if segment is not None:
+            try: return segment_response(segment)
+            except FileNotFoundError: pass  # evicted between lookup and open
+
+        resp = upstream.fetch('GET', url, headers=headers, stream=True)
+        if revocations: revocations.record(url, resp.status_code)
+
+        # sniff the first chunk only when it is plain text; compressed bodies rely on type/extension
+        encoded = 'Content-Encoding' in resp.headers
+        raw = upstream.metered(resp, resp.raw.stream(CHUNK_SIZE, decode_content=False))
+        head = b'' if encoded else next(raw, b'')
+
+        if resp.ok and m3u8.is_playlist(resp.url, resp.headers.get('Content-Type'), head):
+            chunks = upstream.metered(resp, resp.iter_content(CHUNK_SIZE)) if encoded else chain([head], raw)
+            return playlist_response(resp, chunks, quote(raw_headers, safe=''), upstream_headers)
+
+        chunks = chain([head], raw)
+        # a whole segment nobody else is fetching is kept for the next viewer
+        if not (known and resp.status_code == 200 and 'Range' not in headers and segment_store.claim(key)): return stream_response(resp, SEGMENT_HEADERS, chunks)
+        # released when the response is closed, which also happens when the body was never started
+        response = stream_response(resp, SEGMENT_HEADERS, segment_store.tee(key, resp.headers, chunks))
+        response.call_on_close(lambda: segment_store.release(key))
+        return response
+
+    except Exception as e: return upstream_failure(e)
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    body = {'pool': upstream.pool_stats(), 'cache': cache.stats(), 'singleflight': flights.stats(), 'hosts': limiter.stats(),
+            'segments': dict(segment_store.stats(), **playlists.stats())}
+    if revocations: body['revocations'] = revocations.stats()
+    return jsonify(body)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    gauges = stat_gauges(upstream.pool_stats(), cache.stats(), flights.stats(), limiter.stats(), dict(segment_store.stats(), **playlists.stats()))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/slow', methods=['GET'])
+def slow_requests():
+    return jsonify(metrics.slow_requests())
 
 if __name__ == '__main__':
     app.run(debug=False, port=5001, host='0.0.0.0')
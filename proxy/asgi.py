@@ -0,0 +1,426 @@
+import asyncio, json, os, time
+from contextlib import asynccontextmanager
+from urllib.parse import quote, urlsplit
+import httpx
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask, BackgroundTasks
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+import batch, m3u8, segments
+from cache import ResponseCache
+from limiter import Rejected, limiter
+from metrics import error_status, host_of, metrics, stat_gauges
+from revocations import REVOKE_STATUSES, Revocations
+from segments import Playlists, SegmentStore, byte_range
+from singleflight import AsyncFlight, SingleFlight, can_resume, request_key, resume_headers, resume_skip
+from upstream import DEFAULT_POOL_SIZE, HOST_POOL_SIZES
+
+# Same /proxy contract as app.py, served from one event loop: uvicorn asgi:app --workers N
+MAX_CONNECTIONS = int(os.environ.get('PROXY_MAX_CONNECTIONS', 4096))
+TIMEOUT = httpx.Timeout(float(os.environ.get('PROXY_TIMEOUT', 60)), connect=10.0)
+CHUNK_SIZE = 64 * 1024
+PASSTHROUGH_HEADERS = ('Content-Type', 'Content-Length', 'Content-Encoding')
+SEGMENT_HEADERS = PASSTHROUGH_HEADERS + ('Content-Range', 'Accept-Ranges')
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Range',
+    'Access-Control-Expose-Headers': 'Content-Length, Content-Range, Accept-Ranges',
+}
+
+clients = {}
+requests_per_host = {}
+connections_per_host = {}
+cache = ResponseCache.from_env()
+flights = SingleFlight(AsyncFlight, cache.max_entry_bytes)
+revocations = Revocations.from_env()
+tasks = set()
+batch_slots = asyncio.Semaphore(batch.WORKERS)
+batch_hosts = batch.HostSemaphores(batch.PER_HOST, asyncio.Semaphore)
+segment_store = SegmentStore.from_env(asyncio.Event)
+playlists = Playlists()
+prefetch_slots = asyncio.Semaphore(segments.PREFETCH_WORKERS)
+
+def client_for(url):
+    host = (urlsplit(url).hostname or '').lower()
+    requests_per_host[host] = requests_per_host.get(host, 0) + 1
+
+    # hosts listed in PROXY_POOL_HOSTS get a dedicated client, everything else shares the default one
+    key = host if host in HOST_POOL_SIZES else None
+    client = clients.get(key)
+    if client is None:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=HOST_POOL_SIZES.get(key, DEFAULT_POOL_SIZE))
+        client = clients[key] = httpx.AsyncClient(http2=True, limits=limits, timeout=TIMEOUT, follow_redirects=True)
+    return client
+
+def tracer(host, started):
+    # httpcore reports connect/TLS/header phases through the "trace" extension
+    marks = {}
+    async def trace(event, info):
+        name, _, phase = event.rpartition('.')
+        now = time.perf_counter()
+        if phase == 'started': marks[name] = now
+        elif phase != 'complete': return
+        elif name == 'connection.connect_tcp':
+            # every request that didn't open a socket of its own went out on a pooled connection
+            connections_per_host[host] = connections_per_host.get(host, 0) + 1
+            metrics.timing('connect', host, now - marks.get(name, now))
+        elif name == 'connection.start_tls': metrics.timing('tls', host, now - marks.get(name, now))
+        elif name.endswith('.receive_response_headers'): metrics.timing('ttfb', host, now - started)
+    return trace
+
+def pool_stats():
+    # the same shape as upstream.pool_stats(): misses opened a new connection, hits reused one
+    stats = {}
+    for host, count in requests_per_host.items():
+        opened = connections_per_host.get(host, 0)
+        size = HOST_POOL_SIZES.get(host, DEFAULT_POOL_SIZE)
+        stats[host] = {'requests': count, 'hits': max(count - opened, 0), 'misses': opened, 'maxsize': size}
+    return stats
+
+async def fetch(method, url, stream=True, **kwargs):
+    # every upstream request goes through here so it is traced and counted; streamed bodies go through metered()
+    host = host_of(url)
+    await limiter.acquire(url)
+    started = time.perf_counter()
+    client = client_for(url)
+    upstream_request = client.build_request(method, url, extensions={'trace': tracer(host, started)}, **kwargs)
+    try: resp = await client.send(upstream_request, stream=stream)
+    except Exception as e:
+        metrics.error(host, e)
+        limiter.record(url, error=e)
+        raise
+
+    metrics.upstream(host, resp.status_code)
+    limiter.record(url, resp.status_code, headers=resp.headers)
+    resp.metered_host, resp.metered_started = host, started
+    if not stream: metrics.finished(host, started, len(resp.content))
+    return resp
+
+async def metered(resp, chunks):
+    received = 0
+    try:
+        async for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+    finally: metrics.finished(resp.metered_host, resp.metered_started, received)
+
+def passthrough(resp, names=PASSTHROUGH_HEADERS):
+    return {name: resp.headers[name] for name in names if name in resp.headers}
+
+async def stream_response(resp, names=PASSTHROUGH_HEADERS, chunks=None, extra=None):
+    headers = passthrough(resp, names)
+    headers.update(extra or {})
+    return StreamingResponse(chunks or metered(resp, resp.aiter_raw()), status_code=resp.status_code, headers=headers, background=BackgroundTask(resp.aclose))
+
+async def closing(resp, chunks):
+    # the BackgroundTask is skipped when the body raises part way (a bad rewrite, a dropped upstream); this isn't
+    try:
+        async for chunk in chunks: yield chunk
+    finally: await resp.aclose()
+
+async def prepend(head, chunks):
+    if head: yield head
+    async for chunk in chunks: yield chunk
+
+async def once(body):
+    yield body
+
+async def refresh(key, ttl, url, headers):
+    try:
+        resp = await fetch('GET', url, headers=headers)
+        try:
+            body = b''.join([chunk async for chunk in metered(resp, resp.aiter_raw())])
+            if resp.status_code == 200: cache.put(key, ttl, resp.status_code, passthrough(resp), body)
+        finally: await resp.aclose()
+    except Exception as e: print(f"Cache refresh failed for {url}: {e}")
+    finally: cache.end_refresh(key)
+
+async def pump(key, flight_key, flight, ttl, url, headers):
+    try:
+        resp = await fetch('GET', url, headers=headers)
+        try:
+            status, names = resp.status_code, passthrough(resp)
+            await flight.start(status, names)
+            raw = metered(resp, resp.aiter_raw(CHUNK_SIZE))
+            async for chunk in cache.atee(key, ttl, status, names, raw) if ttl and status == 200 else raw:
+                if not await flight.append(chunk): break  # every reader left
+        finally: await resp.aclose()
+        await flight.finish()
+    except Exception as e: await flight.finish(e)
+    finally: flights.forget(flight_key, flight)
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+async def resumed(url, headers, status, offset):
+    # the rest of a body for a reader the flight left behind, fetched on its own from byte offset
+    resp = await fetch('GET', url, headers=resume_headers(headers, status, offset))
+    try:
+        skip = resume_skip(status, resp.status_code, offset)
+        async for chunk in metered(resp, resp.aiter_raw(CHUNK_SIZE)):
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk[skip:]
+            skip = 0
+    finally: await resp.aclose()
+
+async def shared_fetch(url, headers, ttl):
+    # -> (status, headers, chunks) from the cache or from a coalesced upstream fetch
+    key = cache.key(url, headers)
+    if ttl:
+        entry, state = cache.lookup(key)
+        if entry:
+            if state == 'stale' and cache.begin_refresh(key): spawn(refresh(key, ttl, url, headers))
+            return entry.status, dict(entry.headers, **{'X-Cache': 'HIT' if state == 'fresh' else 'STALE'}), once(entry.body)
+
+    # identical concurrent GETs ride on one upstream fetch, pumped by its own task
+    flight_key = request_key(url, headers)
+    resume = (lambda status, offset: resumed(url, headers, status, offset)) if can_resume(headers) else None
+    reader, leader = flights.join(flight_key, resume)
+    if leader: spawn(pump(key, flight_key, reader.flight, ttl, url, headers))
+
+    try: status, names = await reader.flight.wait_started()
+    except BaseException:
+        reader.close()
+        raise
+    return status, dict(names, **({'X-Cache': 'MISS'} if ttl else {})), reader
+
+async def shared_get(url, headers, ttl):
+    status, names, chunks = await shared_fetch(url, headers, ttl)
+    # a cancelled response drops its reader, which ends the fetch once no other reader is left
+    return StreamingResponse(chunks, status_code=status, headers=names)
+
+async def batch_fetch(index, item):
+    # -> (index, result, error) so completion order can be reported without losing the slot
+    url, headers = item['url'], item.get('headers', {})
+    try:
+        async with batch_slots, batch_hosts.get(url):
+            if item.get('method', '').upper() == 'GET':
+                status, names, chunks = await shared_fetch(url, headers, cache.ttl_for(url))
+                return index, (status, names, b''.join([chunk async for chunk in chunks])), None
+
+            resp = await fetch('POST', url, stream=False, data=item.get('form_data', {}), headers=headers)
+            return index, (resp.status_code, passthrough(resp, ('Content-Type',)), resp.content), None
+    except Exception as e: return index, (), str(e)
+
+def prefetch(items):
+    for url, headers in items:
+        key = segment_store.key(url)
+        if segment_store.claim(key, prefetch=True): spawn(prefetch_segment(key, url, headers))
+
+async def prefetch_segment(key, url, headers):
+    try:
+        async with prefetch_slots:
+            resp = await fetch('GET', url, headers=headers)
+            try:
+                if resp.status_code != 200: return
+                async for _ in segment_store.atee(key, resp.headers, metered(resp, resp.aiter_raw(CHUNK_SIZE))): pass
+            finally: await resp.aclose()
+    except Exception as e: print(f"Segment prefetch failed for {url}: {e}")
+    finally: segment_store.release(key)
+
+async def scanned(chunks, url, headers, scan):
+    # a media playlist read to the end is indexed for segment prefetching
+    async for chunk in chunks: yield chunk
+    prefetch(playlists.served(url, headers, scan))
+
+async def cached_segment(key):
+    # a segment being prefetched is worth waiting for rather than fetching again
+    segment = segment_store.get_memory(key) or await asyncio.to_thread(segment_store.get, key)
+    if segment is None:
+        waiter = segment_store.waiter(key)
+        if waiter is not None:
+            try: await asyncio.wait_for(waiter.wait(), segments.PREFETCH_WAIT)
+            except asyncio.TimeoutError: return None
+            segment = segment_store.get_memory(key) or await asyncio.to_thread(segment_store.get, key)
+    return segment
+
+def segment_response(segment, request):
+    headers = dict(CORS_HEADERS, **{'X-Cache': 'HIT'})
+    if 'Content-Encoding' in segment.headers: headers['Content-Encoding'] = segment.headers['Content-Encoding']
+    # FileResponse answers ranges itself and hands the path to servers that offer http.response.pathsend
+    if segment.path: return FileResponse(segment.path, headers=headers, media_type=segment.headers.get('Content-Type', 'video/mp2t'))
+
+    headers.update(segment.headers, **{'Accept-Ranges': 'bytes'})
+    span = byte_range(request.headers.get('range'), segment.size)
+    if span is None: return Response(segment.body, headers=headers)
+    start, end = span
+    headers['Content-Range'] = f'bytes {start}-{end}/{segment.size}'
+    return Response(segment.body[start:end + 1], status_code=206, headers=headers)
+
+async def released(chunks, key):
+    try:
+        async for chunk in chunks: yield chunk
+    finally: segment_store.release(key)
+
+def failure(message, status, headers=None):
+    return JSONResponse({'error': message}, status_code=status, headers=headers)
+
+def upstream_failure(e, headers=None):
+    # 502/504 when the upstream fetch broke, 429/503 when the limiter turned it away, 500 for our own bugs
+    if isinstance(e, Rejected): return failure(str(e), e.status, dict(headers or {}, **{'Retry-After': str(max(round(e.retry_after), 1))}))
+    return failure(str(e), error_status(e), headers)
+
+def parse_headers(raw):
+    try: headers = json.loads(raw) if raw else {}
+    except ValueError: headers = {}
+    return headers if isinstance(headers, dict) else {}
+
+async def proxy(request):
+    try:
+        try: data = await request.json()
+        except ValueError: data = None
+        if not isinstance(data, dict): return failure('JSON body is required', 400)
+        url = request.state.upstream_url = data.get('url')
+        method = data.get('method', '').upper()
+        headers = data.get('headers', {})
+        stream = data.get('stream', True)
+
+        if not url: return failure('URL is required', 400)
+        if method not in ['GET', 'POST']: return failure('Only GET and POST methods are allowed', 405)
+
+        if method == 'GET': return await shared_get(url, headers, cache.ttl_for(url))
+
+        resp = await fetch('POST', url, stream=stream, data=data.get('form_data', {}), headers=headers)
+        if stream: return await stream_response(resp)
+        return Response(resp.content, media_type='text/html')
+
+    except Exception as e: return upstream_failure(e)
+
+async def proxy_batch(request):
+    try:
+        try: data = await request.json()
+        except ValueError: data = None
+        items, error = batch.parse_items(data)
+        if error: return failure(error, 400)
+
+        writer = batch.Writer(data.get('format', 'json') if isinstance(data, dict) else 'json')
+
+        # results go out in completion order; invalid items are answered straight away
+        async def generate():
+            yield writer.start()
+            pending = []
+            for index, item in enumerate(items):
+                error = batch.item_error(item)
+                if error: yield writer.part(index, item, error=error)
+                else: pending.append(asyncio.ensure_future(batch_fetch(index, item)))
+
+            try:
+                for done in asyncio.as_completed(pending):
+                    index, result, error = await done
+                    yield writer.part(index, items[index], *result, error=error)
+            finally:
+                for task in pending: task.cancel()
+            yield writer.end()
+
+        return StreamingResponse(generate(), media_type=writer.content_type)
+
+    except Exception as e: return upstream_failure(e)
+
+async def m3u8_proxy(request):
+    if request.method == 'OPTIONS': return Response(headers=CORS_HEADERS)
+
+    try:
+        url = request.state.upstream_url = request.query_params.get('url')
+        raw_headers = request.query_params.get('headers', '')
+        if not url: return failure('URL is required', 400, CORS_HEADERS)
+
+        upstream_headers = parse_headers(raw_headers)
+        headers = dict(upstream_headers)
+        for name in ('Range', 'If-Range'):
+            if name in request.headers: headers[name] = request.headers[name]
+
+        # segments of playlists served earlier: move the prefetch window along, then try the shared cache
+        key = segment_store.key(url)
+        known = playlists.known(url)
+        if known: prefetch(playlists.upcoming(url))
+        segment = await cached_segment(key)
+        if segment is not None and (segment.body is not None or os.path.exists(segment.path)): return segment_response(segment, request)
+
+        resp = await fetch('GET', url, headers=headers)
+        claimed = False
+        # anything failing before the response takes over the body (a rewrite error included) closes it here
+        try:
+            if revocations and resp.status_code in REVOKE_STATUSES: await asyncio.to_thread(revocations.record, url, resp.status_code)
+
+            encoded = 'Content-Encoding' in resp.headers
+            raw = metered(resp, resp.aiter_raw(CHUNK_SIZE))
+            head = b'' if encoded else await anext(raw, b'')
+
+            if resp.is_success and m3u8.is_playlist(str(resp.url), resp.headers.get('Content-Type'), head):
+                chunks = metered(resp, resp.aiter_bytes(CHUNK_SIZE)) if encoded else prepend(head, raw)
+                scan = m3u8.PlaylistScan(str(resp.url))
+                body = closing(resp, scanned(m3u8.arewrite_chunks(chunks, str(resp.url), quote(raw_headers, safe=''), scan), str(resp.url), upstream_headers, scan))
+                return StreamingResponse(body, status_code=resp.status_code, media_type=m3u8.PLAYLIST_TYPE, headers=CORS_HEADERS, background=BackgroundTask(resp.aclose))
+
+            chunks = prepend(head, raw)
+            # a whole segment nobody else is fetching is kept for the next viewer
+            claimed = known and resp.status_code == 200 and 'Range' not in headers and segment_store.claim(key)
+            if claimed: chunks = released(segment_store.atee(key, resp.headers, chunks), key)
+            response = await stream_response(resp, SEGMENT_HEADERS, chunks, CORS_HEADERS)
+            # a body that never starts (the client left first) skips released(); the background task still runs
+            if claimed: response.background = BackgroundTasks([response.background, BackgroundTask(segment_store.release, key)])
+            return response
+        except BaseException:
+            if claimed: segment_store.release(key)
+            await resp.aclose()
+            raise
+
+    except Exception as e: return upstream_failure(e, CORS_HEADERS)
+
+async def stats(request):
+    body = {'pool': pool_stats(), 'cache': cache.stats(), 'singleflight': flights.stats(), 'hosts': limiter.stats(),
+            'segments': dict(segment_store.stats(), **playlists.stats())}
+    if revocations: body['revocations'] = revocations.stats()
+    return JSONResponse(body)
+
+async def prometheus_metrics(request):
+    gauges = stat_gauges(pool_stats(), cache.stats(), flights.stats(), limiter.stats(), dict(segment_store.stats(), **playlists.stats()))
+    return Response(metrics.render(gauges), media_type='text/plain; version=0.0.4')
+
+async def slow_requests(request):
+    return JSONResponse(metrics.slow_requests())
+
+class Instrumented:
+    # times each request until its last body byte has been sent, which a Starlette middleware can't see for streams
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http': return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        state = {'status': 500, 'sent': 0, 'cache': None, 'length': 0}
+        async def counting_send(message):
+            if message['type'] == 'http.response.start':
+                headers = {name.lower(): value for name, value in message.get('headers', [])}
+                state['status'] = message['status']
+                state['cache'] = headers[b'x-cache'].decode() if b'x-cache' in headers else None
+                state['length'] = int(headers.get(b'content-length', 0))
+            elif message['type'] == 'http.response.body': state['sent'] += len(message.get('body', b''))
+            # the server sends the file itself (zero-copy); the declared length is what went out
+            elif message['type'] == 'http.response.pathsend': state['sent'] += state['length']
+            await send(message)
+
+        try: await self.app(scope, receive, counting_send)
+        finally:
+            url = scope.get('state', {}).get('upstream_url')
+            metrics.request(scope['path'], state['status'], time.perf_counter() - started, state['sent'], url, state['cache'])
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    for client in list(clients.values()): await client.aclose()
+    clients.clear()
+
+app = Instrumented(Starlette(routes=[
+    Route('/proxy', proxy, methods=['POST']),
+    Route('/proxy/batch', proxy_batch, methods=['POST']),
+    Route('/m3u8-proxy', m3u8_proxy, methods=['GET', 'OPTIONS']),
+    Route('/stats', stats, methods=['GET']),
+    Route('/metrics', prometheus_metrics, methods=['GET']),
+    Route('/metrics/slow', slow_requests, methods=['GET']),
+], lifespan=lifespan))
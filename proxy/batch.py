@@ -0,0 +1,89 @@
+import base64, json, os, threading, uuid, zlib
+from urllib.parse import urlsplit
+
+# POST /proxy/batch {"requests": [{url, method, headers, form_data}, ...], "format": "json" | "multipart"}
+MAX_ITEMS = int(os.environ.get('PROXY_BATCH_MAX', 50))
+PER_HOST = int(os.environ.get('PROXY_BATCH_PER_HOST', 4))
+WORKERS = int(os.environ.get('PROXY_BATCH_WORKERS', 16))
+
+try: import brotli
+except ImportError: brotli = None
+
+class HostSemaphores:
+    def __init__(self, limit, factory):
+        self.limit = limit
+        self.factory = factory
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        with self.lock:
+            semaphore = self.semaphores.get(host)
+            if semaphore is None: semaphore = self.semaphores[host] = self.factory(self.limit)
+            return semaphore
+
+def parse_items(data):
+    # returns (items, error); each item is validated on its own so one bad entry doesn't sink the batch
+    items = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items: return None, 'A non-empty list of requests is required'
+    if len(items) > MAX_ITEMS: return None, f'At most {MAX_ITEMS} requests are allowed per batch'
+    return items, None
+
+def item_error(item):
+    if not isinstance(item, dict) or not item.get('url'): return 'URL is required'
+    if item.get('method', '').upper() not in ['GET', 'POST']: return 'Only GET and POST methods are allowed'
+    return None
+
+def decode_body(body, encoding):
+    # cached/coalesced bodies are kept exactly as the upstream sent them
+    encoding = (encoding or '').lower()
+    if encoding in ('gzip', 'x-gzip'): return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try: return zlib.decompress(body)
+        except zlib.error: return zlib.decompress(body, -zlib.MAX_WBITS)
+    if encoding == 'br' and brotli: return brotli.decompress(body)
+    return body
+
+def json_part(index, item, status=None, headers=None, body=b'', error=None):
+    url = item.get('url') if isinstance(item, dict) else None
+    if error: return json.dumps({'index': index, 'url': url, 'error': error})
+
+    content_type = headers.get('Content-Type')
+    result = {'index': index, 'url': url, 'status': status, 'headers': {'Content-Type': content_type} if content_type else {}}
+    try: result['body'] = decode_body(body, headers.get('Content-Encoding')).decode('utf-8')
+    except (UnicodeDecodeError, zlib.error): result['body_base64'] = base64.b64encode(body).decode()
+    return json.dumps(result)
+
+def multipart_part(boundary, index, item, status=None, headers=None, body=b'', error=None):
+    lines = [f'--{boundary}', f'X-Batch-Index: {index}']
+    if error:
+        lines += [f'X-Batch-Error: {error}', 'Content-Type: text/plain']
+        body = error.encode()
+    else:
+        lines.append(f'X-Upstream-Status: {status}')
+        lines += [f'{name}: {headers[name]}' for name in ('Content-Type', 'Content-Encoding') if name in headers]
+
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body + b'\r\n'
+
+class Writer:
+    # turns completed (index, item, status, headers, body, error) results into response chunks
+    def __init__(self, output):
+        self.multipart = output == 'multipart'
+        self.boundary = uuid.uuid4().hex
+        self.count = 0
+
+    @property
+    def content_type(self):
+        return f'multipart/mixed; boundary={self.boundary}' if self.multipart else 'application/json'
+
+    def start(self):
+        return b'' if self.multipart else b'['
+
+    def part(self, *result, **kwargs):
+        self.count += 1
+        if self.multipart: return multipart_part(self.boundary, *result, **kwargs)
+        return (b',' if self.count > 1 else b'') + json_part(*result, **kwargs).encode()
+
+    def end(self):
+        return f'--{self.boundary}--\r\n'.encode() if self.multipart else b']'
@@ -0,0 +1,118 @@
+import os, random, ssl, sys, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-ins for the upstreams the proxy talks to. Every body is generated, so runs are repeatable offline:
+#   /page?kb=120                          an HTML page of that size
+#   /playlist.m3u8?segments=300           a media playlist whose segments point at /segment
+#   /master.m3u8                          a master playlist with three variants
+#   /segment?kb=1024                      a binary segment (Range is honoured)
+#   /drip?chunks=20&delay=0.05&kb=4       a body trickled out chunk by chunk
+#   /error?status=503                     an error status with a short body
+# With tls=True (--tls) they are served over HTTPS with the self-signed localhost.pem, valid for 127.0.0.1 and
+# localhost; point REQUESTS_CA_BUNDLE (Flask) or SSL_CERT_FILE (async) at the same file to trust it.
+CHUNK = 64 * 1024
+CERT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'localhost.pem')
+PAYLOAD = bytes(random.Random(0).getrandbits(8) for _ in range(CHUNK))
+
+def page(kb):
+    row = '<div class="flw-item"><a class="dynamic-name" href="/title-1">Title</a></div>\n'
+    body = row * max(int(kb * 1024 / len(row)), 1)
+    return f'<!doctype html><html><body><div id="main-content">{body}</div></body></html>'.encode()
+
+def media_playlist(segments):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4', '#EXT-X-MEDIA-SEQUENCE:0']
+    for index in range(segments): lines += ['#EXTINF:4.000,', f'/segment?kb=512&n={index}']
+    return ('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n').encode()
+
+def master_playlist():
+    lines = ['#EXTM3U']
+    for bandwidth, height in ((800000, 480), (2800000, 720), (5000000, 1080)):
+        lines += [f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={height * 16 // 9}x{height}', f'/playlist.m3u8?segments=300&h={height}']
+    return ('\n'.join(lines) + '\n').encode()
+
+class Origin(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        if url.path == '/page': return self.send_body(page(float(query.get('kb', 120))), 'text/html; charset=utf-8')
+        if url.path == '/playlist.m3u8': return self.send_body(media_playlist(int(query.get('segments', 300))), 'application/vnd.apple.mpegurl')
+        if url.path == '/master.m3u8': return self.send_body(master_playlist(), 'application/vnd.apple.mpegurl')
+        if url.path == '/segment': return self.segment(int(float(query.get('kb', 1024)) * 1024))
+        if url.path == '/drip': return self.drip(int(query.get('chunks', 20)), float(query.get('delay', 0.05)), int(float(query.get('kb', 4)) * 1024))
+        if url.path == '/error': return self.send_body(b'upstream error', 'text/plain', int(query.get('status', 503)))
+        self.send_body(b'not found', 'text/plain', 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.do_GET()
+
+    def segment(self, size):
+        start, end, status = 0, size - 1, 200
+        if self.headers.get('Range', '').startswith('bytes='):
+            first, _, last = self.headers['Range'][6:].partition('-')
+            start, end, status = int(first or 0), min(int(last or size - 1), size - 1), 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'video/mp2t')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        if status == 206: self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+
+        # the body is PAYLOAD repeated, so a range holds the same bytes as that part of the whole segment
+        position = start
+        while position <= end:
+            offset = position % CHUNK
+            chunk = PAYLOAD[offset:offset + min(CHUNK - offset, end - position + 1)]
+            self.wfile.write(chunk)
+            position += len(chunk)
+
+    def drip(self, chunks, delay, size):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(chunks * size))
+        self.end_headers()
+        body = (PAYLOAD * (size // CHUNK + 1))[:size]
+        for _ in range(chunks):
+            self.wfile.write(body)
+            self.wfile.flush()
+            time.sleep(delay)
+
+class OriginServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def serve(host, port, tls=False):
+    server = OriginServer((host, port), Origin)
+    if tls:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(CERT)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    return server, f"{'https' if tls else 'http'}://{host}:{server.server_address[1]}"
+
+def start(host='127.0.0.1', port=0, tls=False):
+    # -> (server, base_url); the server runs on a daemon thread until shutdown()
+    server, base_url = serve(host, port, tls)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url
+
+if __name__ == '__main__':
+    server, base_url = serve('127.0.0.1', 8765, '--tls' in sys.argv[1:])
+    print(f"Mock origins on {base_url}")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
@@ -0,0 +1,175 @@
+import argparse, asyncio, json, os, platform, socket, subprocess, sys, tempfile, time
+from urllib.parse import quote
+import httpx
+import origins
+
+# Starts the proxy in a subprocess against the mock origins in origins.py and drives it with a fixed
+# number of concurrent clients. Reports RPS, latency percentiles, errors and the proxy's peak RSS;
+# --save writes a baseline, --compare diffs a run against one.
+#
+#   python bench/run.py --mode asgi --scenario segment --concurrency 64 --duration 20 --save asgi-segment
+#   python bench/run.py --mode asgi --scenario segment --concurrency 64 --compare asgi-segment
+PROXY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+SCENARIOS = {
+    # name -> (route, origin path); "proxy" goes through POST /proxy, "m3u8" through GET /m3u8-proxy
+    'page': ('proxy', '/page?kb=120'),
+    'playlist': ('m3u8', '/master.m3u8'),
+    'media': ('m3u8', '/playlist.m3u8?segments=300'),
+    'segment': ('m3u8', '/segment?kb=1024'),
+    'drip': ('m3u8', '/drip?chunks=20&delay=0.05&kb=4'),
+    'error': ('proxy', '/error?status=503'),
+}
+# a run is flagged when it is this much worse than its baseline
+TOLERANCE = {'rps': -0.10, 'p50': 0.15, 'p95': 0.20, 'p99': 0.25, 'peak_rss_mb': 0.20}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def server_command(mode, port, workers):
+    if mode == 'flask': return [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads']
+    if mode == 'asgi': return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+    raise ValueError(f"Unknown server mode: {mode}")
+
+def process_tree(pid):
+    # the proxy pid plus every descendant (uvicorn workers), read from /proc
+    pids, index = [pid], 0
+    while index < len(pids):
+        try:
+            with open(f'/proc/{pids[index]}/task/{pids[index]}/children') as f: pids += [int(child) for child in f.read().split()]
+        except OSError: pass
+        index += 1
+    return pids
+
+def rss_kb(pid, field):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field): return int(line.split()[1])
+    except OSError: pass
+    return 0
+
+def peak_rss_mb(pid):
+    # VmHWM is each process's own high-water mark; summed over the tree it bounds the fleet sizing question
+    if platform.system() != 'Linux': return None
+    return round(sum(rss_kb(child, 'VmHWM:') for child in process_tree(pid)) / 1024, 1)
+
+def wait_ready(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/stats', timeout=1).status_code == 200: return
+        except httpx.HTTPError: pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Proxy did not come up on port {port}")
+
+def percentile(values, fraction):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+async def drive(port, base_url, scenario, concurrency, duration, requests):
+    route, path = SCENARIOS[scenario]
+    proxy_url = f'http://127.0.0.1:{port}'
+    origin_url = base_url + path
+    latencies, statuses, errors, received = [], {}, {}, [0]
+    started = time.perf_counter()
+    issued = [0]
+
+    async def one(client):
+        if route == 'proxy': return await client.post(f'{proxy_url}/proxy', json={'url': origin_url, 'method': 'GET'})
+        return await client.get(f'{proxy_url}/m3u8-proxy?url={quote(origin_url, safe="")}')
+
+    async def worker(client):
+        while time.perf_counter() - started < duration and (requests is None or issued[0] < requests):
+            issued[0] += 1
+            begin = time.perf_counter()
+            try:
+                response = await one(client)
+                received[0] += len(response.content)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                latencies.append(time.perf_counter() - begin)
+            except httpx.HTTPError as e: errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies), 'elapsed': round(elapsed, 3), 'rps': round(len(latencies) / elapsed, 1),
+        'p50': percentile(latencies, 0.50), 'p95': percentile(latencies, 0.95), 'p99': percentile(latencies, 0.99),
+        'max': max(latencies, default=None), 'mb_per_s': round(received[0] / elapsed / 2 ** 20, 2),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())}, 'errors': errors,
+    }
+
+def run(mode, scenario, concurrency, duration, requests, workers, tls=False):
+    origin, base_url = origins.start(tls=tls)
+    port = free_port()
+    # both servers' HTTP clients pick the CA bundle up from the environment
+    env = dict(os.environ, REQUESTS_CA_BUNDLE=origins.CERT, SSL_CERT_FILE=origins.CERT) if tls else None
+    # the server's log goes to a file, not a pipe: nobody reads it during the run, and a full pipe (Flask logs
+    # every request) would block the server mid-benchmark; it is only shown when the server fails to start
+    log = tempfile.TemporaryFile()
+    server = subprocess.Popen(server_command(mode, port, workers), cwd=PROXY_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    try:
+        try: wait_ready(port)
+        except RuntimeError as e:
+            log.seek(0)
+            raise RuntimeError(f"{e}:\n{log.read()[-4096:].decode(errors='replace')}") from None
+        result = asyncio.run(drive(port, base_url, scenario, concurrency, duration, requests))
+        result['peak_rss_mb'] = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        try: server.wait(10)
+        except subprocess.TimeoutExpired: server.kill()
+        log.close()
+        origin.shutdown()
+
+    for key in ('p50', 'p95', 'p99', 'max'):
+        if result[key] is not None: result[key] = round(result[key] * 1000, 2)  # milliseconds
+    return dict(result, mode=mode, scenario=scenario, concurrency=concurrency, workers=workers, tls=tls, python=platform.python_version())
+
+def compare(result, baseline):
+    # -> [(metric, baseline, current, change, regressed)]
+    rows = []
+    for metric, tolerance in TOLERANCE.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None: continue
+        change = (new - old) / old
+        regressed = change < tolerance if tolerance < 0 else change > tolerance
+        rows.append((metric, old, new, change, regressed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the proxy against local mock origins")
+    parser.add_argument('--mode', choices=('flask', 'asgi'), default='asgi')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='page')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--requests', type=int, help="stop after this many requests instead of --duration")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn workers (asgi only)")
+    parser.add_argument('--tls', action='store_true', help="serve the origins over HTTPS")
+    parser.add_argument('--save', metavar='NAME', help="store the result as baselines/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="diff against baselines/NAME.json; exits 1 on a regression")
+    args = parser.parse_args(argv)
+
+    duration = float('inf') if args.requests else args.duration
+    result = run(args.mode, args.scenario, args.concurrency, duration, args.requests, args.workers, args.tls)
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(os.path.join(BASELINES, f'{args.save}.json'), 'w') as f: json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(os.path.join(BASELINES, f'{args.compare}.json')) as f: rows = compare(result, json.load(f))
+        for metric, old, new, change, regressed in rows:
+            print(f"{metric:>12} {old:>10} -> {new:<10} {change:+.1%}{'  REGRESSION' if regressed else ''}")
+        if any(row[-1] for row in rows): return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import functools
+import pytest
+import run
+
+def test_percentile():
+    assert run.percentile([], 0.5) is None
+    assert run.percentile([3, 1, 2], 0.5) == 2 and run.percentile(list(range(101)), 0.99) == 99 and run.percentile([5], 0.99) == 5
+
+def test_compare_flags_only_regressions_past_tolerance():
+    baseline = {'rps': 1000, 'p50': 10, 'p95': 20, 'p99': 30, 'peak_rss_mb': None}
+    result = {'rps': 850, 'p50': 11, 'p95': 30, 'p99': 30, 'peak_rss_mb': 80}
+    rows = {metric: regressed for metric, _, _, _, regressed in run.compare(result, baseline)}
+    assert rows == {'rps': True, 'p50': False, 'p95': True, 'p99': False}
+
+def test_unknown_mode():
+    with pytest.raises(ValueError): run.server_command('gunicorn', 5000, 1)
+
+def test_a_chatty_server_does_not_stall_the_run():
+    # the Flask dev server logs a line per request; more than a pipe buffer's worth of them must not block it
+    result = run.run('flask', 'error', 8, 30, 1500, 1)
+    assert result['requests'] == 1500 and result['statuses'] == {'503': 1500} and not result['errors']
+    assert result['elapsed'] < 30
+
+def test_a_server_that_does_not_start_reports_its_output(monkeypatch):
+    monkeypatch.setattr(run, 'server_command', lambda mode, port, workers: [run.sys.executable, '-c', 'import sys; sys.exit("no proxy here")'])
+    monkeypatch.setattr(run, 'wait_ready', functools.partial(run.wait_ready, timeout=1))
+    with pytest.raises(RuntimeError, match='no proxy here'): run.run('flask', 'page', 1, 1, 1, 1)
@@ -0,0 +1,139 @@
+import os, threading, time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+# PROXY_CACHE_RULES="hianime.nz=300,graphql.anilist.co=3600" -> seconds a GET stays fresh per host (suffix match)
+# a ranged GET is a different response, so Range/If-Range split the key as well
+VARY_HEADERS = ('accept', 'accept-language', 'authorization', 'cookie', 'if-range', 'range', 'referer', 'x-requested-with')
+
+def parse_rules(spec):
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, _, ttl = item.partition('=')
+        rules[host.strip().lower()] = float(ttl)
+    return rules
+
+class Entry:
+    __slots__ = ('status', 'headers', 'body', 'stored_at', 'ttl', 'refreshing')
+
+    def __init__(self, status, headers, body, ttl):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = time.monotonic()
+        self.ttl = ttl
+        self.refreshing = False
+
+    def age(self):
+        return time.monotonic() - self.stored_at
+
+class ResponseCache:
+    def __init__(self, max_bytes, rules, default_ttl=0, stale_ttl=0, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.rules = rules
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 16
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0, 'refreshes': 0, 'stores': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_bytes=int(os.environ.get('PROXY_CACHE_BYTES', 256 * 1024 * 1024)),
+            rules=parse_rules(os.environ.get('PROXY_CACHE_RULES', 'hianime.nz=300')),
+            default_ttl=float(os.environ.get('PROXY_CACHE_TTL', 0)),
+            stale_ttl=float(os.environ.get('PROXY_CACHE_STALE', 600)),
+            max_entry_bytes=int(os.environ.get('PROXY_CACHE_ENTRY_BYTES', 4 * 1024 * 1024)),
+        )
+
+    def ttl_for(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        while host:
+            if host in self.rules: return self.rules[host]
+            host = host.partition('.')[2]
+        return self.default_ttl
+
+    def key(self, url, headers):
+        lowered = {name.lower(): value for name, value in (headers or {}).items()}
+        return (url, tuple((name, lowered[name]) for name in VARY_HEADERS if name in lowered))
+
+    def lookup(self, key):
+        # returns (entry, 'fresh' | 'stale') or (None, None); stale entries are served while a refresh runs
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None, None
+
+            age = entry.age()
+            if age < entry.ttl: state = 'fresh'
+            elif age < entry.ttl + self.stale_ttl: state = 'stale'
+            else:
+                self.remove(key)
+                self.counters['misses'] += 1
+                return None, None
+
+            self.entries.move_to_end(key)
+            self.counters['hits' if state == 'fresh' else 'stale_hits'] += 1
+            return entry, state
+
+    def begin_refresh(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.refreshing: return False
+            entry.refreshing = True
+            self.counters['refreshes'] += 1
+            return True
+
+    def end_refresh(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None: entry.refreshing = False
+
+    def put(self, key, ttl, status, headers, body):
+        if len(body) > self.max_entry_bytes: return
+
+        with self.lock:
+            self.remove(key)
+            self.entries[key] = Entry(status, headers, body, ttl)
+            self.size += len(body)
+            self.counters['stores'] += 1
+
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.counters['evictions'] += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None: self.size -= len(entry.body)
+
+    def tee(self, key, ttl, status, headers, chunks):
+        # passes chunks straight through and only stores the body if the client read all of it
+        parts, total = [], 0
+        for chunk in chunks:
+            if parts is not None:
+                total += len(chunk)
+                if total > self.max_entry_bytes: parts = None
+                else: parts.append(chunk)
+            yield chunk
+
+        if parts is not None: self.put(key, ttl, status, headers, b''.join(parts))
+
+    async def atee(self, key, ttl, status, headers, chunks):
+        parts, total = [], 0
+        async for chunk in chunks:
+            if parts is not None:
+                total += len(chunk)
+                if total > self.max_entry_bytes: parts = None
+                else: parts.append(chunk)
+            yield chunk
+
+        if parts is not None: self.put(key, ttl, status, headers, b''.join(parts))
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.entries), bytes=self.size, max_bytes=self.max_bytes)
@@ -0,0 +1,258 @@
+import asyncio, threading, time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Per-host adaptive rate limits and circuit breakers. Hosts start out unthrottled unless they are given a
+# rate (requests per second). A 429 halves the rate the host was actually getting and pauses it for
+# Retry-After; clean responses win the rate back a little at a time. `threshold` failures in a row (5xx,
+# timeouts, refused connections) open the host's breaker: calls fail fast for a cooldown, then one probe is
+# let through and either closes it or keeps it open for twice as long.
+# The proxy configures it in limiter.py. The hianime scrapers keep their own copy
+# (testing/anime/hianime/hostlimits.py) so they run without the proxy's checkout; keep the two in step.
+FAILURE_THRESHOLD = 5
+COOLDOWN = 10.0
+MAX_COOLDOWN = 300.0
+PROBE_TIMEOUT = 30.0
+DEFAULT_RETRY_AFTER = 5.0
+BACKOFF = 0.5
+RECOVERY = 0.05
+MIN_RATE = 0.1
+# a learned limit is dropped once the host has gone this long without another 429
+FORGET_AFTER = 600.0
+WINDOW = 5.0
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+def parse_rates(spec):
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, _, rate = item.partition('=')
+        rates[host.strip().lower()] = float(rate)
+    return rates
+
+def retry_after(headers, default=DEFAULT_RETRY_AFTER):
+    # seconds or an HTTP date; anything unreadable falls back to the default
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value: return default
+    try: return max(float(value), 0.0)
+    except ValueError: pass
+    try: return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError): return default
+
+def host_of(url):
+    return (urlsplit(url).hostname or '').lower()
+
+def error_kind(error):
+    # coarse, library-agnostic buckets for requests/urllib3 and httpx exceptions alike
+    name = type(error).__name__.lower()
+    if 'timeout' in name: return 'timeout'
+    if 'connect' in name or 'resolution' in name or 'ssl' in name: return 'connect'
+    if 'protocol' in name or 'chunked' in name or 'decode' in name or 'read' in name: return 'protocol'
+    return 'other'
+
+def is_failure(status=None, error=None):
+    # only a host that is down or broken counts against its breaker, not a 404 or a bad URL
+    if error is not None: return error_kind(error) != 'other'
+    return status in FAILURE_STATUSES
+
+class Rejected(Exception):
+    status = 503
+    reason = 'Rejected'
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"{self.reason} for {host}, retry in {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+class HostUnavailable(Rejected):
+    status = 503
+    reason = 'Circuit open'
+
+class Throttled(Rejected):
+    status = 429
+    reason = 'Rate limited'
+
+class AdaptiveBucket:
+    def __init__(self, rate=None):
+        self.ceiling = rate          # configured rate, None for no limit
+        self.rate = rate             # current rate, lowered by 429s
+        self.learned = None          # the rate the host was getting when it last said 429
+        self.capacity = max(rate or 1.0, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled_at = 0.0
+        self.throttles = 0
+        self.window_started = self.updated
+        self.window_count = 0
+        self.observed = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        # takes a token and returns how long the caller must wait before using it; None, without taking
+        # a token, when that wait would be longer than max_wait
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, 0.0)
+            if self.rate is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait: return None
+
+            if self.rate is not None: self.tokens -= 1
+            if now - self.window_started >= WINDOW:
+                self.observed = self.window_count / (now - self.window_started)
+                self.window_started, self.window_count = now, 0
+            self.window_count += 1
+            return wait
+
+    def next_slot(self):
+        # seconds until reserve() would succeed without waiting
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, 0.0)
+            if self.rate is not None: wait = max(wait, (1 - self.tokens - (now - self.updated) * self.rate) / self.rate)
+            return wait
+
+    def throttle(self, seconds):
+        # a 429 (or a 503 with Retry-After) applies to everyone sharing the host, not just the request that got it
+        with self.lock:
+            now = time.monotonic()
+            current = self.window_count / max(now - self.window_started, 1.0)
+            self.learned = max(self.rate if self.rate is not None else max(self.observed, current), MIN_RATE)
+            self.rate = max(self.learned * BACKOFF, MIN_RATE)
+            self.capacity = max(self.rate, 1.0)
+            self.tokens = min(self.tokens, self.capacity)
+            self.updated = now
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.throttled_at = now
+            self.throttles += 1
+
+    def configure(self, rate):
+        with self.lock:
+            self.ceiling = rate
+            self.rate = rate if self.learned is None or rate is None else min(self.rate, rate)
+            self.capacity = max(self.rate or 1.0, 1.0)
+
+    def recover(self):
+        with self.lock:
+            if self.learned is None: return
+            if time.monotonic() - self.throttled_at > FORGET_AFTER: self.rate, self.learned = self.ceiling, None
+            else: self.rate = min(self.rate * (1 + RECOVERY), self.learned)
+            self.capacity = max(self.rate or 1.0, 1.0)
+
+    def stats(self):
+        with self.lock: return {'rate': self.rate, 'observed': round(self.observed, 2), 'throttles': self.throttles}
+
+class CircuitBreaker:
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        # -> None when the call may go ahead, else seconds until the next probe is due
+        with self.lock:
+            if self.state == 'closed': return None
+            now = time.monotonic()
+            if self.state == 'open':
+                remaining = self.opened_at + self.cooldown - now
+                if remaining > 0: return remaining
+                self.state = 'half_open'
+
+            # half open: exactly one probe at a time; a probe that never reported back is replaced
+            if self.probe_started is not None and now - self.probe_started < PROBE_TIMEOUT: return 1.0
+            self.probe_started = now
+            return None
+
+    def release(self):
+        # the probe slot was granted but the call never went out
+        with self.lock: self.probe_started = None
+
+    def succeeded(self):
+        with self.lock:
+            self.state, self.failures, self.cooldown, self.probe_started = 'closed', 0, self.base_cooldown, None
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open': self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN)
+            elif self.state == 'open' or self.failures < self.threshold: return
+            self.state, self.opened_at, self.probe_started = 'open', time.monotonic(), None
+            self.opened += 1
+
+    def stats(self):
+        with self.lock: return {'state': self.state, 'failures': self.failures, 'opened': self.opened}
+
+class HostLimiter:
+    def __init__(self, rates=None, max_wait=None, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        # rates given here (from the environment) are fixed; limit() only sets the others
+        self.rates = dict(rates or {})
+        self.fixed = frozenset(self.rates)
+        self.max_wait = max_wait
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.hosts = {}
+        self.rejected = {}
+        self.lock = threading.Lock()
+
+    def entry(self, host):
+        entry = self.hosts.get(host)
+        if entry is None:
+            with self.lock: entry = self.hosts.setdefault(host, (AdaptiveBucket(self.rates.get(host)), CircuitBreaker(self.threshold, self.cooldown)))
+        return entry
+
+    def limit(self, host, rate):
+        # a rate chosen in code (the crawler's, AniList's); one configured up front still wins
+        if host in self.fixed: return
+        with self.lock:
+            self.rates[host] = rate
+            entry = self.hosts.get(host)
+        if entry: entry[0].configure(rate)
+
+    def reject(self, error):
+        with self.lock: self.rejected[(error.host, error.reason)] = self.rejected.get((error.host, error.reason), 0) + 1
+        raise error
+
+    def admit(self, url, max_wait=None):
+        # -> seconds to wait before sending; raises instead of queueing behind a dead or rate-limited host
+        host = host_of(url)
+        bucket, breaker = self.entry(host)
+        remaining = breaker.allow()
+        if remaining is not None: self.reject(HostUnavailable(host, remaining))
+
+        wait = bucket.reserve(self.max_wait if max_wait is None else max_wait)
+        if wait is None:
+            breaker.release()
+            self.reject(Throttled(host, bucket.next_slot()))
+        return wait
+
+    def wait(self, url, max_wait=None):
+        delay = self.admit(url, max_wait)
+        if delay: time.sleep(delay)
+
+    async def acquire(self, url, max_wait=None):
+        delay = self.admit(url, max_wait)
+        if delay: await asyncio.sleep(delay)
+
+    def record(self, url, status=None, error=None, headers=None):
+        bucket, breaker = self.entry(host_of(url))
+        if is_failure(status, error): breaker.failed()
+        else: breaker.succeeded()
+
+        if status == 429 or (status == 503 and headers is not None and 'Retry-After' in headers): bucket.throttle(retry_after(headers))
+        elif error is None and status is not None and status < 400: bucket.recover()
+
+    def stats(self):
+        with self.lock:
+            hosts, rejected = dict(self.hosts), dict(self.rejected)
+        stats = {}
+        for host, (bucket, breaker) in hosts.items():
+            stats[host] = dict(bucket.stats(), **breaker.stats())
+            stats[host]['rejected'] = sum(count for (item_host, _), count in rejected.items() if item_host == host)
+        return stats
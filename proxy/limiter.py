@@ -0,0 +1,14 @@
+import os
+from hostlimits import HostLimiter, HostUnavailable, Rejected, Throttled, parse_rates
+
+# The proxy's per-host rate limits and circuit breakers (hostlimits.py), shared by every request in the
+# process. Hosts start out unthrottled unless PROXY_HOST_RATES gives them a rate ("hianime.nz=5,graphql.anilist.co=0.5",
+# requests per second). PROXY_BREAKER_FAILURES failures in a row open a host's breaker for PROXY_BREAKER_COOLDOWN
+# seconds, doubling while its probes keep failing.
+FAILURE_THRESHOLD = int(os.environ.get('PROXY_BREAKER_FAILURES', 5))
+COOLDOWN = float(os.environ.get('PROXY_BREAKER_COOLDOWN', 10))
+# a request that would have to queue longer than this for its host is turned away with a 429 instead
+MAX_WAIT = float(os.environ.get('PROXY_MAX_WAIT', 2))
+HOST_RATES = parse_rates(os.environ.get('PROXY_HOST_RATES', ''))
+
+limiter = HostLimiter(HOST_RATES, MAX_WAIT, FAILURE_THRESHOLD, COOLDOWN)
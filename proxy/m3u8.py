@@ -0,0 +1,97 @@
+import re
+from urllib.parse import quote, urljoin, urlsplit
+
+PLAYLIST_TYPES = ('application/vnd.apple.mpegurl', 'application/x-mpegurl', 'audio/mpegurl', 'audio/x-mpegurl')
+PLAYLIST_TYPE = 'application/vnd.apple.mpegurl'
+URI_ATTRIBUTE = re.compile(r'URI="([^"]+)"')
+
+def is_playlist(url, content_type, head=b''):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in PLAYLIST_TYPES: return True
+    if urlsplit(url).path.lower().endswith('.m3u8'): return True
+    return head.lstrip().startswith(b'#EXTM3U')
+
+def proxied_url(url, encoded_headers):
+    # relative to the playlist's own /m3u8-proxy URL, so it also works behind a path prefix
+    return f'm3u8-proxy?url={quote(url, safe="")}&headers={encoded_headers}'
+
+def absolute(uri, base_url):
+    if uri.startswith(('data:', 'skd:')): return None
+    return urljoin(base_url, uri)
+
+def rewrite_line(line, base_url, encoded_headers):
+    stripped = line.strip()
+    if not stripped: return line
+
+    if stripped.startswith('#'):
+        if 'URI="' not in stripped: return line
+
+        def replace(match):
+            target = absolute(match.group(1), base_url)
+            return f'URI="{proxied_url(target, encoded_headers)}"' if target else match.group(0)
+
+        return URI_ATTRIBUTE.sub(replace, line)
+
+    target = absolute(stripped, base_url)
+    return proxied_url(target, encoded_headers) if target else line
+
+class PlaylistScan:
+    # what the rewriter saw go by: media segment URLs in playlist order (a master's variant URIs are not segments)
+    __slots__ = ('base_url', 'segments', 'ended', 'master', 'variant_next')
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.segments = []
+        self.ended = False
+        self.master = False
+        self.variant_next = False
+
+    def line(self, line):
+        stripped = line.strip()
+        if not stripped: return
+        if stripped.startswith('#'):
+            if stripped.startswith(('#EXT-X-STREAM-INF', '#EXT-X-I-FRAME-STREAM-INF')): self.master = True
+            if stripped.startswith('#EXT-X-STREAM-INF'): self.variant_next = True
+            elif stripped.startswith('#EXT-X-ENDLIST'): self.ended = True
+            return
+        if self.variant_next: self.variant_next = False
+        elif not self.master:
+            target = absolute(stripped, self.base_url)
+            if target: self.segments.append(target)
+
+class LineSplitter:
+    # feeds arbitrary network chunks in, hands complete lines out; only the unfinished tail is buffered
+    def __init__(self):
+        self.tail = b''
+
+    def feed(self, chunk):
+        data = self.tail + chunk
+        *lines, self.tail = data.split(b'\n')
+        return [line.rstrip(b'\r').decode('utf-8', 'replace') for line in lines]
+
+    def flush(self):
+        tail, self.tail = self.tail, b''
+        return [tail.rstrip(b'\r').decode('utf-8', 'replace')] if tail else []
+
+def rewrite_lines(lines, base_url, encoded_headers, scan=None):
+    if scan:
+        for line in lines: scan.line(line)
+    return ''.join(rewrite_line(line, base_url, encoded_headers) + '\n' for line in lines).encode()
+
+def rewrite_chunks(chunks, base_url, encoded_headers, scan=None):
+    splitter = LineSplitter()
+    for chunk in chunks:
+        lines = splitter.feed(chunk)
+        if lines: yield rewrite_lines(lines, base_url, encoded_headers, scan)
+
+    lines = splitter.flush()
+    if lines: yield rewrite_lines(lines, base_url, encoded_headers, scan)
+
+async def arewrite_chunks(chunks, base_url, encoded_headers, scan=None):
+    splitter = LineSplitter()
+    async for chunk in chunks:
+        lines = splitter.feed(chunk)
+        if lines: yield rewrite_lines(lines, base_url, encoded_headers, scan)
+
+    lines = splitter.flush()
+    if lines: yield rewrite_lines(lines, base_url, encoded_headers, scan)
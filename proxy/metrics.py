@@ -0,0 +1,127 @@
+import bisect, os, threading, time
+from collections import deque
+from hostlimits import error_kind, host_of
+
+# Counters and latency histograms per upstream host, rendered in the Prometheus text format at /metrics.
+# Stages: connect (DNS + TCP; neither urllib3 nor httpcore time the lookup on its own), tls, ttfb
+# (request sent -> response headers) and total (until the last body byte). Requests slower than
+# PROXY_SLOW_MS end up in a short in-memory log (and on stdout).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGES = ('connect', 'tls', 'ttfb', 'total')
+SLOW_SECONDS = float(os.environ.get('PROXY_SLOW_MS', 2000)) / 1000
+SLOW_LOG_SIZE = int(os.environ.get('PROXY_SLOW_LOG', 200))
+PREFIX = 'quickwatch_proxy'
+
+def error_status(error):
+    # what the client gets back when the upstream fetch itself failed
+    kind = error_kind(error)
+    return 504 if kind == 'timeout' else 502 if kind in ('connect', 'protocol') else 500
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in values.items()) + '}'
+
+class Metrics:
+    def __init__(self, slow_seconds=SLOW_SECONDS, slow_log_size=SLOW_LOG_SIZE):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.slow_seconds = slow_seconds
+        self.slow = deque(maxlen=slow_log_size)
+        self.started = time.time()
+
+    def count(self, name, value=1, **label_values):
+        key = (name, tuple(label_values.items()))
+        with self.lock: self.counters[key] = self.counters.get(key, 0) + value
+
+    def timing(self, stage, host, seconds):
+        with self.lock:
+            histogram = self.histograms.get((stage, host))
+            if histogram is None: histogram = self.histograms[(stage, host)] = Histogram()
+            histogram.observe(seconds)
+
+    def upstream(self, host, status):
+        self.count('upstream_responses_total', host=host, status=status)
+
+    def error(self, host, error):
+        self.count('upstream_errors_total', host=host, kind=error_kind(error))
+
+    def finished(self, host, started, received):
+        # the upstream body has been read to the end (or abandoned)
+        self.timing('total', host, time.perf_counter() - started)
+        self.count('upstream_bytes_in_total', received, host=host)
+
+    def request(self, route, status, seconds, sent, url=None, cache=None):
+        self.count('requests_total', route=route, status=status)
+        self.count('bytes_out_total', sent, route=route)
+        if cache: self.count('cache_outcomes_total', outcome=cache.lower())
+        if seconds >= self.slow_seconds:
+            entry = {'at': time.time(), 'route': route, 'url': url, 'status': status, 'seconds': round(seconds, 3), 'bytes': sent, 'cache': cache}
+            with self.lock: self.slow.append(entry)
+            print(f"Slow request: {route} {url} -> {status} in {seconds:.2f}s")
+
+    def slow_requests(self):
+        with self.lock: return list(self.slow)
+
+    def render(self, gauges=None):
+        # gauges: {name: [(labels dict, value), ...]} sampled by the caller (pool, cache, single-flight state)
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(histogram.counts), histogram.sum, histogram.count) for key, histogram in self.histograms.items()}
+
+        lines = [f'# TYPE {PREFIX}_uptime_seconds gauge', f'{PREFIX}_uptime_seconds {time.time() - self.started:.3f}']
+        seen = set()
+        for (name, label_values), value in sorted(counters.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            if name not in seen:
+                lines.append(f'# TYPE {PREFIX}_{name} counter')
+                seen.add(name)
+            lines.append(f'{PREFIX}_{name}{labels(**dict(label_values))} {value}')
+
+        for stage in STAGES:
+            name = f'{PREFIX}_upstream_{stage}_seconds'
+            rows = sorted((host, data) for (item_stage, host), data in histograms.items() if item_stage == stage)
+            if rows: lines.append(f'# TYPE {name} histogram')
+            for host, (counts, total, count) in rows:
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS + ('+Inf',), counts):
+                    cumulative += bucket
+                    lines.append(f'{name}_bucket{labels(host=host, le=bound)} {cumulative}')
+                lines.append(f'{name}_sum{labels(host=host)} {total:.6f}')
+                lines.append(f'{name}_count{labels(host=host)} {count}')
+
+        for name, samples in (gauges or {}).items():
+            lines.append(f'# TYPE {PREFIX}_{name} gauge')
+            lines += [f'{PREFIX}_{name}{labels(**label_values) if label_values else ""} {value}' for label_values, value in samples]
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+def stat_gauges(pool=None, cache=None, singleflight=None, hosts=None, segments=None):
+    # flattens the /stats dicts into gauges for render()
+    gauges = {}
+    for host, entry in (pool or {}).items():
+        for field, value in entry.items(): gauges.setdefault(f'pool_{field}', []).append(({'host': host}, value))
+    for host, entry in (hosts or {}).items():
+        # rate is None while a host is unthrottled; the breaker state becomes a 0/1 "open" gauge
+        gauges.setdefault('host_breaker_open', []).append(({'host': host}, int(entry['state'] != 'closed')))
+        for field in ('rate', 'throttles', 'opened', 'rejected'):
+            if entry.get(field) is not None: gauges.setdefault(f'host_{field}', []).append(({'host': host}, entry[field]))
+    for section, stats in (('cache', cache), ('singleflight', singleflight), ('segments', segments)):
+        for field, value in (stats or {}).items():
+            if isinstance(value, (int, float)): gauges[f'{section}_{field}'] = [({}, value)]
+    return gauges
@@ -0,0 +1,34 @@
+import os, sqlite3, threading, time
+
+# PROXY_STREAM_CACHE points at the providers' resolved-stream cache (testing/providers/streamcache.py).
+# When it is set, upstream 403/410s seen by /m3u8-proxy are recorded there so the next lookup of
+# whatever resolved that URL goes back to the browser instead of handing out a dead token.
+REVOKE_STATUSES = (403, 410)
+
+class Revocations:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.lock = threading.Lock()
+        self.recorded = 0
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS revoked (url TEXT PRIMARY KEY, status INTEGER, revoked_at REAL)')
+
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get('PROXY_STREAM_CACHE')
+        return cls(path) if path else None
+
+    def record(self, url, status):
+        if status not in REVOKE_STATUSES: return False
+        try:
+            with self.lock, self.db:
+                self.db.execute('INSERT OR REPLACE INTO revoked VALUES (?, ?, ?)', (url, status, time.time()))
+            self.recorded += 1
+            return True
+        except sqlite3.Error as e:
+            print(f"Could not record revoked stream {url}: {e}")
+            return False
+
+    def stats(self):
+        return {'recorded': self.recorded}
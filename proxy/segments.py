@@ -0,0 +1,281 @@
+import asyncio, hashlib, json, os, threading, time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# HLS segments shared by everyone watching the same stream. Every media playlist served through
+# /m3u8-proxy is indexed; a request for one of its segments (the playhead) prefetches the next
+# PROXY_PREFETCH_SEGMENTS, and playlists prefetch their first segments (VOD) or newest ones (live) as
+# they are served. Segments land in a small per-process memory tier and in a directory on disk that
+# every worker shares; disk hits are sent as files so the server can use sendfile where it supports it.
+PREFETCH_AHEAD = int(os.environ.get('PROXY_PREFETCH_SEGMENTS', 3))
+PREFETCH_WORKERS = int(os.environ.get('PROXY_PREFETCH_WORKERS', 8))
+# a client asking for a segment that is being prefetched waits this long for it before fetching it itself
+PREFETCH_WAIT = 15.0
+MAX_PLAYLISTS = 256
+SEGMENT_DIR = os.environ.get('PROXY_SEGMENT_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'quickwatch', 'segments'))
+STORED_HEADERS = ('Content-Type', 'Content-Encoding')
+
+def parse_names(spec):
+    return frozenset(filter(None, (part.strip() for part in spec.split(','))))
+
+def byte_range(header, size):
+    # single "bytes=a-b" / "bytes=a-" / "bytes=-n" range -> (start, end inclusive); None means send everything
+    unit, _, spec = (header or '').partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec: return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first: start, end = max(size - int(last), 0), size - 1
+        else: start, end = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError: return None
+    return (start, end) if start <= end < size else None
+
+class Segment:
+    __slots__ = ('headers', 'size', 'body', 'path')
+
+    def __init__(self, headers, size, body=None, path=None):
+        self.headers = headers
+        self.size = size
+        self.body = body
+        self.path = path
+
+class SegmentStore:
+    def __init__(self, memory_bytes, disk_bytes, directory, entry_bytes, ttl, ignore_params=(), event=threading.Event):
+        self.memory_bytes = memory_bytes
+        self.memory_entry_bytes = max(memory_bytes // 32, 1)
+        self.disk_bytes = disk_bytes
+        self.directory = directory if disk_bytes else None
+        self.entry_bytes = entry_bytes
+        self.ttl = ttl
+        self.ignore_params = frozenset(ignore_params)
+        self.event = event
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        # bytes written since the directory was last measured; other workers write to it too
+        self.disk_written = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'too_large': 0, 'disk_evictions': 0, 'expired': 0}
+        if self.directory: os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, event=threading.Event):
+        return cls(
+            memory_bytes=int(os.environ.get('PROXY_SEGMENT_MEMORY_BYTES', 128 * 1024 * 1024)),
+            disk_bytes=int(os.environ.get('PROXY_SEGMENT_DISK_BYTES', 2 * 1024 * 1024 * 1024)),
+            directory=SEGMENT_DIR,
+            entry_bytes=int(os.environ.get('PROXY_SEGMENT_ENTRY_BYTES', 32 * 1024 * 1024)),
+            ttl=float(os.environ.get('PROXY_SEGMENT_TTL', 6 * 60 * 60)),
+            ignore_params=parse_names(os.environ.get('PROXY_SEGMENT_KEY_IGNORE', '')),
+            event=event,
+        )
+
+    def key(self, url):
+        # query parameters named in PROXY_SEGMENT_KEY_IGNORE (per-viewer tokens) don't split the cache
+        if self.ignore_params:
+            parts = urlsplit(url)
+            query = urlencode([(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name not in self.ignore_params])
+            url = urlunsplit(parts._replace(query=query))
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def paths(self, key):
+        return os.path.join(self.directory, f'{key}.seg'), os.path.join(self.directory, f'{key}.json')
+
+    def get_memory(self, key):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None: return None
+            stored_at, segment = entry
+            if time.time() - stored_at >= self.ttl:
+                self.drop_memory(key)
+                self.counters['expired'] += 1
+                return None
+            self.memory.move_to_end(key)
+            self.counters['memory_hits'] += 1
+            return segment
+
+    def get(self, key):
+        segment = self.get_memory(key)
+        if segment is not None or not self.directory: return segment or self.miss()
+
+        body_path, meta_path = self.paths(key)
+        try:
+            with open(meta_path) as f: meta = json.load(f)
+            size = os.stat(body_path).st_size
+        except (OSError, ValueError): return self.miss()
+        if size != meta['size'] or time.time() - meta['stored_at'] >= self.ttl:
+            self.unlink(key)
+            return self.miss()
+
+        # hits count as use for the disk LRU, which goes by modification time
+        try: os.utime(meta_path)
+        except OSError: pass
+        with self.lock: self.counters['disk_hits'] += 1
+        return Segment(meta['headers'], size, path=body_path)
+
+    def miss(self):
+        with self.lock: self.counters['misses'] += 1
+        return None
+
+    def claim(self, key, prefetch=False):
+        # -> True when the caller should fetch the segment; False when it is cached or already on its way.
+        # Only a prefetch's claim is waited on: a client's lasts as long as its own playback does
+        with self.lock:
+            if key in self.pending or key in self.memory: return False
+            self.pending[key] = (self.event(), prefetch)
+        if self.directory and os.path.exists(self.paths(key)[1]):
+            self.release(key)
+            return False
+        return True
+
+    def waiter(self, key):
+        with self.lock: event, prefetch = self.pending.get(key, (None, False))
+        return event if prefetch else None
+
+    def release(self, key):
+        with self.lock: event, _ = self.pending.pop(key, (None, False))
+        if event is not None: event.set()
+
+    def put(self, key, headers, body):
+        if len(body) > self.entry_bytes:
+            with self.lock: self.counters['too_large'] += 1
+            return
+        headers = {name: headers[name] for name in STORED_HEADERS if name in headers}
+        now = time.time()
+
+        if len(body) <= self.memory_entry_bytes:
+            with self.lock:
+                self.drop_memory(key)
+                self.memory[key] = (now, Segment(headers, len(body), body=body))
+                self.memory_size += len(body)
+                while self.memory_size > self.memory_bytes and self.memory: self.drop_memory(next(iter(self.memory)))
+
+        if self.directory: self.write(key, headers, body, now)
+        with self.lock: self.counters['stores'] += 1
+
+    def drop_memory(self, key):
+        entry = self.memory.pop(key, None)
+        if entry is not None: self.memory_size -= entry[1].size
+
+    def write(self, key, headers, body, now):
+        # body first, metadata last: a segment only exists for readers once its .json is in place
+        body_path, meta_path = self.paths(key)
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(body_path + suffix, 'wb') as f: f.write(body)
+            os.replace(body_path + suffix, body_path)
+            with open(meta_path + suffix, 'w') as f: json.dump({'headers': headers, 'size': len(body), 'stored_at': now}, f)
+            os.replace(meta_path + suffix, meta_path)
+        except OSError as e:
+            print(f"Segment cache write failed: {e}")
+            return
+
+        with self.lock:
+            self.disk_written += len(body)
+            over = self.disk_written > self.disk_bytes // 10
+            if over: self.disk_written = 0
+        if over: self.trim()
+
+    def trim(self):
+        # measures the shared directory and removes the least recently used segments down to 90% of the budget
+        entries, total = [], 0
+        try:
+            with os.scandir(self.directory) as scan:
+                for item in scan:
+                    if not item.name.endswith('.json'): continue
+                    key = item.name[:-5]
+                    try: size = os.stat(self.paths(key)[0]).st_size
+                    except OSError: size = 0
+                    entries.append((item.stat().st_mtime, key, size))
+                    total += size
+        except OSError: return
+
+        entries.sort()
+        target = self.disk_bytes * 0.9
+        for _, key, size in entries:
+            if total <= target: break
+            self.unlink(key)
+            total -= size
+            with self.lock: self.counters['disk_evictions'] += 1
+
+    def unlink(self, key):
+        for path in reversed(self.paths(key)):
+            try: os.unlink(path)
+            except OSError: pass
+
+    def tee(self, key, headers, chunks):
+        # passes chunks through and stores the body once it has been read to the end
+        parts, total = [], 0
+        for chunk in chunks:
+            if parts is not None:
+                total += len(chunk)
+                if total > self.entry_bytes: parts = None
+                else: parts.append(chunk)
+            yield chunk
+        if parts is not None: self.put(key, headers, b''.join(parts))
+
+    async def atee(self, key, headers, chunks):
+        parts, total = [], 0
+        async for chunk in chunks:
+            if parts is not None:
+                total += len(chunk)
+                if total > self.entry_bytes: parts = None
+                else: parts.append(chunk)
+            yield chunk
+        if parts is not None: await asyncio.to_thread(self.put, key, headers, b''.join(parts))
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, memory_entries=len(self.memory), memory_bytes=self.memory_size, pending=len(self.pending))
+
+class Playlists:
+    # media playlists we have served: segment order per playlist, and where each segment sits in it
+    def __init__(self, ahead=PREFETCH_AHEAD, limit=MAX_PLAYLISTS):
+        self.ahead = ahead
+        self.limit = limit
+        self.playlists = OrderedDict()   # playlist url -> (segment urls, upstream headers)
+        self.positions = {}              # segment url -> (playlist url, index)
+        self.lock = threading.Lock()
+        self.counters = {'indexed': 0, 'planned': 0}
+
+    def served(self, url, headers, scan):
+        # -> [(segment url, headers)] to prefetch now: the opening segments of a VOD playlist the first time
+        # it is seen, the newest ones of a live playlist every time it is refreshed
+        if scan.master or not scan.segments: return []
+        with self.lock:
+            first_time = url not in self.playlists
+            self.forget(url)
+            self.playlists[url] = (scan.segments, headers)
+            for index, segment in enumerate(scan.segments): self.positions[segment] = (url, index)
+            while len(self.playlists) > self.limit: self.forget(next(iter(self.playlists)))
+            self.counters['indexed'] += 1
+
+        if not self.ahead: return []
+        if scan.ended: chosen = scan.segments[:self.ahead] if first_time else []
+        else: chosen = scan.segments[-self.ahead:]
+        return self.planned([(segment, headers) for segment in chosen])
+
+    def forget(self, url):
+        segments, _ = self.playlists.pop(url, ((), None))
+        for segment in segments:
+            if self.positions.get(segment, (None,))[0] == url: del self.positions[segment]
+
+    def known(self, url):
+        with self.lock: return url in self.positions
+
+    def upcoming(self, url):
+        # -> the next segments after this one, from the playlist it was listed in
+        with self.lock:
+            position = self.positions.get(url)
+            if position is None: return []
+            playlist, index = position
+            self.playlists.move_to_end(playlist)
+            segments, headers = self.playlists[playlist]
+            chosen = segments[index + 1:index + 1 + self.ahead]
+        return self.planned([(segment, headers) for segment in chosen])
+
+    def planned(self, items):
+        with self.lock: self.counters['planned'] += len(items)
+        return items
+
+    def stats(self):
+        with self.lock: return dict(self.counters, playlists=len(self.playlists), segments=len(self.positions))
@@ -0,0 +1,362 @@
+import asyncio, os, re, threading
+
+# One upstream fetch per key: the first caller starts a pump, everyone (including it) reads the flight
+# through a reader of its own. The first REPLAY_BYTES of the body stay on the flight so late joiners
+# replay from byte 0 (cacheable responses are no bigger than that); past that point the flight stops
+# taking joiners, chunks are dropped once every reader has had them, and the pump waits whenever the
+# fastest reader is more than WINDOW bytes behind. A reader that falls WINDOW bytes behind the fastest
+# one is detached and fetches the rest with a Range request of its own, so one slow client doesn't set
+# the pace for everyone; readers that can't resume that way (suffix or multi-part ranges) keep pacing
+# the pump instead. When the last reader leaves, the pump gives up.
+REPLAY_BYTES = 4 * 1024 * 1024
+WINDOW = 1024 * 1024
+# the Flask server runs pumps on a pool of this many threads; fetches past that queue for a free one
+PUMP_WORKERS = int(os.environ.get('PROXY_PUMP_WORKERS', 64))
+
+def request_key(url, headers):
+    # every forwarded header counts: two GETs only share a fetch when upstream would see the same request
+    return (url, tuple(sorted((name.lower(), str(value)) for name, value in (headers or {}).items())))
+
+RESUMABLE_RANGE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+def range_header(headers):
+    return next((value for name, value in (headers or {}).items() if name.lower() == 'range'), None)
+
+def can_resume(headers):
+    # a plain GET, or one for "bytes=a-" / "bytes=a-b", can be picked up again part way
+    value = range_header(headers)
+    return value is None or bool(RESUMABLE_RANGE.match(value.strip()))
+
+def resume_headers(headers, status, offset):
+    # the request that continues a body of the given status from byte offset of what the flight sent
+    start, last = 0, ''
+    match = RESUMABLE_RANGE.match((range_header(headers) or '').strip())
+    if match and status == 206: start, last = int(match.group(1)), match.group(2)
+    resumed = {name: value for name, value in headers.items() if name.lower() != 'range'}
+    resumed['Range'] = f'bytes={start + offset}-{last}'
+    return resumed
+
+def resume_skip(status, resumed_status, offset):
+    # -> bytes to drop from the resumed body: none for a 206, all of offset when upstream ignored the Range
+    if resumed_status == 206: return 0
+    if resumed_status == 200 and status == 200: return offset
+    raise RuntimeError(f'Upstream answered {resumed_status} when resuming a body at byte {offset}')
+
+class Lagging(Exception):
+    # raised to a reader that was detached; it carries how many bytes the reader already had
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.offset = offset
+
+class FlightBuffer:
+    # the bookkeeping both flight kinds share; callers hold whatever lock the flight needs
+    def __init__(self, replay_bytes=REPLAY_BYTES, window=WINDOW):
+        self.replay_bytes = replay_bytes
+        self.window = window
+        self.status = None
+        self.headers = None
+        self.chunks = []
+        self.offset = 0          # index of chunks[0] within the whole body
+        self.buffered = 0
+        self.received = 0
+        self.positions = {}      # reader id -> index of the next chunk it wants
+        self.delivered = {}      # reader id -> bytes handed out to it so far
+        self.resumable = set()   # readers that can be detached
+        self.lagging = {}        # detached reader id -> its byte offset, until the reader notices
+        self.detached = 0
+        self.started = False
+        self.done = False
+        self.abandoned = False
+        self.error = None
+
+    def add_reader(self, reader_id, resumable=False):
+        # a flight that has dropped the start of its body, or that everyone left, takes no more readers
+        if self.abandoned or self.received > self.replay_bytes: return False
+        self.positions[reader_id] = 0
+        self.delivered[reader_id] = 0
+        if resumable: self.resumable.add(reader_id)
+        return True
+
+    def behind(self):
+        return {reader_id: self.received - self.delivered[reader_id] for reader_id in self.positions}
+
+    def full(self):
+        # the pump waits for the fastest reader, and for any reader that can't be detached
+        if not self.positions or self.received <= self.replay_bytes: return False
+        behind = self.behind()
+        if min(behind.values()) > self.window: return True
+        return any(lag > self.window for reader_id, lag in behind.items() if reader_id not in self.resumable)
+
+    def detach_lagging(self):
+        behind = self.behind()
+        fastest = min(behind.values(), default=0)
+        for reader_id, lag in behind.items():
+            if reader_id in self.resumable and lag - fastest > self.window:
+                self.lagging[reader_id] = self.delivered[reader_id]
+                del self.positions[reader_id]
+                self.detached += 1
+
+    def push(self, chunk):
+        # -> False once nobody is reading any more; the pump should stop fetching
+        if not self.positions:
+            self.abandoned = True
+            return False
+        self.chunks.append(chunk)
+        self.buffered += len(chunk)
+        self.received += len(chunk)
+        if self.received > self.replay_bytes: self.detach_lagging()
+        self.trim()
+        return True
+
+    def take(self, reader_id):
+        # -> the chunks this reader hasn't had yet, None when it has to wait for more
+        if reader_id in self.lagging: raise Lagging(self.lagging.pop(reader_id))
+        position = self.positions[reader_id]
+        if position >= self.offset + len(self.chunks):
+            if not self.done: return None
+            if self.error: raise self.error
+            return []
+        pending = self.chunks[position - self.offset:]
+        self.positions[reader_id] = self.offset + len(self.chunks)
+        self.delivered[reader_id] += sum(len(chunk) for chunk in pending)
+        self.trim()
+        return pending
+
+    def remove_reader(self, reader_id):
+        self.positions.pop(reader_id, None)
+        self.delivered.pop(reader_id, None)
+        self.lagging.pop(reader_id, None)
+        self.resumable.discard(reader_id)
+        self.trim()
+
+    def trim(self):
+        if self.received <= self.replay_bytes: return
+        consumed = min(self.positions.values(), default=self.offset + len(self.chunks)) - self.offset
+        if consumed <= 0: return
+        self.buffered -= sum(len(chunk) for chunk in self.chunks[:consumed])
+        del self.chunks[:consumed]
+        self.offset += consumed
+
+class Reader:
+    def __init__(self, flight, resume=None):
+        self.flight = flight
+        self.resume = resume     # resume(status, offset) -> the rest of the body, for a detached reader
+        self.own = None
+        self.pending = iter(())
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.own is not None: return self.next_own()
+        while True:
+            chunk = next(self.pending, None)
+            if chunk is not None: return chunk
+            if self.closed: raise StopIteration
+            try: chunks = self.flight.read(id(self))
+            except Lagging as lagging:
+                self.flight.detach(id(self))
+                self.own = iter(self.resume(self.flight.status, lagging.offset))
+                return self.next_own()
+            except BaseException:
+                self.close()
+                raise
+            if not chunks:
+                self.close()
+                raise StopIteration
+            self.pending = iter(chunks)
+
+    def next_own(self):
+        try: return next(self.own)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # WSGI servers call this when the client goes away, even if the body was never started
+        if self.closed: return
+        self.closed = True
+        self.flight.detach(id(self))
+        if hasattr(self.own, 'close'): self.own.close()
+
+    __del__ = close
+
+class Flight(FlightBuffer):
+    def __init__(self, replay_bytes=REPLAY_BYTES, window=WINDOW):
+        super().__init__(replay_bytes, window)
+        self.cond = threading.Condition()
+
+    def attach(self, resume=None):
+        # -> a Reader from byte 0, or None when the flight no longer takes readers
+        reader = Reader(self, resume)
+        with self.cond:
+            if self.add_reader(id(reader), resume is not None): return reader
+        reader.closed = True
+        return None
+
+    def detach(self, reader_id):
+        with self.cond:
+            self.remove_reader(reader_id)
+            self.cond.notify_all()
+
+    def start(self, status, headers):
+        with self.cond:
+            self.status, self.headers, self.started = status, headers, True
+            self.cond.notify_all()
+
+    def append(self, chunk):
+        with self.cond:
+            while self.full(): self.cond.wait()
+            if not self.push(chunk): return False
+            self.cond.notify_all()
+            return True
+
+    def finish(self, error=None):
+        with self.cond:
+            self.error, self.done = error, True
+            self.cond.notify_all()
+
+    def wait_started(self):
+        # raises the upstream error for every waiter if the fetch failed before any headers arrived
+        with self.cond:
+            while not self.started and not self.done: self.cond.wait()
+            if not self.started: raise self.error or RuntimeError('Upstream fetch ended without a response')
+            return self.status, self.headers
+
+    def read(self, reader_id):
+        with self.cond:
+            while True:
+                chunks = self.take(reader_id)
+                if chunks is not None: break
+                self.cond.wait()
+            self.cond.notify_all()
+            return chunks
+
+class AsyncReader:
+    def __init__(self, flight, resume=None):
+        self.flight = flight
+        self.resume = resume
+        self.own = None
+        self.pending = iter(())
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.own is not None: return await self.next_own()
+        while True:
+            chunk = next(self.pending, None)
+            if chunk is not None: return chunk
+            if self.closed: raise StopAsyncIteration
+            try: chunks = await self.flight.read(id(self))
+            except Lagging as lagging:
+                self.flight.detach(id(self))
+                self.own = aiter(self.resume(self.flight.status, lagging.offset))
+                return await self.next_own()
+            except BaseException:
+                self.close()
+                raise
+            if not chunks:
+                self.close()
+                raise StopAsyncIteration
+            self.pending = iter(chunks)
+
+    async def next_own(self):
+        try: return await anext(self.own)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # a cancelled response task drops its reader without finishing it; that counts as leaving too
+        if self.closed: return
+        self.closed = True
+        self.flight.detach(id(self))
+
+    async def aclose(self):
+        self.close()
+        if hasattr(self.own, 'aclose'): await self.own.aclose()
+
+    __del__ = close
+
+class AsyncFlight(FlightBuffer):
+    # everything runs on one event loop, so instead of a lock there is an event that is set and replaced on every change
+    def __init__(self, replay_bytes=REPLAY_BYTES, window=WINDOW):
+        super().__init__(replay_bytes, window)
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def attach(self, resume=None):
+        reader = AsyncReader(self, resume)
+        if self.add_reader(id(reader), resume is not None): return reader
+        reader.closed = True
+        return None
+
+    def detach(self, reader_id):
+        self.remove_reader(reader_id)
+        self.notify()
+
+    async def start(self, status, headers):
+        self.status, self.headers, self.started = status, headers, True
+        self.notify()
+
+    async def append(self, chunk):
+        while self.full(): await self.changed.wait()
+        if not self.push(chunk): return False
+        self.notify()
+        return True
+
+    async def finish(self, error=None):
+        self.error, self.done = error, True
+        self.notify()
+
+    async def wait_started(self):
+        while not self.started and not self.done: await self.changed.wait()
+        if not self.started: raise self.error or RuntimeError('Upstream fetch ended without a response')
+        return self.status, self.headers
+
+    async def read(self, reader_id):
+        while True:
+            chunks = self.take(reader_id)
+            if chunks is not None: break
+            await self.changed.wait()
+        self.notify()
+        return chunks
+
+class SingleFlight:
+    def __init__(self, flight_class=Flight, replay_bytes=REPLAY_BYTES, window=WINDOW):
+        self.flight_class = flight_class
+        self.replay_bytes = replay_bytes
+        self.window = window
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = {'leaders': 0, 'followers': 0, 'abandoned': 0, 'detached': 0}
+
+    def join(self, key, resume=None):
+        # returns (reader, leader); only the leader should start the upstream fetch (of reader.flight)
+        with self.lock:
+            flight = self.flights.get(key)
+            reader = flight.attach(resume) if flight is not None else None
+            if reader is not None:
+                self.counters['followers'] += 1
+                return reader, False
+
+            # no flight, or one too far along to replay: this caller starts a new one
+            flight = self.flights[key] = self.flight_class(self.replay_bytes, self.window)
+            self.counters['leaders'] += 1
+            return flight.attach(resume), True
+
+    def forget(self, key, flight):
+        with self.lock:
+            if self.flights.get(key) is flight: del self.flights[key]
+            if flight.abandoned: self.counters['abandoned'] += 1
+            self.counters['detached'] += flight.detached
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.flights))
@@ -0,0 +1,45 @@
+import os, sys
+import pytest
+from starlette.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+@pytest.fixture(scope='module')
+def origin():
+    server, base_url = origins.start()
+    yield base_url
+    server.shutdown()
+
+@pytest.fixture
+def client():
+    from asgi import app
+    with TestClient(app) as client: yield client
+
+def test_pool_stats_count_reused_connections(origin, client):
+    for kb in (1, 2, 3):
+        resp = client.post('/proxy', json={'url': f'{origin}/page?kb={kb}', 'method': 'GET'})
+        assert resp.status_code == 200
+
+    entry = client.get('/stats').json()['pool']['127.0.0.1']
+    assert entry['requests'] == 3 and entry['misses'] == 1 and entry['hits'] == 2
+    assert 'pool_hits{host="127.0.0.1"} 2' in client.get('/metrics').text
+
+def test_playlist_rewrite_error_closes_upstream(origin, client, monkeypatch):
+    import asgi, m3u8
+    opened = []
+    fetch = asgi.fetch
+    async def recording_fetch(*args, **kwargs):
+        resp = await fetch(*args, **kwargs)
+        opened.append(resp)
+        return resp
+    def broken(*args, **kwargs):
+        raise ValueError('bad playlist')
+    monkeypatch.setattr(asgi, 'fetch', recording_fetch)
+    monkeypatch.setattr(m3u8, 'arewrite_chunks', broken)
+
+    resp = client.get('/m3u8-proxy', params={'url': f'{origin}/playlist.m3u8?segments=3'})
+    assert resp.status_code >= 500
+    assert opened and opened[0].is_closed
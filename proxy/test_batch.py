@@ -0,0 +1,84 @@
+import gzip, json, os, sys, zlib
+import pytest
+from starlette.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+import batch
+
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+@pytest.fixture(scope='module')
+def origin():
+    server, base_url = origins.start()
+    yield base_url
+    server.shutdown()
+
+def items(origin):
+    return [
+        {'url': origin + '/page?kb=1', 'method': 'GET'},
+        {'url': origin + '/page?kb=1', 'method': 'DELETE'},
+        {'method': 'GET'},
+        {'url': origin + '/error?status=503', 'method': 'GET'},
+        {'url': origin + '/segment?kb=1', 'method': 'GET'},
+        {'url': origin + '/page?kb=1', 'method': 'POST', 'form_data': {'q': 'x'}},
+    ]
+
+def check(results, origin):
+    by_index = {result['index']: result for result in results}
+    assert sorted(by_index) == list(range(6))
+    assert by_index[0]['status'] == 200 and by_index[0]['body'].startswith('<!doctype html>')
+    assert by_index[1]['error'] == 'Only GET and POST methods are allowed'
+    assert by_index[2] == {'index': 2, 'url': None, 'error': 'URL is required'}
+    assert by_index[3]['status'] == 503 and by_index[3]['body'] == 'upstream error'
+    # the segment's bytes aren't UTF-8, so they come back base64-encoded
+    assert 'body' not in by_index[4] and len(by_index[4]['body_base64']) == 1368
+    assert by_index[5]['status'] == 200 and by_index[5]['headers'] == {'Content-Type': 'text/html; charset=utf-8'}
+
+def test_parse_items_rejects_the_batch_not_single_items():
+    assert batch.parse_items({'requests': []}) == (None, 'A non-empty list of requests is required')
+    assert batch.parse_items({'requests': [{}] * (batch.MAX_ITEMS + 1)})[1].startswith('At most')
+    assert batch.parse_items([{'url': 'u'}]) == ([{'url': 'u'}], None)
+    assert batch.item_error('not a dict') == 'URL is required'
+    assert batch.item_error({'url': 'u', 'method': 'get'}) is None
+
+def test_bodies_are_decoded_per_content_encoding():
+    body = b'{"ok": true}'
+    assert batch.decode_body(gzip.compress(body), 'gzip') == body
+    assert batch.decode_body(zlib.compress(body), 'deflate') == body
+    raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert batch.decode_body(raw.compress(body) + raw.flush(), 'deflate') == body
+    assert batch.decode_body(body, None) == body
+
+    part = json.loads(batch.json_part(0, {'url': 'u'}, 200, {'Content-Encoding': 'gzip'}, gzip.compress(body)))
+    assert part['body'] == '{"ok": true}' and part['headers'] == {}
+
+def test_multipart_writer_frames_every_part():
+    writer = batch.Writer('multipart')
+    body = writer.start() + writer.part(0, {'url': 'u'}, 200, {'Content-Type': 'text/plain'}, b'hello')
+    body += writer.part(1, {'url': 'v'}, error='boom') + writer.end()
+
+    assert writer.content_type == f'multipart/mixed; boundary={writer.boundary}'
+    parts = body.split(f'--{writer.boundary}'.encode())
+    assert parts[0] == b'' and parts[-1] == b'--\r\n'
+    assert b'X-Batch-Index: 0\r\nX-Upstream-Status: 200\r\nContent-Type: text/plain\r\n\r\nhello\r\n' in parts[1]
+    assert b'X-Batch-Error: boom' in parts[2] and parts[2].endswith(b'boom\r\n')
+
+def test_flask_batch(origin):
+    from app import app
+    resp = app.test_client().post('/proxy/batch', json={'requests': items(origin)})
+    assert resp.status_code == 200 and resp.mimetype == 'application/json'
+    check(resp.get_json(), origin)
+
+    assert app.test_client().post('/proxy/batch', json={'requests': []}).status_code == 400
+
+def test_asgi_batch(origin):
+    from asgi import app
+    with TestClient(app) as client:
+        resp = client.post('/proxy/batch', json={'requests': items(origin)})
+        assert resp.status_code == 200
+        check(resp.json(), origin)
+
+        resp = client.post('/proxy/batch', json={'requests': items(origin)[:2], 'format': 'multipart'})
+        assert resp.headers['Content-Type'].startswith('multipart/mixed; boundary=')
+        assert resp.content.count(b'X-Batch-Index: ') == 2
@@ -0,0 +1,103 @@
+import os, sys, time
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+import cache as cache_module
+from cache import ResponseCache, parse_rules
+
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+@pytest.fixture
+def clock(monkeypatch):
+    # entries read time.monotonic through the module, so only the cache sees the fake clock
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+@pytest.fixture(scope='module')
+def origin():
+    server, base_url = origins.start()
+    yield base_url
+    server.shutdown()
+
+def test_rules_match_subdomains():
+    cache = ResponseCache(1024, parse_rules('hianime.nz=300, graphql.anilist.co=60'), default_ttl=5)
+    assert cache.ttl_for('https://hianime.nz/home') == 300
+    assert cache.ttl_for('https://cdn.hianime.nz/x') == 300
+    assert cache.ttl_for('https://graphql.anilist.co/') == 60
+    assert cache.ttl_for('https://example.com/') == 5
+
+def test_key_varies_on_range_but_not_user_agent():
+    cache = ResponseCache(1024, {})
+    assert cache.key('u', {'User-Agent': 'a'}) == cache.key('u', {'user-agent': 'b'})
+    assert cache.key('u', {'Range': 'bytes=0-9'}) != cache.key('u', {'Range': 'bytes=10-19'})
+    assert cache.key('u', {'Referer': 'x'}) != cache.key('u', {})
+
+def test_fresh_then_stale_then_gone(clock):
+    cache = ResponseCache(1024, {}, stale_ttl=30)
+    cache.put('k', 10, 200, {}, b'body')
+
+    assert cache.lookup('k')[1] == 'fresh'
+    clock.value += 15
+    entry, state = cache.lookup('k')
+    assert state == 'stale' and entry.body == b'body'
+
+    # one refresh at a time per entry
+    assert cache.begin_refresh('k') and not cache.begin_refresh('k')
+    cache.end_refresh('k')
+    assert cache.begin_refresh('k')
+
+    clock.value += 30
+    assert cache.lookup('k') == (None, None)
+    assert cache.stats()['entries'] == 0
+
+def test_least_recently_used_is_evicted_first():
+    cache = ResponseCache(10, {}, max_entry_bytes=10)
+    cache.put('a', 60, 200, {}, b'aaaa')
+    cache.put('b', 60, 200, {}, b'bbbb')
+    cache.lookup('a')
+    cache.put('c', 60, 200, {}, b'cccc')
+
+    assert cache.lookup('b') == (None, None)
+    assert cache.lookup('a')[0] and cache.lookup('c')[0]
+    assert cache.stats()['bytes'] == 8 and cache.stats()['evictions'] == 1
+
+    cache.put('big', 60, 200, {}, b'x' * 11)
+    assert cache.lookup('big') == (None, None)
+
+def test_tee_stores_only_complete_bodies():
+    cache = ResponseCache(1024, {}, max_entry_bytes=8)
+    assert b''.join(cache.tee('whole', 60, 200, {}, iter([b'ab', b'cd']))) == b'abcd'
+    assert cache.lookup('whole')[0].body == b'abcd'
+
+    partial = cache.tee('partial', 60, 200, {}, iter([b'ab', b'cd']))
+    next(partial)
+    partial.close()
+    assert cache.lookup('partial') == (None, None)
+
+    assert b''.join(cache.tee('large', 60, 200, {}, iter([b'abcdef', b'ghij']))) == b'abcdefghij'
+    assert cache.lookup('large') == (None, None)
+
+def test_stale_hit_is_served_while_refreshing(origin, clock, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'cache', ResponseCache(1024 * 1024, {'127.0.0.1': 10}, stale_ttl=30))
+    client = app.app.test_client()
+    url = origin + '/page?kb=2'
+
+    def get():
+        resp = client.post('/proxy', json={'url': url, 'method': 'GET'})
+        assert resp.status_code == 200 and resp.get_data().startswith(b'<!doctype html>')
+        return resp.headers.get('X-Cache')
+
+    assert get() == 'MISS'
+    assert get() == 'HIT'
+    clock.value += 15
+    assert get() == 'STALE'
+
+    # the background refresh stores a new copy, which is fresh again
+    deadline = time.monotonic() + 5
+    while app.cache.stats()['stores'] < 2 and time.monotonic() < deadline: time.sleep(0.01)
+    assert app.cache.stats()['refreshes'] == 1
+    assert get() == 'HIT'
@@ -0,0 +1,96 @@
+import os, sys
+import pytest
+from starlette.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+from metrics import BUCKETS, Metrics, error_status, metrics, stat_gauges
+
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+@pytest.fixture(scope='module')
+def origin():
+    server, base_url = origins.start()
+    yield base_url
+    server.shutdown()
+
+def sample(text, series):
+    # value of one rendered series, 0 when it isn't there yet
+    for line in text.splitlines():
+        if line.startswith(series + ' '): return float(line.rsplit(' ', 1)[1])
+    return 0
+
+def test_histogram_buckets_are_cumulative():
+    recorder = Metrics()
+    for seconds in (0.003, 0.02, 0.02, 0.7, 100.0): recorder.timing('ttfb', 'example.com', seconds)
+    text = recorder.render()
+
+    name = 'quickwatch_proxy_upstream_ttfb_seconds'
+    assert text.count(f'# TYPE {name} histogram') == 1
+    assert sample(text, f'{name}_bucket{{host="example.com",le="0.005"}}') == 1
+    assert sample(text, f'{name}_bucket{{host="example.com",le="0.025"}}') == 3
+    assert sample(text, f'{name}_bucket{{host="example.com",le="1.0"}}') == 4
+    assert sample(text, f'{name}_bucket{{host="example.com",le="{BUCKETS[-1]}"}}') == 4
+    assert sample(text, f'{name}_bucket{{host="example.com",le="+Inf"}}') == 5
+    assert sample(text, f'{name}_count{{host="example.com"}}') == 5
+    assert sample(text, f'{name}_sum{{host="example.com"}}') == pytest.approx(100.743)
+
+def test_counters_labels_and_gauges_render():
+    recorder = Metrics()
+    recorder.upstream('example.com', 200)
+    recorder.upstream('example.com', 200)
+    recorder.error('example.com', TimeoutError())
+    recorder.count('requests_total', route='/say "hi"', status=200)
+    gauges = stat_gauges(pool={'example.com': {'hits': 3}}, hosts={'example.com': {'state': 'open', 'rate': None, 'throttles': 1, 'opened': 1, 'rejected': 0}},
+                         cache={'hits': 4, 'note': 'skipped'})
+    text = recorder.render(gauges)
+
+    assert sample(text, 'quickwatch_proxy_upstream_responses_total{host="example.com",status="200"}') == 2
+    assert sample(text, 'quickwatch_proxy_upstream_errors_total{host="example.com",kind="timeout"}') == 1
+    assert sample(text, 'quickwatch_proxy_requests_total{route="/say \\"hi\\"",status="200"}') == 1
+    assert sample(text, 'quickwatch_proxy_pool_hits{host="example.com"}') == 3
+    assert sample(text, 'quickwatch_proxy_host_breaker_open{host="example.com"}') == 1
+    assert 'host_rate' not in text and 'cache_note' not in text
+    assert sample(text, 'quickwatch_proxy_cache_hits') == 4
+
+def test_slow_requests_are_kept_up_to_the_log_size():
+    recorder = Metrics(slow_seconds=1.0, slow_log_size=2)
+    recorder.request('/proxy', 200, 0.5, 10, 'https://fast')
+    for n in range(3): recorder.request('/proxy', 200, 1.5, 10, f'https://slow/{n}', 'MISS')
+    assert [entry['url'] for entry in recorder.slow_requests()] == ['https://slow/1', 'https://slow/2']
+    assert sample(recorder.render(), 'quickwatch_proxy_cache_outcomes_total{outcome="miss"}') == 3
+
+def test_error_status():
+    assert error_status(TimeoutError()) == 504 and error_status(ConnectionError()) == 502 and error_status(ValueError()) == 500
+
+def check_routes(client, origin, monkeypatch):
+    # client: a Flask test client or a Starlette TestClient; both expose the same /proxy, /metrics and /metrics/slow
+    monkeypatch.setattr(metrics, 'slow_seconds', 0.0)
+    before = client.get('/metrics')
+    before = before.text if hasattr(before, 'text') else before.get_data(as_text=True)
+
+    url = f'{origin}/page?kb=3'
+    resp = client.post('/proxy', json={'url': url, 'method': 'GET'})
+    assert resp.status_code == 200
+    # the WSGI server closes the response once it is sent; the Flask test client leaves that to the caller
+    resp.close()
+
+    resp = client.get('/metrics')
+    assert resp.headers['Content-Type'].startswith('text/plain')
+    text = resp.text if hasattr(resp, 'text') else resp.get_data(as_text=True)
+    for series in ('quickwatch_proxy_requests_total{route="/proxy",status="200"}', 'quickwatch_proxy_upstream_responses_total{host="127.0.0.1",status="200"}',
+                   'quickwatch_proxy_upstream_ttfb_seconds_count{host="127.0.0.1"}', 'quickwatch_proxy_upstream_total_seconds_count{host="127.0.0.1"}'):
+        assert sample(text, series) == sample(before, series) + 1, series
+    assert sample(text, 'quickwatch_proxy_bytes_out_total{route="/proxy"}') >= sample(before, 'quickwatch_proxy_bytes_out_total{route="/proxy"}') + 3 * 1024
+
+    slow = client.get('/metrics/slow').json
+    slow = slow() if callable(slow) else slow
+    assert any(entry['route'] == '/proxy' and entry['url'] == url for entry in slow)
+
+def test_flask_metrics_route(origin, monkeypatch):
+    from app import app
+    check_routes(app.test_client(), origin, monkeypatch)
+
+def test_asgi_metrics_route(origin, monkeypatch):
+    from asgi import app
+    with TestClient(app) as client: check_routes(client, origin, monkeypatch)
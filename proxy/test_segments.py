@@ -0,0 +1,149 @@
+import asyncio, json, os, sys, threading, time
+from urllib.parse import quote
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+from segments import SegmentStore, byte_range
+
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+@pytest.fixture(scope='module')
+def origin():
+    server, base_url = origins.start()
+    yield base_url
+    server.shutdown()
+
+def store(tmp_path=None, **kwargs):
+    options = dict(memory_bytes=64 * 1024, disk_bytes=1024 * 1024 if tmp_path else 0, directory=str(tmp_path) if tmp_path else None, entry_bytes=8 * 1024, ttl=60)
+    return SegmentStore(**dict(options, **kwargs))
+
+def test_byte_range():
+    assert byte_range('bytes=0-9', 100) == (0, 9) and byte_range('bytes=90-', 100) == (90, 99) and byte_range('bytes=-10', 100) == (90, 99)
+    assert byte_range('bytes=0-1,4-5', 100) is None and byte_range('bytes=100-', 100) is None and byte_range(None, 100) is None
+
+def test_only_prefetch_claims_are_waited_on():
+    segments = store()
+    assert segments.claim('client') and not segments.claim('client')
+    assert segments.waiter('client') is None
+
+    assert segments.claim('prefetch', prefetch=True)
+    waiter = segments.waiter('prefetch')
+    assert waiter is not None and not waiter.is_set()
+    segments.release('prefetch')
+    assert waiter.is_set() and segments.waiter('prefetch') is None
+
+    segments.release('client')
+    segments.release('client')
+    assert segments.stats()['pending'] == 0 and segments.claim('client')
+
+def test_memory_and_disk_tiers(tmp_path):
+    segments = store(tmp_path, memory_bytes=1024)
+    segments.put('small', {'Content-Type': 'video/mp2t', 'Set-Cookie': 'x'}, b'a' * 10)
+    segments.put('large', {}, b'b' * 4096)
+    assert segments.get('small').body == b'a' * 10 and segments.get('small').headers == {'Content-Type': 'video/mp2t'}
+    large = segments.get('large')
+    assert large.body is None and open(large.path, 'rb').read() == b'b' * 4096
+
+    # another worker's store sees the disk tier, and a segment on disk is never claimed again
+    other = store(tmp_path)
+    assert other.get('large').size == 4096 and not other.claim('large')
+    segments.put('huge', {}, b'c' * 9000)
+    assert segments.get('huge') is None and segments.stats()['too_large'] == 1
+
+def test_expired_segments_are_dropped(tmp_path, monkeypatch):
+    import segments as module
+    segments = store(tmp_path, ttl=10, memory_bytes=1024)
+    segments.put('small', {}, b'a')
+    segments.put('large', {}, b'b' * 4096)
+    later = time.time() + 11
+    monkeypatch.setattr(module.time, 'time', lambda: later)
+    assert segments.get('small') is None and segments.get('large') is None
+    assert not os.listdir(tmp_path)
+
+def test_tee_keeps_only_whole_bodies_that_fit():
+    segments = store()
+    assert b''.join(segments.tee('whole', {}, iter([b'ab', b'cd']))) == b'abcd'
+    assert segments.get('whole').body == b'abcd'
+    assert len(b''.join(segments.tee('big', {}, iter([b'x' * 5000, b'x' * 5000])))) == 10000
+    assert segments.get('big') is None
+
+    async def main():
+        async def chunks():
+            yield b'ef'
+            yield b'gh'
+        return b''.join([chunk async for chunk in segments.atee('async', {}, chunks())])
+    assert asyncio.run(main()) == b'efgh' and segments.get('async').body == b'efgh'
+
+def test_key_ignores_configured_parameters():
+    segments = store(ignore_params=('token',))
+    assert segments.key('https://a/s.ts?n=1&token=abc') == segments.key('https://a/s.ts?n=1&token=xyz')
+    assert segments.key('https://a/s.ts?n=1') != segments.key('https://a/s.ts?n=2')
+
+def proxied(url):
+    return '/m3u8-proxy?url=' + quote(url, safe='') + '&headers=' + quote(json.dumps({}))
+
+@pytest.fixture
+def flask_app(monkeypatch):
+    import app
+    # nothing is prefetched, so every claim in these tests is a client's
+    monkeypatch.setattr(app.playlists, 'ahead', 0)
+    monkeypatch.setattr(app, 'segment_store', store(memory_bytes=64 * 1024 * 1024, entry_bytes=4 * 1024 * 1024))
+    return app
+
+def test_flask_client_claim_is_not_waited_on_and_is_released_on_close(origin, flask_app):
+    client = flask_app.app.test_client()
+    playlist = client.get(proxied(f'{origin}/playlist.m3u8?segments=2&flask'))
+    # a playlist is indexed once it has been read to the end
+    assert playlist.status_code == 200 and playlist.get_data().count(b'm3u8-proxy?url=') == 2
+    segment = f'{origin}/segment?kb=512&n=0'
+
+    # the first viewer's body is never started; a second viewer still fetches straight away
+    first = client.get(proxied(segment), buffered=False)
+    assert first.status_code == 200 and flask_app.segment_store.stats()['pending'] == 1
+    started = time.monotonic()
+    second = client.get(proxied(segment))
+    assert second.status_code == 200 and len(second.get_data()) == 512 * 1024 and time.monotonic() - started < 5
+    assert second.headers.get('X-Cache') != 'HIT'
+
+    first.close()
+    assert flask_app.segment_store.stats()['pending'] == 0
+
+    # a viewer that reads to the end leaves the segment cached for the next one
+    viewer = client.get(proxied(segment))
+    assert len(viewer.get_data()) == 512 * 1024
+    viewer.close()
+    assert client.get(proxied(segment)).headers['X-Cache'] == 'HIT'
+
+def test_flask_waits_for_a_prefetch(flask_app):
+    key = 'prefetched'
+    assert flask_app.segment_store.claim(key, prefetch=True)
+    def finish():
+        time.sleep(0.2)
+        flask_app.segment_store.put(key, {}, b'segment')
+        flask_app.segment_store.release(key)
+    threading.Thread(target=finish).start()
+    assert flask_app.cached_segment(key).body == b'segment'
+
+    assert flask_app.segment_store.claim('watched')
+    started = time.monotonic()
+    assert flask_app.cached_segment('watched') is None and time.monotonic() - started < 1
+
+def test_asgi_waits_only_for_a_prefetch(monkeypatch):
+    import asgi
+    monkeypatch.setattr(asgi, 'segment_store', store(event=asyncio.Event))
+
+    async def main():
+        assert asgi.segment_store.claim('watched')
+        started = time.monotonic()
+        assert await asgi.cached_segment('watched') is None and time.monotonic() - started < 1
+
+        assert asgi.segment_store.claim('prefetched', prefetch=True)
+        async def finish():
+            await asyncio.sleep(0.2)
+            asgi.segment_store.put('prefetched', {}, b'segment')
+            asgi.segment_store.release('prefetched')
+        task = asyncio.create_task(finish())
+        assert (await asgi.cached_segment('prefetched')).body == b'segment'
+        await task
+    asyncio.run(main())
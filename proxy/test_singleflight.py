@@ -0,0 +1,151 @@
+import asyncio, os, sys, threading
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+from singleflight import AsyncFlight, Flight, SingleFlight, can_resume, request_key, resume_headers, resume_skip
+
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+KB = 1024
+BODY = bytes(range(256)) * 64 * 8   # 128 KiB
+
+def chunked(body, size=4 * KB):
+    return [body[index:index + size] for index in range(0, len(body), size)]
+
+def from_body(body):
+    # a resume() that serves the rest of BODY from the given offset
+    calls = []
+    def resume(status, offset):
+        calls.append((status, offset))
+        return iter(chunked(body[offset:]))
+    resume.calls = calls
+    return resume
+
+def run_pump(flight, body):
+    flight.start(200, {})
+    return run_pump_rest(flight, iter(chunked(body)))
+
+def run_pump_rest(flight, chunks):
+    def pump():
+        for chunk in chunks:
+            if not flight.append(chunk): break
+        flight.finish()
+    thread = threading.Thread(target=pump, daemon=True)
+    thread.start()
+    return thread
+
+@pytest.fixture(scope='module')
+def origin():
+    server, base_url = origins.start()
+    yield base_url
+    server.shutdown()
+
+def test_request_key_ignores_header_order_and_case():
+    assert request_key('u', {'A': '1', 'b': '2'}) == request_key('u', {'B': '2', 'a': '1'})
+    assert request_key('u', {'Range': 'bytes=0-1'}) != request_key('u', {'Range': 'bytes=2-3'})
+
+def test_late_reader_replays_from_the_start():
+    flights = SingleFlight(replay_bytes=len(BODY), window=8 * KB)
+    first, leader = flights.join('k')
+    thread = run_pump(first.flight, BODY)
+    assert leader and b''.join(first) == BODY
+    thread.join(5)
+
+    # the whole body is still held, but a finished flight is left to whoever joined it
+    second, leader = flights.join('k')
+    assert not leader and b''.join(second) == BODY
+
+def test_slow_reader_is_detached_and_resumes_on_its_own():
+    resume = from_body(BODY)
+    flights = SingleFlight(replay_bytes=16 * KB, window=16 * KB)
+    fast, _ = flights.join('k', resume)
+    slow, _ = flights.join('k', resume)
+    flight = fast.flight
+    chunks = chunked(BODY)
+
+    # both take the first chunk, then only the fast reader keeps up; append would block if it paced the slow one
+    flight.start(200, {})
+    flight.append(chunks[0])
+    head, received = next(slow), [next(fast)]
+    for chunk in chunks[1:]:
+        assert not flight.full() and flight.append(chunk)
+        received.append(next(fast))
+    flight.finish()
+    assert b''.join(received) + b''.join(fast) == BODY
+
+    assert head + b''.join(slow) == BODY
+    assert resume.calls == [(200, len(head))]
+    assert flight.detached == 1 and not flight.positions
+    flights.forget('k', flight)
+    assert flights.stats()['detached'] == 1
+
+def test_reader_without_resume_paces_the_pump():
+    flight = Flight(replay_bytes=16 * KB, window=16 * KB)
+    fast, slow = flight.attach(from_body(BODY)), flight.attach()
+    chunks = iter(chunked(BODY))
+
+    flight.start(200, {})
+    while not flight.full():
+        flight.append(next(chunks))
+        next(fast)
+    assert flight.received == 20 * KB and flight.detached == 0
+
+    # once the slow reader catches up everything flows again
+    pump = run_pump_rest(flight, chunks)
+    assert b''.join(slow) == BODY
+    pump.join(5)
+    assert not pump.is_alive()
+
+def test_async_slow_reader_is_detached():
+    async def main():
+        def resume(status, offset):
+            async def rest():
+                for chunk in chunked(BODY[offset:]): yield chunk
+            return rest()
+
+        flight = AsyncFlight(replay_bytes=16 * KB, window=16 * KB)
+        fast, slow = flight.attach(resume), flight.attach(resume)
+        chunks = chunked(BODY)
+
+        await flight.start(200, {})
+        await flight.append(chunks[0])
+        head, received = await anext(slow), [await anext(fast)]
+        for chunk in chunks[1:]:
+            assert not flight.full() and await flight.append(chunk)
+            received.append(await anext(fast))
+        await flight.finish()
+
+        assert b''.join(received) == BODY
+        assert head + b''.join([chunk async for chunk in slow]) == BODY and flight.detached == 1
+
+    asyncio.run(main())
+
+def test_resume_headers():
+    assert can_resume({}) and can_resume({'range': 'bytes=10-'}) and can_resume({'Range': 'bytes=10-99'})
+    assert not can_resume({'Range': 'bytes=-100'}) and not can_resume({'Range': 'bytes=0-1,5-9'})
+
+    assert resume_headers({'Referer': 'r'}, 200, 50) == {'Referer': 'r', 'Range': 'bytes=50-'}
+    assert resume_headers({'range': 'bytes=10-99'}, 206, 50) == {'Range': 'bytes=60-99'}
+    # upstream ignored the original Range, so offsets count from the start of the whole body
+    assert resume_headers({'Range': 'bytes=10-99'}, 200, 50) == {'Range': 'bytes=50-'}
+
+    assert resume_skip(200, 206, 50) == 0 and resume_skip(200, 200, 50) == 50
+    with pytest.raises(RuntimeError): resume_skip(206, 200, 50)
+
+def test_flask_reader_left_behind_fetches_the_rest(origin, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'flights', SingleFlight(replay_bytes=64 * KB, window=128 * KB))
+    url, size = origin + '/segment?kb=1024', 1024 * KB
+    expected = (origins.PAYLOAD * (size // origins.CHUNK))[:size]
+
+    resume = lambda status, offset: app.resumed(url, {}, status, offset)
+    fast, _ = app.flights.join('k', resume)
+    slow, _ = app.flights.join('k', resume)
+    pumped = app.pump_pool.submit(app.pump, None, 'k', fast.flight, 0, url, {})
+
+    head = next(slow)
+    assert b''.join(fast) == expected
+    assert head + b''.join(slow) == expected
+    pumped.result(5)
+    assert app.flights.stats()['detached'] == 1
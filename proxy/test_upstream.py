@@ -0,0 +1,42 @@
+import json, os, sys
+from urllib.parse import quote
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+import origins
+
+# keep the prefetched test segments out of the real segment directory
+os.environ.setdefault('PROXY_SEGMENT_DISK_BYTES', '0')
+
+@pytest.fixture(scope='module')
+def https_origin():
+    server, base_url = origins.start(tls=True)
+    yield base_url
+    server.shutdown()
+
+@pytest.fixture
+def trusted(monkeypatch):
+    # requests reads the bundle per request, so the proxy's routes trust the origin's self-signed cert too
+    monkeypatch.setenv('REQUESTS_CA_BUNDLE', origins.CERT)
+
+def test_fetch_over_https_times_connect_and_tls(https_origin, trusted):
+    import upstream
+    from metrics import metrics
+    resp = upstream.fetch('GET', https_origin + '/page?kb=4')
+    assert resp.status_code == 200 and resp.content.startswith(b'<!doctype html>')
+
+    gauges = metrics.render({})
+    assert 'upstream_connect_seconds' in gauges and 'upstream_tls_seconds' in gauges
+
+def test_proxy_routes_over_https(https_origin, trusted):
+    from app import app
+    client = app.test_client()
+
+    resp = client.post('/proxy', json={'url': https_origin + '/page?kb=8', 'method': 'GET'})
+    assert resp.status_code == 200 and resp.get_data().startswith(b'<!doctype html>')
+
+    resp = client.get('/m3u8-proxy?url=' + quote(https_origin + '/playlist.m3u8?segments=3', safe='') + '&headers=' + quote(json.dumps({})))
+    assert resp.status_code == 200 and resp.get_data().count(b'm3u8-proxy?url=https%3A') == 3
+
+    resp = client.get('/m3u8-proxy?url=' + quote(https_origin + '/segment?kb=64', safe=''), headers={'Range': 'bytes=0-9'})
+    assert resp.status_code == 206 and len(resp.get_data()) == 10
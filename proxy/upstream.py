@@ -0,0 +1,118 @@
+import os, time
+from http.cookiejar import DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from limiter import limiter
+from metrics import host_of, metrics
+
+# PROXY_POOL_HOSTS="hianime.nz=32,graphql.anilist.co=8" gives busy origins their own, larger pools
+DEFAULT_POOL_SIZE = int(os.environ.get('PROXY_POOL_SIZE', 10))
+DEFAULT_POOL_HOSTS = int(os.environ.get('PROXY_POOL_HOSTS_MAX', 100))
+
+def parse_host_sizes(spec):
+    sizes = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, _, size = item.partition('=')
+        sizes[host.strip().lower()] = int(size or DEFAULT_POOL_SIZE)
+    return sizes
+
+HOST_POOL_SIZES = parse_host_sizes(os.environ.get('PROXY_POOL_HOSTS', ''))
+
+# (connect, read), the same limits asgi.py gives httpx; a read timeout bounds each wait for body bytes
+TIMEOUT = (10.0, float(os.environ.get('PROXY_TIMEOUT', 60)))
+
+class TimedConnectionMixin:
+    # opening the socket (DNS and TCP); a mixin so super() finds the right _new_conn for HTTP and HTTPS alike
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        self.connect_seconds = time.perf_counter() - started
+        metrics.timing('connect', self.host, self.connect_seconds)
+        return sock
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        # the TLS handshake is whatever connect() spends beyond opening the socket
+        started = time.perf_counter()
+        self.connect_seconds = 0.0
+        super().connect()
+        metrics.timing('tls', self.host, time.perf_counter() - started - self.connect_seconds)
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+def build_session():
+    session = requests.Session()
+    # shared session must never carry one client's upstream cookies into another client's request
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    default = TimedAdapter(pool_connections=DEFAULT_POOL_HOSTS, pool_maxsize=DEFAULT_POOL_SIZE)
+    session.mount('http://', default)
+    session.mount('https://', default)
+
+    for host, size in HOST_POOL_SIZES.items():
+        adapter = TimedAdapter(pool_connections=1, pool_maxsize=size)
+        session.mount(f'http://{host}/', adapter)
+        session.mount(f'https://{host}/', adapter)
+
+    return session
+
+session = build_session()
+
+def fetch(method, url, **kwargs):
+    # streamed responses are finished by metered() once their body has been read; the limiter raises
+    # Throttled / HostUnavailable rather than letting a worker queue behind a slow or dead host
+    host = host_of(url)
+    limiter.wait(url)
+    started = time.perf_counter()
+    kwargs.setdefault('timeout', TIMEOUT)
+    try: resp = session.request(method, url, **kwargs)
+    except Exception as e:
+        metrics.error(host, e)
+        limiter.record(url, error=e)
+        raise
+
+    metrics.upstream(host, resp.status_code)
+    limiter.record(url, resp.status_code, headers=resp.headers)
+    metrics.timing('ttfb', host, resp.elapsed.total_seconds())
+    resp.metered_host, resp.metered_started = host, started
+    if not kwargs.get('stream'): metrics.finished(host, started, len(resp.content))
+    return resp
+
+def metered(resp, chunks):
+    received = 0
+    try:
+        for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+    finally: metrics.finished(resp.metered_host, resp.metered_started, received)
+
+def pool_stats():
+    stats = {}
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        manager = adapter.poolmanager
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is None: continue
+
+            # urllib3 counts every request and every freshly opened socket per pool
+            entry = stats.setdefault(pool.host, {'requests': 0, 'hits': 0, 'misses': 0, 'maxsize': adapter._pool_maxsize})
+            entry['requests'] += pool.num_requests
+            entry['misses'] += pool.num_connections
+            entry['hits'] += max(pool.num_requests - pool.num_connections, 0)
+
+    return stats
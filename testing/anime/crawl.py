@@ -0,0 +1,8 @@
+import asyncio, json
+from hianime import CatalogueIndex, crawl
+
+if __name__ == '__main__':
+    index = CatalogueIndex()
+    stats = asyncio.run(crawl(search_terms=["horimiya"], max_pages=2, index=index))
+    print(json.dumps(stats, indent=2))
+    print(json.dumps(index.details("horimiya-15733"), indent=2))
@@ -0,0 +1,13 @@
+# Shared hianime scrapers. Parsing goes through parser.py, which picks selectolax, lxml or html.parser
+# (HIANIME_PARSER overrides) and compiles each selector once per process.
+from .crawler import Crawler, crawl
+from .details import extract_anime_info, extract_mini_anime_info, format_title, parse_anime_info, parse_mini_anime_info
+from .episodes import extract_episodes_list, parse_episodes_list
+from .index import CatalogueIndex
+from .limiter import HostUnavailable, Throttled, async_client, limiter
+from .parser import parse, set_backend
+from .pipeline import extract_anime_info_async
+from .records import Anime, Episode, EpisodeList, RelatedAnime, SearchResult, Season
+from .search import extract_search_results, parse_search_results
+from .searchindex import SearchIndex
+from .watcher import EpisodeWatcher
@@ -0,0 +1,171 @@
+import asyncio, os, sqlite3, threading, time
+from urllib.parse import urlsplit
+from .limiter import Rejected, async_client, limiter, retry_after, session
+
+ANILIST_URL = 'https://graphql.anilist.co'
+BANNER_QUERY = '''
+query ($id: Int) {
+    Media(id: $id, type: ANIME) {
+        bannerImage
+        coverImage { extraLarge }
+    }
+}
+'''
+# one request resolves a whole window of ids; Page caps media lists at 50 per page
+BATCH_QUERY = '''
+query ($ids: [Int], $perPage: Int) {
+    Page(perPage: $perPage) {
+        media(id_in: $ids, type: ANIME) {
+            id
+            bannerImage
+            coverImage { extraLarge }
+        }
+    }
+}
+'''
+MAX_BATCH = 50
+CACHE_PATH = os.environ.get('HIANIME_ANILIST_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'quickwatch', 'anilist.sqlite'))
+MISSING_TTL = 24 * 60 * 60
+REQUESTS_PER_MINUTE = float(os.environ.get('HIANIME_ANILIST_RPM', 30))
+
+def media_from(item):
+    # both queries ask for the same fields, so the sync and async paths cache the same entry for an id
+    return {'bannerImage': item.get('bannerImage'), 'coverImage': (item.get('coverImage') or {}).get('extraLarge')}
+
+class MediaCache:
+    # anilist_id -> (banner, cover); ids AniList didn't return are remembered for a day
+    def __init__(self, path=CACHE_PATH):
+        if path != ':memory:': os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS media (anilist_id INTEGER PRIMARY KEY, banner TEXT, cover TEXT, found INTEGER, fetched_at REAL)')
+
+    def get_many(self, ids):
+        if not ids: return {}
+        placeholders = ','.join('?' * len(ids))
+        with self.lock:
+            rows = self.db.execute(f'SELECT anilist_id, banner, cover, found, fetched_at FROM media WHERE anilist_id IN ({placeholders})', list(ids)).fetchall()
+
+        now = time.time()
+        return {row[0]: {'bannerImage': row[1], 'coverImage': row[2]} for row in rows if row[3] or now - row[4] < MISSING_TTL}
+
+    def put_many(self, media, missing=()):
+        now = time.time()
+        rows = [(id, item['bannerImage'], item['coverImage'], 1, now) for id, item in media.items()]
+        rows += [(id, None, None, 0, now) for id in missing]
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)', rows)
+
+# AniList's documented budget, applied to its host through the shared limiter
+limiter.limit(urlsplit(ANILIST_URL).hostname, REQUESTS_PER_MINUTE / 60)
+
+class AniListClient:
+    def __init__(self, client=None, cache=None, window=0.05, max_retries=4):
+        # pacing and 429 back-off come from the limiter behind async_client(); a client passed in should be one too
+        self.client = client or async_client(timeout=20)
+        self.cache = cache if cache is not None else MediaCache()
+        self.window = window
+        self.max_retries = max_retries
+        self.pending = {}
+        self.flush_handle = None
+        self.tasks = set()
+        self.requests = 0
+
+    async def media(self, anilist_id):
+        anilist_id = int(anilist_id)
+        cached = self.cache.get_many([anilist_id])
+        if anilist_id in cached: return cached[anilist_id]
+
+        future = self.pending.get(anilist_id)
+        if future is None:
+            future = self.pending[anilist_id] = asyncio.get_running_loop().create_future()
+            if len(self.pending) >= MAX_BATCH: self.flush_pending()
+            elif self.flush_handle is None: self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush_pending)
+        return await future
+
+    async def banner(self, anilist_id):
+        # the backdrop is the banner alone, as it always was; the cover is cached for callers that want it
+        media = await self.media(anilist_id)
+        return media and media['bannerImage']
+
+    async def warm(self, ids):
+        # resolves a whole catalogue; everything not already cached goes out in batches of MAX_BATCH
+        ids = [int(id) for id in ids]
+        resolved = self.cache.get_many(ids)
+        missing = [id for id in ids if id not in resolved]
+        resolved.update(zip(missing, await asyncio.gather(*(self.media(id) for id in missing))))
+        return resolved
+
+    def flush_pending(self):
+        if self.flush_handle: self.flush_handle.cancel()
+        self.flush_handle = None
+        while self.pending:
+            batch = dict(list(self.pending.items())[:MAX_BATCH])
+            for id in batch: del self.pending[id]
+            task = asyncio.ensure_future(self.flush(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def flush(self, batch):
+        try:
+            found = await self.query(list(batch))
+            missing = [id for id in batch if id not in found]
+            self.cache.put_many(found, missing)
+            for id, future in batch.items():
+                if not future.done(): future.set_result(found.get(id))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done(): future.set_exception(e)
+
+    async def query(self, ids):
+        for attempt in range(self.max_retries):
+            response = None
+            try:
+                self.requests += 1
+                response = await self.client.post(ANILIST_URL, json={'query': BATCH_QUERY, 'variables': {'ids': ids, 'perPage': MAX_BATCH}})
+                response.raise_for_status()
+                media = ((response.json().get('data') or {}).get('Page') or {}).get('media') or []
+                return {item['id']: media_from(item) for item in media}
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    print(f"❌ Failed to fetch AniList data after {self.max_retries} attempts: {e}")
+                    raise
+
+                # a 429 has already paused the host in the limiter; Rejected says how long until it takes requests again
+                delay = e.retry_after if isinstance(e, Rejected) else retry_after(response.headers if response is not None else None, 2 ** attempt)
+                print(f"⚠️  Retrying AniList request (attempt {attempt + 1}/{self.max_retries}) after {delay}s")
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+default_cache = None
+
+def fetch_banner(anilist_id, max_retries=3, retry_delay=0.5):
+    global default_cache
+    if default_cache is None: default_cache = MediaCache()
+    cached = default_cache.get_many([int(anilist_id)]).get(int(anilist_id))
+    if cached: return cached['bannerImage']
+
+    response = None
+    for attempt in range(max_retries):
+        try:
+            response = session.post(ANILIST_URL, json={'query': BANNER_QUERY, 'variables': {'id': int(anilist_id)}})
+            response.raise_for_status()
+            media = media_from((response.json().get('data') or {}).get('Media') or {})
+            default_cache.put_many({int(anilist_id): media})
+            return media['bannerImage']
+        except Rejected as e:
+            # AniList is rate limited or down: give up on the banner instead of holding the thread
+            print(f"⚠️  Skipping AniList banner: {e}")
+            return None
+        except Exception as e:
+            if attempt < max_retries - 1:
+                # a 429 lands in the limiter, which makes the next attempt wait or fail fast; anything else backs off briefly
+                delay = 0 if response is not None and response.status_code == 429 else retry_delay * 2 ** attempt
+                print(f"⚠️  Retrying AniList request (attempt {attempt + 1}/{max_retries}) after {delay}s")
+                time.sleep(delay)
+            else:
+                print(f"❌ Failed to fetch AniList data after {max_retries} attempts: {e}")
+    return None
@@ -0,0 +1,100 @@
+import asyncio
+from urllib.parse import urlsplit
+from .anilist import AniListClient
+from .details import BASE_URL, parse_anime_info
+from .index import CatalogueIndex
+from .limiter import async_client, host_limiter
+from .pipeline import STAGE_TIMEOUTS, fetch_episodes, fetch_page, sniff_anilist_id, stage
+from .search import DEFAULT_HEADERS, SEARCH_URL, parse_search_results
+
+# Walks listing pages (the A-Z list, or search result pages for given terms), stores every entry in the
+# CatalogueIndex, and fetches details only for titles that are new or whose listing entry / episode count moved.
+LISTING_URL = f"{BASE_URL}/az-list"
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 2.0
+
+class Crawler:
+    def __init__(self, index=None, client=None, concurrency=CONCURRENCY, rate=REQUESTS_PER_SECOND, anilist=None):
+        self.index = index if index is not None else CatalogueIndex()
+        self.client = client
+        self.slots = asyncio.Semaphore(concurrency)
+        self.anilist = anilist
+        # the crawl's pace is its own: the client run() makes goes through this limiter, and the rate never
+        # touches the shared one; a client passed in brings its own limiting
+        self.limiter = host_limiter()
+        self.limiter.limit(urlsplit(BASE_URL).hostname, rate)
+        self.stats = {'listing_pages': 0, 'listed': 0, 'fetched': 0, 'changed': 0, 'skipped': 0, 'failed': 0}
+
+    async def get(self, url, **kw):
+        async with self.slots:
+            response = await self.client.get(url, **kw)
+            response.raise_for_status()
+            return response
+
+    async def listing_page(self, url, params):
+        response = await self.get(url, params=params, headers=DEFAULT_HEADERS)
+        self.stats['listing_pages'] += 1
+        return await asyncio.to_thread(parse_search_results, response.text)
+
+    async def walk(self, url, params=None, max_pages=None):
+        # first page tells us how many there are; the rest go out concurrently (the semaphore bounds them)
+        params = dict(params or {})
+        total_pages, summaries = await self.listing_page(url, dict(params, page=1))
+        pages = min(total_pages, max_pages or total_pages)
+        rest = await asyncio.gather(*(self.listing_page(url, dict(params, page=page)) for page in range(2, pages + 1)), return_exceptions=True)
+
+        for result in rest:
+            if isinstance(result, Exception):
+                print(f"Listing page failed: {result}")
+                self.stats['failed'] += 1
+            else: summaries += result[1]
+        return summaries
+
+    async def fetch_details(self, summary):
+        id = summary['id']
+        try:
+            async with self.slots:
+                html, episodes = await asyncio.gather(fetch_page(self.client, id), fetch_episodes(self.client, id))
+
+            info = await asyncio.to_thread(parse_anime_info, html, id)
+            anilist_id = sniff_anilist_id(html)
+            # a slow or failing AniList lookup leaves the page's own backdrop rather than failing the title
+            if anilist_id:
+                banner = self.anilist.banner(anilist_id)
+                info["backdrop_image"] = await stage('anilist', banner, STAGE_TIMEOUTS['anilist'], info.get("backdrop_image"))
+            info["episodes"] = episodes
+
+            self.stats['fetched'] += 1
+            if self.index.put_details(summary, info): self.stats['changed'] += 1
+        except Exception as e:
+            print(f"Error crawling {id}: {e}")
+            self.stats['failed'] += 1
+
+    async def refresh(self, summaries, force=False):
+        self.index.put_summaries(summaries)
+        self.stats['listed'] += len(summaries)
+        stale = summaries if force else self.index.stale(summaries)
+        self.stats['skipped'] += len(summaries) - len(stale)
+        await asyncio.gather(*(self.fetch_details(summary) for summary in stale))
+
+    async def run(self, search_terms=(), listing=True, max_pages=None, force=False):
+        own_client = self.client is None
+        if own_client: self.client = async_client(timeout=20, limiter=self.limiter)
+        # an AniList client made here batches this run's lookups and is closed with it
+        own_anilist = self.anilist is None
+        if own_anilist: self.anilist = AniListClient()
+
+        try:
+            if listing: await self.refresh(await self.walk(LISTING_URL, max_pages=max_pages), force)
+            for term in search_terms: await self.refresh(await self.walk(SEARCH_URL, {'keyword': term}, max_pages), force)
+            return dict(self.stats, **self.index.stats())
+        finally:
+            if own_client:
+                await self.client.aclose()
+                self.client = None
+            if own_anilist:
+                await self.anilist.aclose()
+                self.anilist = None
+
+async def crawl(search_terms=(), listing=True, max_pages=None, force=False, index=None):
+    return await Crawler(index).run(search_terms, listing, max_pages, force)
@@ -0,0 +1,242 @@
+import json, re
+from .anilist import fetch_banner
+from .limiter import session
+from .parser import parse
+
+BASE_URL = "https://hianime.nz"
+SHOW_TYPES = ["tv", "ona", "movie", "ova", "special"]
+STYLE_URL = re.compile(r'url\(([^)]+)\)')
+TITLE_PUNCTUATION = re.compile(r'[^\w\s]')
+WHITESPACE = re.compile(r'\s+')
+
+RECOMMENDED = "#main-content .block_area_category .tab-content .block_area-content .film_list-wrap .flw-item"
+RELATED = "#main-sidebar .block_area_sidebar .block_area-content .cbox-list .cbox-content .anif-block-ul .ulclear li"
+INFO_ITEMS = "#ani_detail > .ani_detail-stage > .container > .anis-content > .anisc-info-wrap > .anisc-info > .item"
+SHOW_TYPE = "#ani_detail .prebreadcrumb ol li:nth-child(2) a"
+
+def format_title(title, data_id):
+    formatted_title = TITLE_PUNCTUATION.sub('', title)
+    formatted_title = formatted_title.lower().strip()
+    formatted_title = WHITESPACE.sub('-', formatted_title)
+    return f"{formatted_title}-{data_id}"
+
+def text_of(node, default=None):
+    return node.text().strip() if node else default
+
+def extract_ticks(element, tv_info):
+    for property in ["sub", "dub", "eps"]:
+        value = element.select_one(f".tick .tick-{property}")
+        if value:
+            tv_info[property] = value.text().strip()
+
+def is_adult(element, selector):
+    tick_rate = element.select_one(selector) if element else None
+    return bool(tick_rate and "18+" in tick_rate.text().strip())
+
+def extract_recommended_data(soup):
+    results = []
+
+    for element in soup.select(RECOMMENDED):
+        name_link = element.select_one(".film-detail .film-name a")
+        poster_link = element.select_one(".film-poster a")
+        poster_img = element.select_one(".film-poster img")
+
+        show_type = None
+        for item in element.select(".film-detail .fd-infor .fdi-item"):
+            text = item.text().strip()
+            if any(type in text.lower() for type in SHOW_TYPES):
+                show_type = text
+                break
+
+        tv_info = {
+            "showType": show_type if show_type else "Unknown",
+            "duration": text_of(element.select_one(".film-detail .fd-infor .fdi-duration"))
+        }
+        extract_ticks(element, tv_info)
+
+        results.append({
+            "data_id": poster_link.attr('data-id') if poster_link else None,
+            "id": name_link.attr('href').split("/")[-1] if name_link else None,
+            "title": text_of(name_link, ""),
+            "japanese_title": name_link.attr('data-jname', "").strip() if name_link else "",
+            "poster": poster_img.attr('data-src') if poster_img else None,
+            "tvInfo": tv_info,
+            "adultContent": is_adult(element, ".film-poster>.tick-rate")
+        })
+
+    return results
+
+def extract_related_data(soup):
+    results = []
+
+    for element in soup.select(RELATED):
+        name_link = element.select_one(".film-detail .film-name a")
+        poster = element.select_one(".film-poster")
+        poster_img = element.select_one(".film-poster img")
+
+        show_type = None
+        for item in element.select(".film-detail>.fd-infor>.tick"):
+            text = item.text().strip().lower()
+            if any(type in text for type in SHOW_TYPES):
+                show_type = next((word for word in text.split() if word in SHOW_TYPES), None)
+                break
+
+        tv_info = {
+            "showType": show_type if show_type else "Unknown"
+        }
+        extract_ticks(element, tv_info)
+
+        results.append({
+            "data_id": poster.attr('data-id') if poster else None,
+            "id": name_link.attr('href').split("/")[-1] if name_link else None,
+            "title": text_of(name_link, ""),
+            "japanese_title": name_link.attr('data-jname', "").strip() if name_link else "",
+            "poster": poster_img.attr('data-src') if poster_img else None,
+            "tvInfo": tv_info,
+            "adultContent": is_adult(element, ".film-poster>.tick-rate")
+        })
+
+    return results
+
+def extract_tv_info(tv_info_element):
+    tv_info = {}
+    if not tv_info_element: return tv_info
+
+    for element in tv_info_element.select(".tick-item, span.item"):
+        text = element.text().strip()
+        classes = element.classes()
+        if 'tick-quality' in classes:
+            tv_info['quality'] = text
+        elif 'tick-sub' in classes:
+            tv_info['sub'] = text
+        elif 'tick-dub' in classes:
+            tv_info['dub'] = text
+        elif 'tick-pg' in classes:
+            tv_info['rating'] = text
+        elif element.tag == 'span' and 'item' in classes:
+            if 'showType' not in tv_info:
+                tv_info['showType'] = text
+            elif 'duration' not in tv_info:
+                tv_info['duration'] = text
+
+    return tv_info
+
+def extract_info_items(soup):
+    anime_info = {}
+    for el in soup.select(INFO_ITEMS):
+        head = el.select_one(".item-head")
+        key = head.text().strip().replace(":", "") if head else ""
+        if key in ["Genres", "Producers"]:
+            value = [a.text().strip().replace(" ", "-") for a in el.select("a")]
+        else:
+            value = text_of(el.select_one(".name"), "").replace(" ", "-")
+        anime_info[key] = value
+    return anime_info
+
+def extract_synonyms(soup):
+    for item in soup.select(".item.item-title"):
+        head = item.select_one(".item-head")
+        if head and "Synonyms" in head.text():
+            return text_of(item.select_one(".name"), "")
+    return ""
+
+def extract_sync_ids(soup, quiet=False):
+    sync_data_script = soup.select_one("#syncData")
+    if not sync_data_script: return None, None
+
+    try:
+        sync_data = json.loads(sync_data_script.text())
+        return sync_data.get('anilist_id'), sync_data.get('mal_id')
+    except (json.JSONDecodeError, AttributeError) as error:
+        if not quiet: print(f"Error parsing syncData: {error}")
+        return None, None
+
+def extract_seasons(soup):
+    seasons = []
+    for el in soup.select(".os-list a"):
+        background = ""
+        poster_element = el.select_one(".season-poster")
+        style = poster_element.attr('style') if poster_element else None
+        if style:
+            bg_match = STYLE_URL.search(style)
+            if bg_match:
+                background = bg_match.group(1)
+
+        seasons.append({
+            "name": text_of(el.select_one(".title"), ""),
+            "route": el.attr('href', ""),
+            "background": background
+        })
+    return seasons
+
+def parse_anime_info(html, id, backdrop_image=None):
+    soup = parse(html)
+
+    data_id = id.split("-").pop()
+    title_element = soup.select_one("#ani_detail .film-name")
+    poster_element = soup.select_one("#ani_detail .film-poster")
+    poster_img = poster_element.select_one("img") if poster_element else None
+    overview_element = soup.select_one("#ani_detail .film-description .text")
+    title = text_of(title_element, "")
+    anilist_id, mal_id = extract_sync_ids(soup)
+
+    anime_info = extract_info_items(soup)
+    anime_info["Overview"] = text_of(overview_element, "")
+    anime_info["tvInfo"] = extract_tv_info(soup.select_one("#ani_detail .film-stats"))
+
+    return {
+        "adultContent": is_adult(poster_element, ".tick-rate"),
+        "data_id": data_id,
+        "id": format_title(title, data_id),
+        "anilistId": anilist_id,
+        "malId": mal_id,
+        "title": title,
+        "japanese_title": title_element.attr('data-jname') if title_element else None,
+        "synonyms": extract_synonyms(soup),
+        "poster": poster_img.attr('src') if poster_img else None,
+        "backdrop_image": backdrop_image,
+        "showType": text_of(soup.select_one(SHOW_TYPE), ""),
+        "animeInfo": anime_info,
+        "seasons": extract_seasons(soup),
+        "recommended_data": extract_recommended_data(soup),
+        "related_data": extract_related_data(soup)
+    }
+
+def parse_mini_anime_info(html, id):
+    soup = parse(html)
+    data_id = id.split("-").pop()
+
+    title_element = soup.select_one("#ani_detail .film-name")
+    title = text_of(title_element, "")
+    anilist_id, mal_id = extract_sync_ids(soup, quiet=True)
+
+    return {
+        "data_id": data_id,
+        "id": format_title(title, data_id),
+        "anilistId": anilist_id,
+        "malId": mal_id,
+        "title": title,
+        "japanese_title": title_element.attr('data-jname') if title_element else None,
+        "showType": text_of(soup.select_one(SHOW_TYPE), ""),
+        "animeInfo": extract_info_items(soup)
+    }
+
+def extract_anime_info(id):
+    resp = session.get(f"{BASE_URL}/{id}")
+
+    try:
+        info = parse_anime_info(resp.text, id)
+        if info["anilistId"]: info["backdrop_image"] = fetch_banner(info["anilistId"])
+        return info
+    except Exception as e:
+        print(f"Error extracting anime info: {e}")
+        return None
+
+def extract_mini_anime_info(id):
+    resp = session.get(f"{BASE_URL}/{id}")
+
+    try:
+        return parse_mini_anime_info(resp.text, id)
+    except Exception as e:
+        print(f"Error extracting mini anime info: {e}")
+        return None
@@ -0,0 +1,47 @@
+from .limiter import session
+from .parser import parse
+
+EPISODE_LIST_URL = "https://hianime.nz/ajax/v2/episode/list/{show_id}"
+EPISODE_LINKS = ".detail-infor-content .ss-list a"
+
+def episode_list_request(id, v1_base_url="hianime.nz"):
+    show_id = id.split("-")[-1]
+    headers = {
+        "X-Requested-With": "XMLHttpRequest",
+        "Referer": f"https://{v1_base_url}/watch/{id}",
+    }
+    return EPISODE_LIST_URL.format(show_id=show_id), headers
+
+def parse_episodes_list(html):
+    if not html: return []
+
+    episode_links = parse(html).select(EPISODE_LINKS)
+    res = {
+        "totalEpisodes": len(episode_links),
+        "episodes": [],
+    }
+
+    for el in episode_links:
+        href = el.attr("href", "")
+        title = el.attr("title")
+        japanese_title_tag = el.select_one(".ep-name")
+
+        res["episodes"].append({
+            "episode_no": int(el.attr("data-number", 0)),
+            "id": href.split("/")[-1] if href else None,
+            "title": title.strip() if title else None,
+            "japanese_title": japanese_title_tag.attr("data-jname") if japanese_title_tag else None,
+            "filler": "ssl-item-filler" in el.classes(),
+        })
+
+    return res
+
+def extract_episodes_list(id, v1_base_url="hianime.nz"):
+    try:
+        url, headers = episode_list_request(id, v1_base_url)
+        data = session.get(url, headers=headers).json()
+        return parse_episodes_list(data.get("html"))
+
+    except Exception as e:
+        print(e)
+        return []
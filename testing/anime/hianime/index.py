@@ -0,0 +1,88 @@
+import hashlib, json, os, sqlite3, threading, time
+from .records import dumps, loads, plain
+
+# Local catalogue keyed by data_id. Each row keeps the listing entry (the extract_search_results shape), the full
+# parse_anime_info result with its episode list, and hashes of both so a re-crawl can tell what actually changed.
+# Details may be plain dicts or an hianime.records.Anime; both are stored as the same JSON.
+INDEX_PATH = os.environ.get('HIANIME_INDEX', os.path.join(os.path.expanduser('~'), '.cache', 'quickwatch', 'hianime.sqlite'))
+
+def content_hash(value):
+    if not isinstance(value, (str, bytes)): value = json.dumps(plain(value), sort_keys=True, separators=(',', ':'))
+    if isinstance(value, str): value = value.encode('utf-8')
+    return hashlib.sha1(value).hexdigest()
+
+def data_id_of(id):
+    return id.split('-')[-1] if id else None
+
+def episode_count(summary):
+    tv_info = summary.get('tvInfo') or {}
+    return max((tv_info.get(name) or 0 for name in ('sub', 'dub', 'eps')), default=0)
+
+class CatalogueIndex:
+    def __init__(self, path=INDEX_PATH):
+        if path != ':memory:': os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.execute('''CREATE TABLE IF NOT EXISTS anime (
+                data_id TEXT PRIMARY KEY, id TEXT, title TEXT, japanese_title TEXT,
+                summary TEXT, summary_hash TEXT, episodes INTEGER,
+                details TEXT, details_hash TEXT, listed_at REAL, fetched_at REAL)''')
+            self.db.execute('CREATE INDEX IF NOT EXISTS anime_id ON anime (id)')
+
+    def stale(self, summaries):
+        # listing entries whose details are missing, or whose listing hash / episode count moved since the last fetch
+        by_id = {data_id_of(summary['id']): summary for summary in summaries if summary.get('id')}
+        if not by_id: return []
+        placeholders = ','.join('?' * len(by_id))
+        with self.lock:
+            rows = dict((row[0], row[1:]) for row in self.db.execute(
+                f'SELECT data_id, summary_hash, episodes, details IS NOT NULL FROM anime WHERE data_id IN ({placeholders})', list(by_id)))
+
+        stale = []
+        for data_id, summary in by_id.items():
+            row = rows.get(data_id)
+            if row is None or not row[2] or row[0] != content_hash(summary) or row[1] != episode_count(summary): stale.append(summary)
+        return stale
+
+    def put_summaries(self, summaries):
+        # listing data is refreshed in place; details and their hash are left alone until put_details
+        now = time.time()
+        rows = [(data_id_of(summary['id']), summary['id'], summary.get('title'), summary.get('japanese_title'),
+                 dumps(summary).decode('utf-8'), now) for summary in summaries if summary.get('id')]
+        with self.lock, self.db:
+            self.db.executemany('''INSERT INTO anime (data_id, id, title, japanese_title, summary, listed_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(data_id) DO UPDATE SET id=excluded.id, title=excluded.title, japanese_title=excluded.japanese_title,
+                summary=excluded.summary, listed_at=excluded.listed_at''', rows)
+
+    def put_details(self, summary, details):
+        # returns whether the parsed details differ from what was stored before
+        data_id = data_id_of(summary['id'])
+        details_hash = content_hash(details)
+        with self.lock, self.db:
+            previous = self.db.execute('SELECT details_hash FROM anime WHERE data_id = ?', (data_id,)).fetchone()
+            self.db.execute('UPDATE anime SET summary_hash=?, episodes=?, details=?, details_hash=?, fetched_at=? WHERE data_id=?',
+                            (content_hash(summary), episode_count(summary), dumps(details).decode('utf-8'), details_hash, time.time(), data_id))
+        return not previous or previous[0] != details_hash
+
+    def details(self, id):
+        # accepts a slug ("horimiya-1234") or a bare data_id
+        with self.lock:
+            row = self.db.execute('SELECT details FROM anime WHERE data_id = ?', (data_id_of(str(id)),)).fetchone()
+        return loads(row[0]) if row and row[0] else None
+
+    def summaries(self):
+        with self.lock:
+            rows = self.db.execute('SELECT summary FROM anime WHERE summary IS NOT NULL ORDER BY title').fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def records(self):
+        # (summary, details) for every row; details is None until the title has been fetched
+        with self.lock:
+            rows = self.db.execute('SELECT summary, details FROM anime WHERE summary IS NOT NULL').fetchall()
+        return [(loads(summary), loads(details) if details else None) for summary, details in rows]
+
+    def stats(self):
+        with self.lock:
+            total, detailed = self.db.execute('SELECT COUNT(*), COUNT(details) FROM anime').fetchone()
+        return {'titles': total, 'detailed': detailed}
@@ -0,0 +1,71 @@
+import os
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from .hostlimits import HostLimiter, HostUnavailable, Rejected, Throttled, parse_rates, retry_after
+
+# Per-host rate limits and circuit breakers shared by every scraper in the process. The bucket, breaker and
+# limiter live in hostlimits.py; this module configures them from HIANIME_* and wires them into httpx and
+# requests. Hosts start out unthrottled unless HIANIME_HOST_RATES or limit() gives them a rate;
+# HIANIME_BREAKER_FAILURES failures in a row open a host's breaker. async_client() and session carry the
+# shared limiter, so everything built on them is limited without further changes.
+FAILURE_THRESHOLD = int(os.environ.get('HIANIME_BREAKER_FAILURES', 5))
+COOLDOWN = float(os.environ.get('HIANIME_BREAKER_COOLDOWN', 10))
+# async callers queue for up to MAX_WAIT before Throttled is raised; blocking (requests) callers hold a
+# thread while they wait, so they give up much sooner
+MAX_WAIT = float(os.environ.get('HIANIME_MAX_WAIT', 30))
+BLOCKING_MAX_WAIT = 5.0
+HOST_RATES = parse_rates(os.environ.get('HIANIME_HOST_RATES', ''))
+
+def host_limiter():
+    # a limiter configured like the shared one, for a client that keeps its pace to itself (the crawler's)
+    return HostLimiter(HOST_RATES, MAX_WAIT, FAILURE_THRESHOLD, COOLDOWN)
+
+limiter = host_limiter()
+
+class LimitedTransport(httpx.AsyncBaseTransport):
+    # wraps an httpx transport so every request (redirect hops included) is admitted and recorded
+    def __init__(self, transport=None, limiter=limiter, max_wait=None):
+        self.transport = transport or httpx.AsyncHTTPTransport(http2=True)
+        self.limiter = limiter
+        self.max_wait = max_wait
+
+    async def handle_async_request(self, request):
+        url = str(request.url)
+        await self.limiter.acquire(url, self.max_wait)
+        try: response = await self.transport.handle_async_request(request)
+        except Exception as e:
+            self.limiter.record(url, error=e)
+            raise
+        self.limiter.record(url, response.status_code, headers=response.headers)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+class LimitedAdapter(HTTPAdapter):
+    def __init__(self, limiter=limiter, max_wait=BLOCKING_MAX_WAIT, **kw):
+        super().__init__(**kw)
+        self.limiter = limiter
+        self.max_wait = max_wait
+
+    def send(self, request, **kw):
+        self.limiter.wait(request.url, self.max_wait)
+        try: response = super().send(request, **kw)
+        except Exception as e:
+            self.limiter.record(request.url, error=e)
+            raise
+        self.limiter.record(request.url, response.status_code, headers=response.headers)
+        return response
+
+def async_client(timeout=20, limiter=limiter, **kw):
+    return httpx.AsyncClient(transport=LimitedTransport(limiter=limiter), follow_redirects=True, timeout=timeout, **kw)
+
+def limited_session():
+    session = requests.Session()
+    adapter = LimitedAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+session = limited_session()
@@ -0,0 +1,147 @@
+import os
+from functools import lru_cache
+
+# Every backend hands out nodes with the same small surface: select, select_one, text, attr, classes, tag.
+# Selectors are compiled the first time they are seen and reused for every later page.
+
+class LexborNode:
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def select(self, selector):
+        # lexbor includes the context node itself when it matches, bs4/soupsieve never does
+        matches = self.node.css(selector)
+        if matches and matches[0].mem_id == self.node.mem_id: matches = matches[1:]
+        return [LexborNode(node) for node in matches]
+
+    def select_one(self, selector):
+        if self.node.css_matches(selector):
+            matches = self.select(selector)
+            return matches[0] if matches else None
+
+        node = self.node.css_first(selector)
+        return LexborNode(node) if node is not None else None
+
+    def text(self):
+        return self.node.text(deep=True)
+
+    def attr(self, name, default=None):
+        value = self.node.attributes.get(name)
+        return default if value is None else value
+
+    def classes(self):
+        return (self.node.attributes.get('class') or '').split()
+
+    @property
+    def tag(self):
+        return self.node.tag
+
+class LxmlNode:
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def select(self, selector):
+        return [LxmlNode(node) for node in compile_xpath(selector)(self.node)]
+
+    def select_one(self, selector):
+        matches = compile_xpath(selector)(self.node)
+        return LxmlNode(matches[0]) if matches else None
+
+    def text(self):
+        return self.node.text_content()
+
+    def attr(self, name, default=None):
+        return self.node.get(name, default)
+
+    def classes(self):
+        return self.node.get('class', '').split()
+
+    @property
+    def tag(self):
+        return self.node.tag
+
+class SoupNode:
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def select(self, selector):
+        return [SoupNode(node) for node in compile_soup(selector).select(self.node)]
+
+    def select_one(self, selector):
+        node = compile_soup(selector).select_one(self.node)
+        return SoupNode(node) if node is not None else None
+
+    def text(self):
+        return self.node.get_text()
+
+    def attr(self, name, default=None):
+        value = self.node.get(name)
+        if value is None: return default
+        return ' '.join(value) if isinstance(value, list) else value
+
+    def classes(self):
+        return self.node.get('class', [])
+
+    @property
+    def tag(self):
+        return self.node.name
+
+@lru_cache(maxsize=None)
+def compile_xpath(selector):
+    from cssselect import HTMLTranslator
+    from lxml import etree
+    return etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix='descendant::'))
+
+@lru_cache(maxsize=None)
+def compile_soup(selector):
+    import soupsieve
+    return soupsieve.compile(selector)
+
+def parse_lexbor(html):
+    from selectolax.lexbor import LexborHTMLParser
+    return LexborNode(LexborHTMLParser(html).root)
+
+def parse_lxml(html):
+    import lxml.html
+    return LxmlNode(lxml.html.document_fromstring(html))
+
+def parse_soup(html):
+    from bs4 import BeautifulSoup
+    return SoupNode(BeautifulSoup(html, 'html.parser'))
+
+BACKENDS = {
+    'selectolax': (parse_lexbor, ('selectolax',)),
+    'lxml': (parse_lxml, ('lxml', 'cssselect')),
+    'html.parser': (parse_soup, ('bs4',)),
+}
+PREFERENCE = ('selectolax', 'lxml', 'html.parser')
+
+def available(name):
+    try:
+        for module in BACKENDS[name][1]: __import__(module)
+        return True
+    except ImportError:
+        return False
+
+def default_backend():
+    # HIANIME_PARSER forces a backend, otherwise the fastest installed one wins
+    forced = os.environ.get('HIANIME_PARSER')
+    if forced: return forced
+    return next((name for name in PREFERENCE if available(name)), 'html.parser')
+
+backend = default_backend()
+
+def set_backend(name):
+    global backend
+    if name not in BACKENDS: raise ValueError(f"Unknown parser backend: {name}")
+    if not available(name): raise ImportError(f"Parser backend {name} is not installed")
+    backend = name
+
+def parse(html, using=None):
+    return BACKENDS[using or backend][0](html)
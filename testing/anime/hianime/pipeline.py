@@ -0,0 +1,83 @@
+import asyncio, json, re, weakref
+from contextlib import asynccontextmanager
+from .anilist import AniListClient
+from .details import BASE_URL, parse_anime_info
+from .episodes import episode_list_request, parse_episodes_list
+from .limiter import async_client
+
+# Page fetch and episode list start together; the AniList lookup starts as soon as the page's
+# syncData is sniffed, and runs while the full DOM parse happens off the event loop.
+STAGE_TIMEOUTS = {'page': 15.0, 'anilist': 12.0, 'episodes': 15.0}
+SYNC_DATA = re.compile(r'<script[^>]*id="syncData"[^>]*>(.*?)</script>', re.S)
+
+def sniff_anilist_id(html):
+    match = SYNC_DATA.search(html)
+    if not match: return None
+    try: return json.loads(match.group(1)).get('anilist_id')
+    except (ValueError, AttributeError): return None
+
+async def fetch_page(client, id):
+    resp = await client.get(f"{BASE_URL}/{id}")
+    resp.raise_for_status()
+    return resp.text
+
+async def fetch_episodes(client, id):
+    url, headers = episode_list_request(id)
+    resp = await client.get(url, headers=headers)
+    resp.raise_for_status()
+    return await asyncio.to_thread(parse_episodes_list, resp.json().get("html"))
+
+async def stage(name, coro, timeout, default=None):
+    try: return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError: print(f"Stage {name} timed out after {timeout}s")
+    except Exception as e: print(f"Stage {name} failed: {e}")
+    return default
+
+# loop -> [client, users]; weak so a finished asyncio.run() doesn't keep its loop alive
+anilist_clients = weakref.WeakKeyDictionary()
+
+@asynccontextmanager
+async def shared_anilist():
+    # futures belong to a loop, so concurrent lookups on one loop share a batching client (the disk cache and
+    # limiter are shared by all of them); the last one out closes it
+    loop = asyncio.get_running_loop()
+    entry = anilist_clients.get(loop)
+    if entry is None: entry = anilist_clients[loop] = [AniListClient(), 0]
+    entry[1] += 1
+    try: yield entry[0]
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            if anilist_clients.get(loop) is entry: del anilist_clients[loop]
+            await entry[0].aclose()
+
+async def extract_anime_info_async(id, client=None, timeouts=None, anilist=None):
+    if anilist is None:
+        async with shared_anilist() as anilist: return await extract_anime_info_async(id, client, timeouts, anilist)
+
+    timeouts = dict(STAGE_TIMEOUTS, **(timeouts or {}))
+    own_client = client is None
+    if own_client: client = async_client(timeout=max(timeouts.values()))
+
+    episodes = asyncio.create_task(stage('episodes', fetch_episodes(client, id), timeouts['episodes'], []))
+    banner = None
+    try:
+        html = await stage('page', fetch_page(client, id), timeouts['page'])
+        if html is None: return None
+
+        anilist_id = sniff_anilist_id(html)
+        if anilist_id: banner = asyncio.create_task(stage('anilist', anilist.banner(anilist_id), timeouts['anilist']))
+
+        try: info = await asyncio.to_thread(parse_anime_info, html, id)
+        except Exception as e:
+            print(f"Error extracting anime info: {e}")
+            return None
+
+        if banner: info["backdrop_image"] = await banner
+        info["episodes"] = await episodes
+        return info
+
+    finally:
+        for task in (episodes, banner):
+            if task and not task.done(): task.cancel()
+        if own_client: await client.aclose()
@@ -0,0 +1,130 @@
+import json
+from dataclasses import dataclass, field, fields
+
+# Slotted records for what the scrapers return. Field names are the JSON keys, in the same order, so
+# to_dict()/dumps() produce exactly the dicts parse_* hand out today; from_dict() accepts those dicts.
+# orjson and msgpack are optional: dumps/loads fall back to the json module, pack/unpack need msgpack.
+try: import orjson
+except ImportError: orjson = None
+
+try: import msgpack
+except ImportError: msgpack = None
+
+class Record:
+    __slots__ = ()
+    nested = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data is None or isinstance(data, cls): return data
+        values = {}
+        for item in fields(cls):
+            if item.name not in data: continue
+            value = data[item.name]
+            record = cls.nested.get(item.name)
+            if record and isinstance(value, list): value = [record.from_dict(entry) for entry in value]
+            elif record and value is not None: value = record.from_dict(value)
+            values[item.name] = value
+        return cls(**values)
+
+    def to_dict(self):
+        return {item.name: plain(getattr(self, item.name)) for item in fields(self)}
+
+@dataclass(slots=True)
+class Episode(Record):
+    episode_no: int
+    id: str = None
+    title: str = None
+    japanese_title: str = None
+    filler: bool = False
+
+@dataclass(slots=True)
+class EpisodeList(Record):
+    # parse_episodes_list's result
+    totalEpisodes: int = 0
+    episodes: list = field(default_factory=list)
+
+EpisodeList.nested = {'episodes': Episode}
+
+@dataclass(slots=True)
+class Season(Record):
+    name: str = ""
+    route: str = ""
+    background: str = ""
+
+@dataclass(slots=True)
+class SearchResult(Record):
+    id: str = None
+    title: str = None
+    japanese_title: str = None
+    poster: str = None
+    duration: str = None
+    tvInfo: dict = field(default_factory=dict)
+
+@dataclass(slots=True)
+class RelatedAnime(Record):
+    # entries of recommended_data / related_data
+    data_id: str = None
+    id: str = None
+    title: str = ""
+    japanese_title: str = ""
+    poster: str = None
+    tvInfo: dict = field(default_factory=dict)
+    adultContent: bool = False
+
+@dataclass(slots=True)
+class Anime(Record):
+    adultContent: bool = False
+    data_id: str = None
+    id: str = None
+    anilistId: int = None
+    malId: int = None
+    title: str = ""
+    japanese_title: str = None
+    synonyms: str = ""
+    poster: str = None
+    backdrop_image: str = None
+    showType: str = ""
+    animeInfo: dict = field(default_factory=dict)
+    seasons: list = field(default_factory=list)
+    recommended_data: list = field(default_factory=list)
+    related_data: list = field(default_factory=list)
+    # only present when the episode list was fetched alongside (extract_anime_info_async, the crawler)
+    episodes: EpisodeList = None
+
+    def to_dict(self):
+        data = Record.to_dict(self)
+        if self.episodes is None: del data['episodes']
+        return data
+
+Anime.nested = {'seasons': Season, 'recommended_data': RelatedAnime, 'related_data': RelatedAnime, 'episodes': EpisodeList}
+
+def plain(value):
+    if isinstance(value, Record): return value.to_dict()
+    if isinstance(value, (list, tuple)): return [plain(item) for item in value]
+    if isinstance(value, dict): return {key: plain(item) for key, item in value.items()}
+    return value
+
+def episodes_from(parsed):
+    # parse_episodes_list's {"totalEpisodes", "episodes"} -> [Episode]
+    return [Episode.from_dict(item) for item in (parsed or {}).get('episodes', [])]
+
+def dumps(value):
+    # compact UTF-8 JSON bytes; Anime with episodes=None drops the key, like the plain dicts
+    if orjson: return orjson.dumps(value, default=default, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+    return json.dumps(plain(value), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def default(value):
+    if isinstance(value, Record): return value.to_dict()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def pack(value):
+    if msgpack is None: raise ImportError("msgpack is not installed")
+    return msgpack.packb(value, default=default, use_bin_type=True)
+
+def unpack(data):
+    if msgpack is None: raise ImportError("msgpack is not installed")
+    return msgpack.unpackb(data, raw=False)
@@ -0,0 +1,73 @@
+from .limiter import session
+from .parser import parse
+
+SEARCH_URL = "https://hianime.nz/search"
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br"
+}
+
+RESULTS = "#main-content .film_list-wrap .flw-item"
+LAST_PAGE = '.pre-pagination nav .pagination > .page-item a[title="Last"]'
+NEXT_PAGE = '.pre-pagination nav .pagination > .page-item a[title="Next"]'
+ACTIVE_PAGE = ".pre-pagination nav .pagination > .page-item.active a"
+
+def tick_count(element, selector):
+    tick = element.select_one(selector)
+    text = tick.text().strip() if tick else ""
+    if not text: return None
+    try: return int(text.split()[-1])
+    except (ValueError, IndexError): return None
+
+def extract_total_pages(soup):
+    last_page = soup.select_one(LAST_PAGE)
+    next_page = soup.select_one(NEXT_PAGE)
+    active_page = soup.select_one(ACTIVE_PAGE)
+
+    if last_page and last_page.attr('href') is not None: return int(last_page.attr('href').split('=')[-1])
+    if next_page and next_page.attr('href') is not None: return int(next_page.attr('href').split('=')[-1])
+    if active_page: return int(active_page.text().strip())
+    return 1
+
+def parse_search_results(html):
+    soup = parse(html)
+    results = []
+
+    for element in soup.select(RESULTS):
+        film_name = element.select_one(".film-detail .film-name .dynamic-name")
+        href = film_name.attr('href') if film_name else None
+        poster = element.select_one(".film-poster .film-poster-img")
+        poster_src = poster.attr('data-src') if poster else None
+        duration = element.select_one(".film-detail .fd-infor .fdi-item.fdi-duration")
+        # hianime puts the type in the leading .fdi-item; ":nth-of-type" on a bare class isn't portable to XPath
+        show_type = element.select_one(".film-detail .fd-infor .fdi-item")
+        rating = element.select_one(".film-poster .tick-rate")
+        japanese_title = film_name.attr('data-jname') if film_name else None
+
+        results.append({
+            "id": href[1:].split("?ref=search")[0] if href else None,
+            "title": film_name.text().strip() if film_name else None,
+            "japanese_title": japanese_title.strip() if japanese_title is not None else None,
+            "poster": poster_src.strip() if poster_src is not None else None,
+            "duration": duration.text().strip() if duration else None,
+            "tvInfo": {
+                "showType": show_type.text().strip() if show_type else "Unknown",
+                "rating": rating.text().strip() if rating else None,
+                "sub": tick_count(element, ".film-poster .tick-sub"),
+                "dub": tick_count(element, ".film-poster .tick-dub"),
+                "eps": tick_count(element, ".film-poster .tick-eps")
+            }
+        })
+
+    return extract_total_pages(soup), results
+
+def extract_search_results(search_term, page=1):
+    try:
+        response = session.get(SEARCH_URL, params={"keyword": search_term, "page": page}, headers=DEFAULT_HEADERS)
+        response.raise_for_status()
+        return parse_search_results(response.text)
+
+    except Exception as e:
+        print(f"Error fetching search results: {e}")
+        return 0, []
@@ -0,0 +1,163 @@
+import bisect, math, re, unicodedata
+from collections import defaultdict
+from .index import data_id_of
+
+# In-memory title search over the crawled catalogue. Titles, Japanese (romaji) titles and synonyms are
+# folded to plain ascii tokens; a query token matches exactly, as a prefix, or within a small edit distance
+# (found through a trigram index), and results come back in the extract_search_results shape.
+PAGE_SIZE = 36
+FIELD_WEIGHTS = {'title': 1.0, 'alias': 0.9, 'genre': 0.3}
+MATCH_SCORES = {'exact': 3.0, 'prefix': 2.0, 'fuzzy': 1.0}
+NON_WORD = re.compile(r'[^a-z0-9]+')
+# romaji is spelled with and without long vowels ("Shingeki no Kyojin" / "Kyoujin" / "Kyōjin")
+ROMAJI = ((re.compile(r'ou'), 'o'), (re.compile(r'uu'), 'u'), (re.compile(r'oo'), 'o'), (re.compile(r'aa'), 'a'), (re.compile(r'ii'), 'i'))
+ALIASES = {'2nd': '2', '3rd': '3', '4th': '4', 'ii': '2', 'iii': '3', 'iv': '4', 'film': 'movie'}
+
+def fold(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return text.replace('&', ' and ')
+
+def romaji(token):
+    for pattern, replacement in ROMAJI: token = pattern.sub(replacement, token)
+    return token
+
+def tokenize(text):
+    tokens = []
+    for token in NON_WORD.split(fold(text)):
+        if not token: continue
+        tokens.append(romaji(ALIASES.get(token, token)))
+    return tokens
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def within(a, b, limit):
+    # banded Levenshtein: only cells within `limit` of the diagonal can stay under the limit, the rest
+    # count as limit + 1; stops as soon as a whole band row is over the limit
+    if abs(len(a) - len(b)) > limit: return None
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, char in enumerate(a, 1):
+        low, high = max(i - limit, 1), min(i + limit, len(b))
+        current = [over] * (len(b) + 1)
+        if i <= limit: current[0] = i
+        for j in range(low, high + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != b[j - 1]), over)
+        if min(current[low - 1:high + 1]) > limit: return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+def typo_limit(token):
+    return 0 if len(token) < 4 else 1 if len(token) < 8 else 2
+
+class SearchIndex:
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.documents = {}
+        self.postings = defaultdict(dict)   # token -> {data_id: best field weight}
+        self.grams = defaultdict(set)       # trigram -> tokens
+        self.vocabulary = []                # sorted, for prefix ranges
+        self.fields = {}                    # data_id -> [(token, weight)] so remove() can undo add()
+        self.expansions = {}                # query token -> expand() result, dropped whenever the vocabulary changes
+
+    @classmethod
+    def from_catalogue(cls, catalogue, **kw):
+        index = cls(**kw)
+        for summary, details in catalogue.records(): index.add(summary, details)
+        return index
+
+    def add(self, summary, details=None):
+        data_id = data_id_of(summary.get('id'))
+        if data_id is None: return
+        if data_id in self.documents: self.remove(data_id)
+
+        details = details or {}
+        fields = [(summary.get('title'), 'title'), (summary.get('japanese_title'), 'alias'), (details.get('japanese_title'), 'alias')]
+        fields += [(synonym, 'alias') for synonym in (details.get('synonyms') or '').split(',')]
+        fields += [(genre.replace('-', ' '), 'genre') for genre in (details.get('animeInfo') or {}).get('Genres') or []]
+
+        weights = {}
+        for text, field in fields:
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+
+        self.documents[data_id] = {'summary': summary, 'title': tokenize(summary.get('title'))}
+        self.fields[data_id] = list(weights.items())
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.expansions.clear()
+                bisect.insort(self.vocabulary, token)
+                for gram in trigrams(token): self.grams[gram].add(token)
+            self.postings[token][data_id] = weight
+
+    def remove(self, data_id):
+        self.documents.pop(data_id, None)
+        for token, _ in self.fields.pop(data_id, []):
+            postings = self.postings.get(token)
+            if postings is None: continue
+            postings.pop(data_id, None)
+            if not postings:
+                del self.postings[token]
+                self.expansions.clear()
+                self.vocabulary.pop(bisect.bisect_left(self.vocabulary, token))
+                for gram in trigrams(token): self.grams[gram].discard(token)
+
+    def expand(self, token):
+        # vocabulary tokens this query token can stand for, with how well they match; typing a query
+        # re-sends the same leading tokens over and over, so expansions are memoized
+        if token in self.expansions: return self.expansions[token]
+        if len(self.expansions) > 4096: self.expansions.clear()
+        matches = self.expansions[token] = {}
+        if token in self.postings: matches[token] = MATCH_SCORES['exact']
+
+        start = bisect.bisect_left(self.vocabulary, token)
+        for candidate in self.vocabulary[start:start + 200]:
+            if not candidate.startswith(token): break
+            matches.setdefault(candidate, MATCH_SCORES['prefix'] * len(token) / len(candidate) + 1.0)
+
+        # a word that exists as typed is not treated as a typo
+        limit = typo_limit(token) if token not in self.postings else 0
+        if limit:
+            counts = defaultdict(int)
+            for gram in trigrams(token):
+                for candidate in self.grams.get(gram, ()): counts[candidate] += 1
+            needed = len(trigrams(token)) - 3 * limit
+            for candidate, shared in counts.items():
+                if candidate in matches or shared < needed: continue
+                distance = within(token, candidate, limit)
+                if distance is not None: matches[candidate] = MATCH_SCORES['fuzzy'] * (1 - distance / (limit + 1))
+        return matches
+
+    def rank(self, term):
+        tokens = tokenize(term)
+        if not tokens: return []
+
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for token in tokens:
+            best = {}
+            for candidate, score in self.expand(token).items():
+                for data_id, weight in self.postings[candidate].items():
+                    best[data_id] = max(best.get(data_id, 0), score * weight)
+            for data_id, score in best.items():
+                scores[data_id] += score
+                matched[data_id] += 1
+
+        # every query token has to hit something; if nothing does, fall back to the best partial matches
+        complete = [data_id for data_id in scores if matched[data_id] == len(tokens)] or list(scores)
+
+        def key(data_id):
+            title = self.documents[data_id]['title']
+            bonus = 2.0 if title == tokens else 1.0 if title[:len(tokens)] == tokens else 0.0
+            return (-(scores[data_id] + bonus), len(title), data_id)
+
+        return sorted(complete, key=key)
+
+    def search(self, term, page=1):
+        # same (total_pages, results) shape as extract_search_results; pages count from 1
+        page = max(int(page), 1)
+        ranked = self.rank(term)
+        total_pages = max(math.ceil(len(ranked) / self.page_size), 1)
+        start = (page - 1) * self.page_size
+        return total_pages, [self.documents[data_id]['summary'] for data_id in ranked[start:start + self.page_size]]
@@ -0,0 +1,90 @@
+import asyncio, json
+import httpx
+import pytest
+from hianime import anilist
+from hianime.anilist import MAX_BATCH, AniListClient, MediaCache, fetch_banner
+
+def media(id, banner=True):
+    return {'id': id, 'bannerImage': f'https://img/{id}-banner.jpg' if banner else None, 'coverImage': {'extraLarge': f'https://img/{id}-cover.jpg'}}
+
+def graphql(known, statuses=()):
+    # AniList stand-in for the batch query; answers with whichever of the requested ids it knows
+    requests, statuses = [], list(statuses)
+    def handler(request):
+        variables = json.loads(request.content)['variables']
+        requests.append(variables['ids'])
+        if statuses: return httpx.Response(statuses.pop(0))
+        return httpx.Response(200, json={'data': {'Page': {'media': [known[id] for id in variables['ids'] if id in known]}}})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+def test_concurrent_lookups_go_out_as_one_batch():
+    known = {1: media(1), 2: media(2, banner=False)}
+    async def main():
+        client, requests = graphql(known)
+        lookups = AniListClient(client, MediaCache(':memory:'))
+        banners = await asyncio.gather(lookups.banner(1), lookups.banner('2'), lookups.banner(3), lookups.banner(1))
+        # everything is cached now, including the id AniList doesn't have
+        again = await asyncio.gather(lookups.banner(1), lookups.banner(3))
+        await lookups.aclose()
+        return banners, again, requests
+
+    banners, again, requests = asyncio.run(main())
+    # the backdrop is the banner only, never the cover
+    assert banners == ['https://img/1-banner.jpg', None, None, 'https://img/1-banner.jpg']
+    assert again == ['https://img/1-banner.jpg', None]
+    assert [sorted(ids) for ids in requests] == [[1, 2, 3]]
+
+def test_large_warm_is_split_into_pages():
+    known = {id: media(id) for id in range(1, 121)}
+    async def main():
+        client, requests = graphql(known)
+        lookups = AniListClient(client, MediaCache(':memory:'))
+        resolved = await lookups.warm(range(1, 121))
+        await lookups.aclose()
+        return resolved, requests
+
+    resolved, requests = asyncio.run(main())
+    assert len(resolved) == 120 and resolved[7] == {'bannerImage': 'https://img/7-banner.jpg', 'coverImage': 'https://img/7-cover.jpg'}
+    assert sorted(len(ids) for ids in requests) == [20, MAX_BATCH, MAX_BATCH]
+
+def test_failed_batch_is_retried(monkeypatch):
+    async def no_wait(delay): pass
+    async def main():
+        client, requests = graphql({5: media(5)}, statuses=[502])
+        lookups = AniListClient(client, MediaCache(':memory:'))
+        monkeypatch.setattr(anilist.asyncio, 'sleep', no_wait)
+        banner = await lookups.banner(5)
+        monkeypatch.undo()
+        await lookups.aclose()
+        return banner, requests
+
+    banner, requests = asyncio.run(main())
+    assert banner == 'https://img/5-banner.jpg' and requests == [[5], [5]]
+
+class FakeSession:
+    def __init__(self, payload):
+        self.payload = payload
+        self.posts = 0
+
+    def post(self, url, json):
+        self.posts += 1
+        payload = self.payload
+        return type('Response', (), {'status_code': 200, 'raise_for_status': lambda self: None, 'json': lambda self: payload})()
+
+def test_sync_lookup_caches_what_the_batch_query_would(monkeypatch):
+    cache = MediaCache(':memory:')
+    session = FakeSession({'data': {'Media': {'bannerImage': None, 'coverImage': {'extraLarge': 'https://img/9-cover.jpg'}}}})
+    monkeypatch.setattr(anilist, 'default_cache', cache)
+    monkeypatch.setattr(anilist, 'session', session)
+
+    assert fetch_banner(9) is None and fetch_banner('9') is None and session.posts == 1
+    assert cache.get_many([9]) == {9: {'bannerImage': None, 'coverImage': 'https://img/9-cover.jpg'}}
+
+    # the async client trusts the shared cache, so it has to hold the full entry
+    async def cached():
+        client, requests = graphql({})
+        lookups = AniListClient(client, cache)
+        found = await lookups.media(9)
+        await lookups.aclose()
+        return found, requests
+    assert asyncio.run(cached()) == ({'bannerImage': None, 'coverImage': 'https://img/9-cover.jpg'}, [])
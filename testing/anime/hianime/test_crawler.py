@@ -0,0 +1,62 @@
+import asyncio, os
+import httpx
+from hianime import crawler
+from hianime.crawler import Crawler
+from hianime.index import CatalogueIndex
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+def fixture(*parts):
+    with open(os.path.join(FIXTURES, *parts), encoding='utf-8') as f: return f.read()
+
+class FakeAniList:
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.asked = 0
+
+    async def banner(self, anilist_id):
+        self.asked += 1
+        if self.behaviour == 'fail': raise RuntimeError('AniList is down')
+        if self.behaviour == 'hang': await asyncio.sleep(10)
+        return 'https://img/banner.jpg'
+
+def site():
+    # listing pages are the recorded search page; every title gets the same details page and episode list
+    requests = {'listing': 0, 'details': 0, 'episodes': 0}
+    def handler(request):
+        if request.url.path == '/az-list':
+            requests['listing'] += 1
+            return httpx.Response(200, text=fixture('search', 'one-piece-page-2.html'))
+        if '/ajax/' in request.url.path:
+            requests['episodes'] += 1
+            return httpx.Response(200, json={'html': fixture('episodes', 'horimiya-15733.html')})
+        requests['details'] += 1
+        return httpx.Response(200, text=fixture('details', 'horimiya-15733.html'))
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+def crawl(index, anilist, **kwargs):
+    async def main():
+        client, requests = site()
+        async with client: stats = await Crawler(index, client, anilist=anilist).run(max_pages=1, **kwargs)
+        return stats, requests
+    return asyncio.run(main())
+
+def test_second_crawl_only_fetches_what_changed():
+    index = CatalogueIndex(':memory:')
+    stats, requests = crawl(index, FakeAniList('ok'))
+    assert stats['listed'] == 36 and stats['fetched'] == 36 and stats['failed'] == 0 and stats['skipped'] == 0
+    assert requests == {'listing': 1, 'details': 36, 'episodes': 36}
+
+    stats, requests = crawl(index, FakeAniList('ok'))
+    assert stats['fetched'] == 0 and stats['skipped'] == 36 and requests['details'] == 0
+
+    stats, _ = crawl(index, FakeAniList('ok'), force=True)
+    assert stats['fetched'] == 36 and stats['changed'] == 0
+
+def test_anilist_trouble_does_not_fail_titles(monkeypatch):
+    monkeypatch.setitem(crawler.STAGE_TIMEOUTS, 'anilist', 0.05)
+    for behaviour in ('fail', 'hang'):
+        index = CatalogueIndex(':memory:')
+        anilist = FakeAniList(behaviour)
+        stats, _ = crawl(index, anilist)
+        assert stats['fetched'] == 36 and stats['failed'] == 0 and anilist.asked == 36
@@ -0,0 +1,86 @@
+import asyncio, sys
+import httpx
+import pytest
+from hianime import hostlimits
+from hianime.crawler import Crawler
+from hianime.hostlimits import AdaptiveBucket, CircuitBreaker, HostLimiter, HostUnavailable, Throttled, parse_rates, retry_after
+from hianime.index import CatalogueIndex
+from hianime.limiter import LimitedTransport, limiter
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(hostlimits.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_the_package_keeps_its_own_copy():
+    assert 'hostlimits' not in sys.modules or sys.modules['hostlimits'] is not hostlimits
+
+def test_rates_and_retry_after():
+    assert parse_rates(' hianime.nz=5, Graphql.AniList.co=0.5 ,') == {'hianime.nz': 5.0, 'graphql.anilist.co': 0.5}
+    assert retry_after({'Retry-After': '12'}) == 12.0 and retry_after({'Retry-After': 'soon'}) == hostlimits.DEFAULT_RETRY_AFTER
+    assert retry_after({}, 3) == 3 and retry_after(None) == hostlimits.DEFAULT_RETRY_AFTER
+
+def test_bucket_paces_then_backs_off_on_429(clock):
+    bucket = AdaptiveBucket(2.0)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+    bucket.throttle(5.0)
+    assert bucket.rate == 1.0 and bucket.reserve(max_wait=1) is None
+    clock[0] += 5.0
+    assert bucket.reserve(max_wait=1) <= 1
+    bucket.recover()
+    assert bucket.rate == pytest.approx(1.0 * (1 + hostlimits.RECOVERY))
+
+def test_breaker_opens_probes_and_doubles_its_cooldown(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+    breaker.failed()
+    assert breaker.allow() is None
+    breaker.failed()
+    assert breaker.state == 'open' and breaker.allow() == 10
+
+    clock[0] += 10
+    assert breaker.allow() is None and breaker.state == 'half_open'
+    # one probe at a time
+    assert breaker.allow() == 1.0
+    breaker.failed()
+    assert breaker.state == 'open' and breaker.cooldown == 20
+
+    clock[0] += 20
+    assert breaker.allow() is None
+    breaker.succeeded()
+    assert breaker.state == 'closed' and breaker.cooldown == 10
+
+def test_fixed_rates_win_over_limit():
+    limits = HostLimiter({'hianime.nz': 5.0})
+    limits.limit('hianime.nz', 1.0)
+    limits.limit('graphql.anilist.co', 0.5)
+    assert limits.entry('hianime.nz')[0].rate == 5.0 and limits.entry('graphql.anilist.co')[0].rate == 0.5
+
+def client(limits, statuses, max_wait=None):
+    statuses = iter(statuses)
+    def handler(request):
+        status = next(statuses)
+        return httpx.Response(status, headers={'Retry-After': '60'} if status == 429 else {})
+    return httpx.AsyncClient(transport=LimitedTransport(httpx.MockTransport(handler), limits, max_wait))
+
+def test_transport_turns_429s_and_failures_into_fast_rejections():
+    async def main():
+        limits = HostLimiter(threshold=2)
+        async with client(limits, [429], max_wait=1) as throttled:
+            assert (await throttled.get('https://a.example/')).status_code == 429
+            with pytest.raises(Throttled): await throttled.get('https://a.example/')
+
+        async with client(limits, [503, 503]) as failing:
+            for _ in range(2): assert (await failing.get('https://b.example/')).status_code == 503
+            with pytest.raises(HostUnavailable): await failing.get('https://b.example/')
+
+        stats = limits.stats()
+        assert stats['a.example']['throttles'] == 1 and stats['a.example']['rejected'] == 1
+        assert stats['b.example']['state'] == 'open' and stats['b.example']['opened'] == 1
+    asyncio.run(main())
+
+def test_crawlers_keep_their_pace_to_themselves():
+    slow, fast = Crawler(CatalogueIndex(':memory:'), rate=0.5), Crawler(CatalogueIndex(':memory:'), rate=8.0)
+    assert slow.limiter is not fast.limiter and slow.limiter is not limiter
+    assert slow.limiter.entry('hianime.nz')[0].rate == 0.5 and fast.limiter.entry('hianime.nz')[0].rate == 8.0
+    assert 'hianime.nz' not in limiter.rates
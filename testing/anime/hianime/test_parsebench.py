@@ -0,0 +1,46 @@
+import parsebench
+from hianime import parser
+
+def test_first_difference_points_at_the_first_disagreement():
+    expected = {'title': 'Horimiya', 'episodes': [{'no': 1}, {'no': 2}], 'info': {'type': 'TV'}}
+    assert parsebench.first_difference(expected, {'title': 'Horimiya', 'episodes': [{'no': 1}, {'no': 2}], 'info': {'type': 'TV'}}) is None
+    assert parsebench.first_difference(expected, dict(expected, title='Horimiya!')) == "$.title: expected 'Horimiya', got 'Horimiya!'"
+    assert parsebench.first_difference(expected, dict(expected, episodes=[{'no': 1}, {'no': 3}])) == "$.episodes[1].no: expected 2, got 3"
+    assert parsebench.first_difference(expected, dict(expected, episodes=[{'no': 1}])) == "$.episodes: expected 2 items, got 1"
+    assert parsebench.first_difference(expected, dict(expected, info={})) == "$.info.type: missing"
+    assert parsebench.first_difference(expected, dict(expected, extra=1)) == "$.extra: unexpected"
+    assert parsebench.first_difference(1, 1.0) == "$: expected int, got float"
+
+def test_check_against_golden_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(parsebench, 'GOLDEN', str(tmp_path))
+    entry = {'kind': 'search', 'name': 'sample'}
+    assert parsebench.check('search', entry, {}) == "no golden file (run with --update-golden)"
+
+    parsebench.write_golden('search', entry, {'total_pages': 1, 'results': [('a', 'b')]})
+    # tuples come back as lists, the way they were stored
+    assert parsebench.check('search', entry, {'total_pages': 1, 'results': [('a', 'b')]}) is None
+    assert parsebench.check('search', entry, {'total_pages': 2, 'results': [['a', 'b']]}) == "$.total_pages: expected 1, got 2"
+
+def test_compare_flags_slower_medians():
+    row = lambda fixture, median: {'backend': 'lxml', 'extractor': 'details', 'fixture': fixture, 'median_ms': median}
+    baseline = {'rows': [row('a', 1.0), row('b', 1.0), row('c', 0)]}
+    diffs = parsebench.compare([row('a', 1.1), row('b', 1.2), row('c', 5.0), row('d', 1.0)], baseline)
+    assert [(key[2], slower) for key, _, _, _, slower in diffs] == [('a', False), ('b', True)]
+
+def test_run_checks_every_page(monkeypatch):
+    monkeypatch.setattr(parser, 'backend', parser.backend)
+    backend = next(name for name in parser.PREFERENCE if parser.available(name))
+    rows, failures = parsebench.run([backend], ['search', 'episodes'], repeat=1)
+    corpus = parsebench.load_corpus()
+    assert failures == [] and all(row['ok'] for row in rows)
+    assert len(rows) == sum(entry['kind'] in ('search', 'episodes') for entry in corpus)
+    assert all(row['median_ms'] >= 0 and row['retained_blocks'] >= 0 for row in rows)
+
+def test_run_reports_mismatches(monkeypatch):
+    monkeypatch.setattr(parser, 'backend', parser.backend)
+    backend = next(name for name in parser.PREFERENCE if parser.available(name))
+    parse = lambda html, entry: {'total_pages': 0, 'results': []}
+    monkeypatch.setitem(parsebench.EXTRACTORS, 'search', ('search', parse))
+    rows, failures = parsebench.run([backend], ['search'], repeat=1)
+    assert failures and all(extractor == 'search' and difference.startswith('$.') for _, extractor, _, difference in failures)
+    assert [row['ok'] for row in rows].count(False) == len(failures)
@@ -0,0 +1,40 @@
+import pytest
+import parsebench
+from hianime import parser
+
+BACKENDS = [name for name in parser.PREFERENCE if parser.available(name)]
+CASES = [(extractor, entry) for extractor, (kind, _) in parsebench.EXTRACTORS.items() for entry in parsebench.load_corpus() if entry['kind'] == kind]
+
+PAGE = '<div class="a b" id="outer"><p class="x">one</p><div class="a"><p>two <b>bold</b></p></div></div>'
+
+@pytest.fixture
+def backend(request, monkeypatch):
+    # every test leaves the module-wide backend as it found it
+    monkeypatch.setattr(parser, 'backend', parser.backend)
+    parser.set_backend(request.param)
+    return request.param
+
+@pytest.mark.parametrize('backend', BACKENDS, indirect=True)
+@pytest.mark.parametrize('extractor, entry', CASES, ids=[f"{extractor}-{entry['name']}" for extractor, entry in CASES])
+def test_fixtures_match_golden(backend, extractor, entry):
+    parse = parsebench.EXTRACTORS[extractor][1]
+    assert parsebench.check(extractor, entry, parse(parsebench.read_page(entry), entry)) is None
+
+@pytest.mark.parametrize('backend', BACKENDS, indirect=True)
+def test_nodes_behave_the_same_on_every_backend(backend):
+    root = parser.parse(PAGE)
+    outer = root.select_one('div.a')
+    assert outer.attr('id') == 'outer' and outer.classes() == ['a', 'b'] and outer.tag == 'div'
+    assert outer.attr('missing', 'default') == 'default'
+
+    # a node never matches itself, only its descendants
+    assert [node.attr('id') for node in outer.select('div.a')] == [None]
+    assert outer.select_one('div.a').select_one('p').text() == 'two bold'
+    assert [node.text() for node in outer.select('p')] == ['one', 'two bold']
+    assert outer.select_one('span') is None
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(parser, 'backend', parser.backend)
+    with pytest.raises(ValueError): parser.set_backend('html5lib')
+    monkeypatch.setenv('HIANIME_PARSER', 'lxml')
+    assert parser.default_backend() == 'lxml'
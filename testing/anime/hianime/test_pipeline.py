@@ -0,0 +1,95 @@
+import asyncio, json, os
+import httpx
+import pytest
+from hianime import pipeline
+from hianime.episodes import parse_episodes_list
+from hianime.pipeline import extract_anime_info_async, shared_anilist
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+ID = 'horimiya-15733'
+
+def fixture(*parts):
+    with open(os.path.join(FIXTURES, *parts), encoding='utf-8') as f: return f.read()
+
+class FakeAniList:
+    def __init__(self, delay=0.0, banner='https://img/banner.jpg'):
+        self.delay = delay
+        self.image = banner
+        self.asked = []
+        self.closed = False
+
+    async def banner(self, anilist_id):
+        self.asked.append(anilist_id)
+        await asyncio.sleep(self.delay)
+        return self.image
+
+    async def aclose(self):
+        self.closed = True
+
+def site(page_delay=0.0, page_status=200, episodes_status=200):
+    # hianime stand-in; records the order requests arrive in
+    seen = []
+    async def handler(request):
+        if '/ajax/' in request.url.path:
+            seen.append('episodes')
+            return httpx.Response(episodes_status, json={'html': fixture('episodes', f'{ID}.html')})
+        seen.append('page')
+        await asyncio.sleep(page_delay)
+        seen.append('page done')
+        return httpx.Response(page_status, text=fixture('details', f'{ID}.html'))
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), seen
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_page_episodes_and_banner_are_combined():
+    async def main():
+        client, seen = site(page_delay=0.05)
+        anilist = FakeAniList()
+        async with client: info = await extract_anime_info_async(ID, client, anilist=anilist)
+        return info, seen, anilist
+
+    info, seen, anilist = run(main())
+    golden = json.loads(fixture('golden', 'details', f'{ID}.json'))
+    assert {key: info[key] for key in golden if key != 'backdrop_image'} == {key: value for key, value in golden.items() if key != 'backdrop_image'}
+    # the episode list doesn't wait for the page
+    assert seen.index('episodes') < seen.index('page done')
+    assert anilist.asked == ['124080'] and info['backdrop_image'] == 'https://img/banner.jpg'
+    assert info['episodes'] == parse_episodes_list(fixture('episodes', f'{ID}.html'))
+
+def test_slow_or_failing_stages_fall_back():
+    async def main():
+        client, _ = site(episodes_status=500)
+        async with client:
+            return await extract_anime_info_async(ID, client, timeouts={'anilist': 0.05}, anilist=FakeAniList(delay=1))
+
+    info = run(main())
+    assert info['title'] and info['backdrop_image'] is None and info['episodes'] == []
+
+def test_missing_page_gives_none():
+    async def main():
+        client, _ = site(page_status=404)
+        async with client: return await extract_anime_info_async(ID, client, anilist=FakeAniList())
+    assert run(main()) is None
+
+def test_concurrent_lookups_share_one_anilist_client(monkeypatch):
+    created = []
+    def make():
+        created.append(FakeAniList())
+        return created[-1]
+    monkeypatch.setattr(pipeline, 'AniListClient', make)
+
+    async def main():
+        async def use():
+            async with shared_anilist() as client:
+                await asyncio.sleep(0.01)
+                return client
+        clients = await asyncio.gather(*(use() for _ in range(3)))
+        assert len({id(client) for client in clients}) == 1 and clients[0].closed
+        assert not pipeline.anilist_clients
+
+        # the next lookup after everyone left gets a fresh client
+        async with shared_anilist() as client: assert client is not clients[0]
+
+    run(main())
+    assert len(created) == 2
@@ -0,0 +1,27 @@
+import os
+import pytest
+from hianime.details import parse_anime_info
+from hianime.episodes import parse_episodes_list
+from hianime.records import Anime, Episode, EpisodeList, dumps, loads
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+def fixture(*parts):
+    with open(os.path.join(FIXTURES, *parts), encoding='utf-8') as f: return f.read()
+
+@pytest.mark.parametrize('id', ['horimiya-15733', 'one-piece-100'])
+def test_scraped_details_with_episodes_round_trip(id):
+    info = parse_anime_info(fixture('details', f'{id}.html'), id)
+    info['episodes'] = parse_episodes_list(fixture('episodes', f'{id}.html'))
+
+    anime = Anime.from_dict(info)
+    assert isinstance(anime.episodes, EpisodeList) and anime.episodes.totalEpisodes == len(anime.episodes.episodes)
+    assert all(isinstance(episode, Episode) for episode in anime.episodes.episodes)
+    assert anime.to_dict() == info
+    assert loads(dumps(anime)) == loads(dumps(info))
+    assert Anime.from_dict(loads(dumps(anime))) == anime
+
+def test_details_without_episodes_leave_the_key_out():
+    info = parse_anime_info(fixture('details', 'horimiya-15733.html'), 'horimiya-15733')
+    anime = Anime.from_dict(info)
+    assert anime.episodes is None and anime.to_dict() == info
@@ -0,0 +1,36 @@
+import itertools, random
+from hianime.searchindex import SearchIndex, within
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1): current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+def test_within_agrees_with_full_levenshtein():
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abc') for _ in range(rng.randint(0, 7))) for _ in range(120)]
+    for a, b in itertools.product(words[:40], words):
+        distance = levenshtein(a, b)
+        for limit in (0, 1, 2, 3):
+            assert within(a, b, limit) == (distance if distance <= limit else None), (a, b, limit)
+
+def catalogue(count):
+    index = SearchIndex(page_size=2)
+    for n in range(count): index.add({'id': f'naruto-{n + 1}', 'title': f'Naruto {n}'})
+    return index
+
+def test_search_pages_clamp_to_the_first():
+    index = catalogue(5)
+    total_pages, first = index.search('naruto')
+    assert total_pages == 3 and len(first) == 2
+    assert index.search('naruto', 0) == (3, first) and index.search('naruto', -4) == (3, first)
+    assert index.search('naruto', 3)[1] and index.search('naruto', 4) == (3, [])
+
+def test_typos_and_prefixes_match():
+    index = catalogue(1)
+    index.add({'id': 'shingeki-no-kyojin-16498', 'title': 'Shingeki no Kyoujin'})
+    assert [item['id'] for item in index.search('shingeky')[1]] == ['shingeki-no-kyojin-16498']
+    assert [item['id'] for item in index.search('naru')[1]] == ['naruto-1']
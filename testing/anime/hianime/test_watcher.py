@@ -0,0 +1,38 @@
+import asyncio, os
+import httpx
+from hianime.watcher import EpisodeWatcher
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'episodes', 'horimiya-15733.html')
+
+with open(FIXTURE, encoding='utf-8') as f: EPISODES = f.read()
+
+def watcher(responses):
+    # each check gets the next response body; an int is sent as a bare status
+    responses = iter(responses)
+    def handler(request):
+        body = next(responses)
+        if isinstance(body, int): return httpx.Response(body)
+        return httpx.Response(200, json={'html': body})
+    watcher = EpisodeWatcher(':memory:', client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    watcher.follow('horimiya-15733')
+    return watcher
+
+def poll(watcher):
+    return asyncio.run(watcher.poll())
+
+def test_first_check_is_a_baseline_and_a_dropped_episode_is_reported():
+    changes = watcher([EPISODES, EPISODES.replace('data-number="13"', 'data-number="14"')])
+    assert poll(changes) == {}
+    changed = poll(changes)['horimiya-15733']
+    assert [kind for kind, _ in changed] == ['added', 'removed']
+    assert [entry['kind'] for entry in changes.changes()] == ['added', 'removed']
+
+def test_an_empty_or_broken_list_changes_nothing():
+    changes = watcher([EPISODES, '', '<div>Something went wrong</div>', 500, EPISODES])
+    assert poll(changes) == {}
+    for _ in range(3): assert poll(changes) == {}
+    assert changes.changes() == []
+    assert changes.stats['empty'] == 2 and changes.stats['failed'] == 1
+
+    # the snapshot survived, so the same list again is recognised by its hash
+    assert poll(changes) == {} and changes.stats['same_hash'] == 1
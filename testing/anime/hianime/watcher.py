@@ -0,0 +1,131 @@
+import asyncio, json, os, sqlite3, threading, time
+from .episodes import episode_list_request, parse_episodes_list
+from .index import INDEX_PATH, content_hash
+from .limiter import async_client
+
+# Polls the episode lists of followed shows. An unchanged list costs a 304 (when the server honours
+# If-None-Match / If-Modified-Since) or a hash comparison of the raw fragment; only a changed fragment is
+# parsed and diffed, and the differences land in a change feed the frontend reads with changes(since=...).
+POLL_INTERVAL = float(os.environ.get('HIANIME_WATCH_INTERVAL', 15 * 60))
+CONCURRENCY = 4
+
+def diff_episodes(old, new):
+    old_by_no = {episode['episode_no']: episode for episode in old}
+    changes = []
+    for episode in new:
+        previous = old_by_no.pop(episode['episode_no'], None)
+        if previous is None: changes.append(('added', episode))
+        elif previous['filler'] != episode['filler']: changes.append(('filler', episode))
+        elif previous['id'] != episode['id']: changes.append(('replaced', episode))
+    changes += [('removed', episode) for episode in old_by_no.values()]
+    return changes
+
+class EpisodeWatcher:
+    def __init__(self, path=INDEX_PATH, client=None, concurrency=CONCURRENCY):
+        if path != ':memory:': os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.client = client
+        self.slots = asyncio.Semaphore(concurrency)
+        self.stats = {'checks': 0, 'not_modified': 0, 'same_hash': 0, 'parsed': 0, 'empty': 0, 'changes': 0, 'failed': 0}
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS followed (id TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, hash TEXT, episodes TEXT, checked_at REAL)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS episode_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT, kind TEXT, episode_no INTEGER, episode_id TEXT, filler INTEGER, at REAL)')
+
+    def follow(self, *ids):
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR IGNORE INTO followed (id) VALUES (?)', [(id,) for id in ids])
+
+    def unfollow(self, *ids):
+        with self.lock, self.db:
+            self.db.executemany('DELETE FROM followed WHERE id = ?', [(id,) for id in ids])
+
+    def followed(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute('SELECT id FROM followed')]
+
+    def changes(self, since=0, limit=500):
+        # compact feed entries; pass the last seq you saw to get only what is newer
+        with self.lock:
+            rows = self.db.execute('SELECT seq, id, kind, episode_no, episode_id, filler, at FROM episode_changes WHERE seq > ? ORDER BY seq LIMIT ?', (since, limit)).fetchall()
+        return [{'seq': seq, 'id': id, 'kind': kind, 'episode_no': episode_no, 'episode_id': episode_id, 'filler': bool(filler), 'at': at}
+                for seq, id, kind, episode_no, episode_id, filler, at in rows]
+
+    def state(self, id):
+        with self.lock:
+            return self.db.execute('SELECT etag, last_modified, hash, episodes FROM followed WHERE id = ?', (id,)).fetchone() or (None, None, None, None)
+
+    async def check(self, id):
+        etag, last_modified, stored_hash, stored = self.state(id)
+        url, headers = episode_list_request(id)
+        if etag: headers['If-None-Match'] = etag
+        if last_modified: headers['If-Modified-Since'] = last_modified
+
+        async with self.slots:
+            response = await self.client.get(url, headers=headers)
+        self.stats['checks'] += 1
+        now = time.time()
+
+        if response.status_code == 304:
+            self.stats['not_modified'] += 1
+            return self.touch(id, now)
+        response.raise_for_status()
+
+        fragment = response.json().get('html') or ''
+        fragment_hash = content_hash(fragment)
+        validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        if fragment_hash == stored_hash:
+            self.stats['same_hash'] += 1
+            return self.touch(id, now, validators)
+
+        self.stats['parsed'] += 1
+        parsed = await asyncio.to_thread(parse_episodes_list, fragment)
+        episodes = parsed['episodes'] if parsed else []
+        # an empty list is an error page or a broken fragment, not a show that lost every episode: keep the
+        # last snapshot and its validators so the next check fetches and parses again
+        if not episodes:
+            self.stats['empty'] += 1
+            return self.touch(id, now)
+        # the first successful check only records a baseline; there is nothing to announce yet
+        changes = diff_episodes(json.loads(stored), episodes) if stored is not None else []
+
+        with self.lock, self.db:
+            self.db.execute('UPDATE followed SET etag=?, last_modified=?, hash=?, episodes=?, checked_at=? WHERE id=?',
+                            validators + (fragment_hash, json.dumps(episodes), now, id))
+            self.db.executemany('INSERT INTO episode_changes (id, kind, episode_no, episode_id, filler, at) VALUES (?, ?, ?, ?, ?, ?)',
+                                [(id, kind, episode['episode_no'], episode['id'], int(episode['filler']), now) for kind, episode in changes])
+        self.stats['changes'] += len(changes)
+        return changes
+
+    def touch(self, id, now, validators=None):
+        with self.lock, self.db:
+            if validators: self.db.execute('UPDATE followed SET etag=?, last_modified=?, checked_at=? WHERE id=?', validators + (now, id))
+            else: self.db.execute('UPDATE followed SET checked_at=? WHERE id=?', (now, id))
+        return []
+
+    async def poll(self):
+        # one pass over every followed show; returns {id: [(kind, episode), ...]} for the shows that changed
+        own_client = self.client is None
+        if own_client: self.client = async_client(timeout=20)
+        try:
+            ids = self.followed()
+            results = await asyncio.gather(*(self.check(id) for id in ids), return_exceptions=True)
+        finally:
+            if own_client:
+                await self.client.aclose()
+                self.client = None
+
+        changed = {}
+        for id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                print(f"Episode check for {id} failed: {result}")
+                self.stats['failed'] += 1
+            elif result: changed[id] = result
+        return changed
+
+    async def run(self, interval=POLL_INTERVAL, on_change=None):
+        while True:
+            started = time.monotonic()
+            changed = await self.poll()
+            if changed and on_change: on_change(changed)
+            await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
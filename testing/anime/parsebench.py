@@ -0,0 +1,208 @@
+import argparse, datetime, json, os, statistics, sys, time, tracemalloc
+import requests
+from hianime import parse_anime_info, parse_episodes_list, parse_mini_anime_info, parse_search_results, set_backend
+from hianime import parser
+from hianime.details import BASE_URL
+from hianime.episodes import episode_list_request
+from hianime.search import DEFAULT_HEADERS, SEARCH_URL
+
+# Offline parse benchmark over the fixture corpus in fixtures/. Every extractor runs against every page of
+# its kind; the output has to match the golden JSON in fixtures/golden, and the run reports time and Python
+# allocations per page. The pages listed in corpus.json start out synthetic (hand-built to mirror hianime's
+# markup, marked as such in corpus.json and in the files); --record swaps in live pages.
+#
+#   python parsebench.py                          # every installed backend, check + time
+#   python parsebench.py --backend lxml --repeat 200 --save lxml
+#   python parsebench.py --backend lxml --compare lxml
+#   python parsebench.py --record                 # re-record the live pages, then rewrite their golden files
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, 'fixtures')
+CORPUS = os.path.join(FIXTURES, 'corpus.json')
+GOLDEN = os.path.join(FIXTURES, 'golden')
+BASELINES = os.path.join(HERE, 'baselines')
+EXTRACTORS = {
+    # name -> (fixture kind, parse(html, entry) -> JSON-able output)
+    'details': ('details', lambda html, entry: parse_anime_info(html, entry['id'])),
+    'mini_details': ('details', lambda html, entry: parse_mini_anime_info(html, entry['id'])),
+    'search': ('search', lambda html, entry: dict(zip(('total_pages', 'results'), parse_search_results(html)))),
+    'episodes': ('episodes', lambda html, entry: parse_episodes_list(html)),
+}
+# a row is flagged when its median is this much slower than the baseline
+TOLERANCE = 0.15
+
+def load_corpus():
+    with open(CORPUS) as f: return json.load(f)
+
+def page_path(entry):
+    return os.path.join(FIXTURES, entry['kind'], f"{entry['name']}.html")
+
+def golden_path(extractor, entry):
+    return os.path.join(GOLDEN, extractor, f"{entry['name']}.json")
+
+def read_page(entry):
+    with open(page_path(entry), encoding='utf-8') as f: return f.read()
+
+def first_difference(expected, actual, path='$'):
+    # -> a readable pointer to the first place the two JSON values disagree, or None
+    if type(expected) is not type(actual): return f"{path}: expected {type(expected).__name__}, got {type(actual).__name__}"
+    if isinstance(expected, dict):
+        for key in expected.keys() | actual.keys():
+            if key not in actual: return f"{path}.{key}: missing"
+            if key not in expected: return f"{path}.{key}: unexpected"
+            difference = first_difference(expected[key], actual[key], f"{path}.{key}")
+            if difference: return difference
+        return None
+    if isinstance(expected, list):
+        if len(expected) != len(actual): return f"{path}: expected {len(expected)} items, got {len(actual)}"
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            difference = first_difference(left, right, f"{path}[{index}]")
+            if difference: return difference
+        return None
+    return None if expected == actual else f"{path}: expected {expected!r}, got {actual!r}"
+
+def write_golden(extractor, entry, output):
+    path = golden_path(extractor, entry)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+def check(extractor, entry, output):
+    try:
+        with open(golden_path(extractor, entry), encoding='utf-8') as f: expected = json.load(f)
+    except FileNotFoundError: return "no golden file (run with --update-golden)"
+    # round-trip so tuples and the like compare the way they were stored
+    return first_difference(expected, json.loads(json.dumps(output)))
+
+def measure(parse, html, entry, repeat):
+    parse(html, entry)  # warm-up: selector compilation and imports are paid once per process, not per page
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(html, entry)
+        timings.append(time.perf_counter() - started)
+
+    # tracemalloc only sees the Python allocator: selectolax builds lexbor's tree through it, lxml's libxml2 tree is not counted
+    tracemalloc.start()
+    try:
+        output = parse(html, entry)
+        retained, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    finally:
+        tracemalloc.stop()
+    return output, {
+        'median_ms': round(statistics.median(timings) * 1000, 3), 'min_ms': round(min(timings) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1), 'retained_kib': round(retained / 1024, 1), 'retained_blocks': blocks,
+    }
+
+def run(backends, extractors, repeat, update_golden=False):
+    corpus = load_corpus()
+    rows, failures = [], []
+    for backend in backends:
+        set_backend(backend)
+        for extractor in extractors:
+            kind, parse = EXTRACTORS[extractor]
+            for entry in (entry for entry in corpus if entry['kind'] == kind):
+                html = read_page(entry)
+                output, row = measure(parse, html, entry, repeat)
+                if update_golden and backend == backends[0]: write_golden(extractor, entry, output)
+                difference = check(extractor, entry, output)
+                if difference: failures.append((backend, extractor, entry['name'], difference))
+                rows.append(dict(row, backend=backend, extractor=extractor, fixture=entry['name'], kib=round(len(html.encode('utf-8')) / 1024, 1), ok=difference is None))
+    return rows, failures
+
+def fetch_live(entry):
+    if entry['kind'] == 'details':
+        response = requests.get(f"{BASE_URL}/{entry['id']}", headers=DEFAULT_HEADERS)
+    elif entry['kind'] == 'search':
+        response = requests.get(SEARCH_URL, params={"keyword": entry['term'], "page": entry['page']}, headers=DEFAULT_HEADERS)
+    else:
+        url, headers = episode_list_request(entry['id'])
+        response = requests.get(url, headers=headers)
+        response.raise_for_status()
+        return response.json().get('html') or ''
+    response.raise_for_status()
+    return response.text
+
+def record(names):
+    # replaces the chosen pages (default: every entry that exists on the live site) and marks them as recorded
+    corpus = load_corpus()
+    recorded = []
+    for entry in corpus:
+        if names and entry['name'] not in names: continue
+        if not names and entry.get('live') is False: continue
+        try: html = fetch_live(entry)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Could not record {entry['kind']}/{entry['name']}: {e}")
+            continue
+        with open(page_path(entry), 'w', encoding='utf-8') as f: f.write(html)
+        entry['source'] = f"recorded {datetime.date.today().isoformat()}"
+        recorded.append(entry)
+        print(f"Recorded {entry['kind']}/{entry['name']} ({len(html) // 1024} KiB)")
+
+    with open(CORPUS, 'w') as f:
+        f.write('[\n' + ',\n'.join(f'  {json.dumps(entry, ensure_ascii=False)}' for entry in corpus) + '\n]\n')
+
+    # a new page means new expected output: rewrite its golden files from the current parsers and review the diff
+    for entry in recorded:
+        for extractor, (kind, parse) in EXTRACTORS.items():
+            if kind == entry['kind']: write_golden(extractor, entry, parse(read_page(entry), entry))
+    return recorded
+
+def compare(rows, baseline):
+    # -> [(key, baseline ms, current ms, change, regressed)]
+    previous = {(row['backend'], row['extractor'], row['fixture']): row['median_ms'] for row in baseline['rows']}
+    result = []
+    for row in rows:
+        key = (row['backend'], row['extractor'], row['fixture'])
+        if not previous.get(key): continue
+        change = (row['median_ms'] - previous[key]) / previous[key]
+        result.append((key, previous[key], row['median_ms'], change, change > TOLERANCE))
+    return result
+
+def print_rows(rows):
+    print(f"{'backend':<12} {'extractor':<13} {'fixture':<18} {'KiB':>6} {'median ms':>10} {'min ms':>8} {'peak KiB':>9} {'blocks':>7}  golden")
+    for row in rows:
+        print(f"{row['backend']:<12} {row['extractor']:<13} {row['fixture']:<18} {row['kib']:>6} {row['median_ms']:>10} {row['min_ms']:>8} "
+              f"{row['peak_kib']:>9} {row['retained_blocks']:>7}  {'ok' if row['ok'] else 'MISMATCH'}")
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Check and time the hianime parsers against the recorded fixture corpus")
+    arg_parser.add_argument('--backend', default='all', help="parser backend to use, or 'all' for every installed one")
+    arg_parser.add_argument('--extractor', action='append', choices=sorted(EXTRACTORS), help="limit to these extractors (repeatable)")
+    arg_parser.add_argument('--repeat', type=int, default=50, help="timed parses per page")
+    arg_parser.add_argument('--update-golden', action='store_true', help="rewrite the golden files from the first backend's output")
+    arg_parser.add_argument('--record', nargs='*', metavar='NAME', help="fetch live pages into the corpus (all live entries when no names are given)")
+    arg_parser.add_argument('--json', action='store_true', help="print the rows as JSON instead of a table")
+    arg_parser.add_argument('--save', metavar='NAME', help="store the run as baselines/NAME.json")
+    arg_parser.add_argument('--compare', metavar='NAME', help="diff medians against baselines/NAME.json; exits 1 on a regression")
+    args = arg_parser.parse_args(argv)
+
+    if args.record is not None:
+        recorded = record(args.record)
+        print(f"Recorded {len(recorded)} page(s); review the golden diff before committing")
+        return 0
+
+    backends = [name for name in parser.PREFERENCE if parser.available(name)] if args.backend == 'all' else [args.backend]
+    rows, failures = run(backends, args.extractor or list(EXTRACTORS), args.repeat, args.update_golden)
+    if args.json: print(json.dumps(rows, indent=2))
+    else: print_rows(rows)
+
+    for backend, extractor, fixture, difference in failures:
+        print(f"Golden mismatch: {backend} {extractor} {fixture}: {difference}")
+
+    if args.save:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(os.path.join(BASELINES, f'{args.save}.json'), 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'rows': rows}, f, indent=2)
+
+    regressed = False
+    if args.compare:
+        with open(os.path.join(BASELINES, f'{args.compare}.json')) as f: diffs = compare(rows, json.load(f))
+        for (backend, extractor, fixture), old, new, change, slower in diffs:
+            print(f"{backend:<12} {extractor:<13} {fixture:<18} {old:>9} -> {new:<9} {change:+.1%}{'  REGRESSION' if slower else ''}")
+        regressed = any(diff[-1] for diff in diffs)
+    return 1 if failures or regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
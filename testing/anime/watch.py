@@ -0,0 +1,15 @@
+import asyncio, json
+from hianime import EpisodeWatcher
+
+if __name__ == '__main__':
+    watcher = EpisodeWatcher()
+    watcher.follow("horimiya-15733", "one-piece-100")
+    last_seq = 0
+
+    def announce(changed):
+        global last_seq
+        for change in watcher.changes(since=last_seq):
+            print(json.dumps(change))
+            last_seq = change['seq']
+
+    asyncio.run(watcher.run(on_change=announce))
@@ -0,0 +1,5 @@
+# Headless source extractors. Every lookup borrows a page from the shared BrowserPool in browser.py
+# instead of launching its own Chromium; resolved sources are cached per episode in streamcache.py.
+from .browser import BrowserPool, get_pool
+from .streamcache import StreamCache, get_stream_cache
+from .race import ProviderStats, race
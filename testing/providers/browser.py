@@ -0,0 +1,171 @@
+import asyncio, itertools, os, weakref
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+
+# Long-lived Chromium processes shared by every extractor. Contexts are cut from per-provider
+# templates, reused for a number of lookups, then thrown away so cookies/storage don't pile up.
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
+TEMPLATES = {
+    'default': {},
+    'vidfast': {'user_agent': USER_AGENT},
+    'vidlink': {'user_agent': USER_AGENT, 'cookies': [{"name": "_ym_d", "value": "1742860933", "domain": ".vidlink.pro", "path": "/"}]},
+    # the .redirect button has to be clickable, so keep its stylesheet
+    'onionflixer': {'block_types': {'image', 'font', 'media'}},
+    'vidsrccc': {},
+}
+
+# nothing an extractor waits for is ever an image, font or video body; the APIs are xhr/fetch
+BLOCK_TYPES = {'image', 'font', 'media', 'stylesheet'}
+BLOCK_HOSTS = (
+    'doubleclick.net', 'googlesyndication.com', 'googletagmanager.com', 'google-analytics.com', 'googleadservices.com',
+    'mc.yandex.ru', 'yandex.ru', 'histats.com', 'disqus.com', 'cloudflareinsights.com', 'facebook.net',
+    'popads.net', 'popcash.net', 'propellerads.com', 'adsterra.com', 'exoclick.com', 'juicyads.com', 'hotjar.com',
+)
+DEADLINE = float(os.environ.get('PROVIDERS_DEADLINE', 15))
+
+def blocked_host(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return any(host == blocked or host.endswith('.' + blocked) for blocked in BLOCK_HOSTS)
+
+BROWSERS = int(os.environ.get('PROVIDERS_BROWSERS', 2))
+MAX_PAGES = int(os.environ.get('PROVIDERS_MAX_PAGES', 8))
+CONTEXT_USES = int(os.environ.get('PROVIDERS_CONTEXT_USES', 25))
+HEADLESS = os.environ.get('PROVIDERS_HEADLESS', '1') != '0'
+
+class PooledContext:
+    def __init__(self, browser, context):
+        self.browser = browser
+        self.context = context
+        self.uses = 0
+
+class BrowserPool:
+    def __init__(self, browsers=BROWSERS, max_pages=MAX_PAGES, context_uses=CONTEXT_USES, headless=HEADLESS, templates=None):
+        self.size = browsers
+        self.context_uses = context_uses
+        self.headless = headless
+        self.templates = dict(TEMPLATES, **(templates or {}))
+        self.pages = asyncio.Semaphore(max_pages)
+        self.playwright = None
+        self.browsers = []
+        self.next_browser = None
+        self.idle = {}
+        self.lock = asyncio.Lock()
+        self.closer = None
+        self.stats = {'launches': 0, 'contexts': 0, 'reused': 0, 'recycled': 0, 'pages': 0, 'blocked': 0}
+
+    async def start(self, warm=()):
+        async with self.lock:
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+                self.browsers = [await self.launch() for _ in range(self.size)]
+                self.next_browser = itertools.cycle(range(self.size))
+
+        # optionally pre-build one context per provider so the first lookup doesn't pay for it either
+        for provider in warm: await self.release(provider, await self.acquire(provider))
+        return self
+
+    async def launch(self):
+        self.stats['launches'] += 1
+        return await self.playwright.chromium.launch(headless=self.headless)
+
+    async def browser(self):
+        index = next(self.next_browser)
+        if not self.browsers[index].is_connected(): self.browsers[index] = await self.launch()
+        return self.browsers[index]
+
+    async def acquire(self, provider):
+        idle = self.idle.setdefault(provider, [])
+        while idle:
+            pooled = idle.pop()
+            if pooled.browser.is_connected():
+                self.stats['reused'] += 1
+                return pooled
+
+        template = self.templates.get(provider, {})
+        browser = await self.browser()
+        context = await browser.new_context(**({'user_agent': template['user_agent']} if 'user_agent' in template else {}))
+        if template.get('cookies'): await context.add_cookies(template['cookies'])
+
+        block_types = template.get('block_types', BLOCK_TYPES)
+        async def filter_request(route):
+            request = route.request
+            if request.resource_type in block_types or blocked_host(request.url):
+                self.stats['blocked'] += 1
+                await route.abort()
+            else: await route.continue_()
+
+        await context.route('**/*', filter_request)
+        self.stats['contexts'] += 1
+        return PooledContext(browser, context)
+
+    async def release(self, provider, pooled):
+        pooled.uses += 1
+        if pooled.uses >= self.context_uses or not pooled.browser.is_connected():
+            self.stats['recycled'] += 1
+            try: await pooled.context.close()
+            except Exception: pass
+            return
+        self.idle.setdefault(provider, []).append(pooled)
+
+    @asynccontextmanager
+    async def page(self, provider='default'):
+        if self.playwright is None: await self.start()
+
+        async with self.pages:
+            pooled = await self.acquire(provider)
+            page = await pooled.context.new_page()
+            self.stats['pages'] += 1
+            try: yield page
+            finally:
+                try: await page.close()
+                except Exception: pass
+                await self.release(provider, pooled)
+
+    async def close(self, shutdown=False):
+        # on loop shutdown playwright's reader task is already cancelled, so nothing would answer the per-browser
+        # calls; stopping playwright closes the driver's pipe and the driver takes its browsers down with it
+        if not shutdown:
+            for contexts in self.idle.values():
+                for pooled in contexts:
+                    try: await pooled.context.close()
+                    except Exception: pass
+            for browser in self.browsers:
+                try: await browser.close()
+                except Exception: pass
+        self.idle.clear()
+        self.browsers = []
+
+        if self.playwright: await self.playwright.stop()
+        self.playwright = None
+
+async def capture_response(page, predicate, action, deadline=DEADLINE):
+    # resolves on the first matching response rather than waiting for networkidle;
+    # None once the deadline passes, and the caller's page block tears the page down either way
+    async def run():
+        async with page.expect_response(predicate, timeout=0) as info:
+            await action()
+        return await info.value
+
+    try: return await asyncio.wait_for(run(), deadline)
+    except (asyncio.TimeoutError, PlaywrightTimeoutError): return None
+
+# weak so a loop that was closed some other way doesn't stay alive for its pool's sake
+pools = weakref.WeakKeyDictionary()
+
+async def close_on_shutdown(loop, pool):
+    # asyncio.run() cancels every task still pending before it closes the loop; this one takes the pool with it
+    try: await asyncio.Event().wait()
+    finally:
+        if pools.get(loop) is pool: del pools[loop]
+        pool.closer = None
+        await pool.close(shutdown=True)
+
+def get_pool():
+    # one pool per event loop; playwright objects can't cross loops
+    loop = asyncio.get_running_loop()
+    pool = pools.get(loop)
+    if pool is None:
+        pool = pools[loop] = BrowserPool()
+        pool.closer = loop.create_task(close_on_shutdown(loop, pool))
+    return pool
@@ -0,0 +1,16 @@
+from .browser import DEADLINE, capture_response, get_pool
+
+async def get_m3u8(imdb_id, pool=None, deadline=DEADLINE):
+    async with (pool or get_pool()).page('onionflixer') as page:
+        async def open_player():
+            await page.goto(f"https://onflix.ovh/{imdb_id}", wait_until='domcontentloaded')
+            await page.set_content(f'<iframe src="https://onflix.ovh/{imdb_id}" style="width: 100%; height: 100vh"></iframe>')
+
+            frame = await page.query_selector('iframe')
+            if frame:
+                frame_context = await frame.content_frame()
+                if frame_context: await frame_context.click('.redirect')
+
+        is_playlist = lambda response: "video.m3u8?token=" in response.url
+        response = await capture_response(page, is_playlist, open_player, deadline)
+        return response.url if response else None
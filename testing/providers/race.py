@@ -0,0 +1,159 @@
+import asyncio, json, os, re, time
+import httpx
+from . import onionflixer, vidfast, vidlink, vidsrcco, vidsrcsu
+from .streamcache import get_stream_cache
+
+# Every provider is raced for a title and the first playlist that actually plays wins. Launches are
+# staggered by each provider's own track record: a reliable, fast provider gets a head start worth
+# its usual latency before the next one is hedged in, a flaky one gets none. Any failure launches the next immediately.
+DEADLINE = float(os.environ.get('PROVIDERS_RACE_DEADLINE', 25))
+HEDGE_FACTOR = 1.5
+MIN_SAMPLES = 3
+DECAY = 0.2
+PLAYLIST_URL = re.compile(r'https?://[^\s"\'<>\\]+\.m3u8[^\s"\'<>\\]*')
+PLAYBACK_HEADERS = {
+    'vidsrcsu': {'Referer': 'https://vidsrc.su/'},
+    'vidsrcco': {'Referer': 'https://player.vidsrc.co/'},
+    'vidfast': {'Referer': 'https://vidfast.pro/'},
+    'vidlink': {'Referer': 'https://vidlink.pro/'},
+    'onionflixer': {'Referer': 'https://onionflixer.com/'},
+}
+
+def playlists_in(payload):
+    text = payload if isinstance(payload, str) else json.dumps(payload)
+    return list(dict.fromkeys(PLAYLIST_URL.findall(text.replace('\\/', '/'))))
+
+async def from_vidsrcsu(title):
+    return await vidsrcsu.get_servers(title['type'], title['id'], title['season'], title['episode'])
+
+async def from_vidsrcco(title):
+    return await vidsrcco.get_server(title['type'], title['id'], title['season'], title['episode'])
+
+async def from_vidfast(title):
+    sources, starter = await vidfast.get_data(title['type'], title['id'], title['season'], title['episode'])
+    if not sources: return None
+    return await asyncio.gather(*(vidfast.get_source(sources, source['name'], starter) for source in sources[:3]))
+
+async def from_vidlink(title):
+    return await vidlink.get_data(title['type'], title['id'], title['season'], title['episode'])
+
+async def from_onionflixer(title):
+    return await onionflixer.get_m3u8(title['imdb_id']) if title.get('imdb_id') else None
+
+PROVIDERS = {
+    'vidsrcsu': from_vidsrcsu,
+    'vidsrcco': from_vidsrcco,
+    'vidfast': from_vidfast,
+    'vidlink': from_vidlink,
+    'onionflixer': from_onionflixer,
+}
+
+class ProviderStats:
+    # exponentially decayed success rate and latency of successful lookups, per provider
+    def __init__(self, decay=DECAY):
+        self.decay = decay
+        self.providers = {}
+
+    def entry(self, name):
+        return self.providers.setdefault(name, {'attempts': 0, 'wins': 0, 'success': 0.5, 'latency': None})
+
+    def record(self, name, ok, latency):
+        entry = self.entry(name)
+        entry['attempts'] += 1
+        entry['success'] += self.decay * ((1.0 if ok else 0.0) - entry['success'])
+        if ok: entry['latency'] = latency if entry['latency'] is None else entry['latency'] + self.decay * (latency - entry['latency'])
+
+    def score(self, name):
+        # expected seconds per playable source; unknown providers sit in the middle of the pack
+        entry = self.entry(name)
+        if entry['latency'] is None: return 5.0 / max(entry['success'], 0.05)
+        return entry['latency'] / max(entry['success'], 0.05)
+
+    def order(self, names):
+        return sorted(names, key=self.score)
+
+    def hedge_delay(self, name):
+        entry = self.entry(name)
+        if entry['attempts'] < MIN_SAMPLES or entry['latency'] is None: return 0.0
+        return entry['latency'] * entry['success'] * HEDGE_FACTOR
+
+    def snapshot(self):
+        return {name: dict(entry) for name, entry in self.providers.items()}
+
+shared_stats = ProviderStats()
+
+async def playable(client, url, headers):
+    # a playlist counts once it has segments; a master playlist is followed to its first variant
+    response = await client.get(url, headers=headers)
+    if response.status_code != 200 or not response.text.lstrip().startswith('#EXTM3U'): return False
+    if '#EXTINF' in response.text: return True
+
+    lines = response.text.splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith('#EXT-X-STREAM-INF'):
+            variant = next((item.strip() for item in lines[index + 1:] if item.strip() and not item.startswith('#')), None)
+            return bool(variant) and await playable(client, str(response.url.join(variant)), headers)
+    return False
+
+async def attempt(name, title, client, stats):
+    started = time.monotonic()
+    cache = get_stream_cache()
+    key = (name, title['type'], title['id'], title['season'], title['episode'])
+    try:
+        payload = await cache.resolve(*key, lambda: PROVIDERS[name](title))
+        headers = PLAYBACK_HEADERS.get(name, {})
+        for url in playlists_in(payload) if payload is not None else []:
+            if await playable(client, url, headers):
+                latency = time.monotonic() - started
+                stats.record(name, True, latency)
+                return {'provider': name, 'url': url, 'headers': headers, 'latency': latency}
+
+        cache.invalidate(*key)
+    except asyncio.CancelledError: raise
+    except Exception as e: print(f"Provider {name} failed: {e}")
+    stats.record(name, False, time.monotonic() - started)
+    return None
+
+async def race(type, id, season=1, episode=1, imdb_id=None, providers=None, collect=False, deadline=DEADLINE, stats=shared_stats):
+    # first playable source wins and the rest are cancelled; collect=True keeps going until the deadline
+    # and returns every playable source, fastest first
+    title = {'type': type, 'id': id, 'season': season, 'episode': episode, 'imdb_id': imdb_id}
+    queue = stats.order(providers or list(PROVIDERS))
+    loop = asyncio.get_running_loop()
+    ends = loop.time() + deadline
+    next_launch = loop.time()
+    running = {}
+    results = []
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=10) as client:
+        try:
+            while (queue or running) and loop.time() < ends:
+                if queue and loop.time() >= next_launch:
+                    name = queue.pop(0)
+                    running[asyncio.ensure_future(attempt(name, title, client, stats))] = name
+                    next_launch = loop.time() + stats.hedge_delay(name)
+                    continue
+
+                wake = min(ends, next_launch) if queue else ends
+                if not running:
+                    next_launch = loop.time()
+                    continue
+
+                done, _ = await asyncio.wait(running, timeout=max(wake - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    # only this race cancels its own attempts (in the finally below); one cancelled from
+                    # anywhere else simply lost, the way a provider that found nothing did
+                    result = None if task.cancelled() else task.result()
+                    if result is None:
+                        next_launch = loop.time()
+                        continue
+
+                    stats.entry(name)['wins'] += 1
+                    results.append(result)
+                    if not collect: return result
+        finally:
+            for task in running: task.cancel()
+            if running: await asyncio.gather(*running, return_exceptions=True)
+
+    return sorted(results, key=lambda result: result['latency']) if collect else None
@@ -0,0 +1,174 @@
+import asyncio, base64, json, os, re, sqlite3, threading, time
+from urllib.parse import parse_qs, urlsplit
+
+# Resolved sources keyed by (provider, type, id, season, episode), so one browser run serves every viewer
+# for as long as the token lives. The proxy records 403/410 playlist URLs in the same file
+# (PROXY_STREAM_CACHE, see proxy/revocations.py) and any entry holding such a URL stops being served.
+# The proxy only sees the URL that failed, usually a variant playlist or a segment, so a revoked URL also
+# counts against every cached URL whose directory it sits under (hls/abc/720/seg1.ts under hls/abc/master.m3u8).
+CACHE_PATH = os.environ.get('PROVIDERS_STREAM_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'quickwatch', 'streams.sqlite'))
+DEFAULT_TTLS = {'vidfast': 20 * 60, 'vidlink': 30 * 60, 'onionflixer': 60 * 60, 'vidsrccc': 30 * 60}
+DEFAULT_TTL = 15 * 60
+EXPIRY_MARGIN = 60
+EXPIRY_PARAMS = ('expires', 'expire', 'expiry', 'exp', 'e', 'validto', 'valid_until', 'deadline')
+TOKEN_PARAMS = ('token', 'auth', 'jwt', 't')
+URL = re.compile(r'https?://[^\s"\'<>\\]+')
+
+def epoch(value):
+    try: value = float(value)
+    except (TypeError, ValueError): return None
+    if value > 1e12: value /= 1000  # milliseconds
+    return value if value > 1e9 else None
+
+def jwt_expiry(token):
+    parts = token.split('.')
+    if len(parts) != 3: return None
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+        return epoch(claims.get('exp')) if isinstance(claims, dict) else None
+    except (ValueError, UnicodeDecodeError): return None
+
+def token_expiry(url):
+    # unix timestamps in the usual query names, or the exp claim of a JWT-shaped token
+    query = parse_qs(urlsplit(url).query)
+    for name in EXPIRY_PARAMS:
+        for value in query.get(name, []):
+            expiry = epoch(value)
+            if expiry: return expiry
+    for name in TOKEN_PARAMS:
+        for value in query.get(name, []):
+            expiry = jwt_expiry(value)
+            if expiry: return expiry
+    return None
+
+def urls_in(payload):
+    # providers hand back URLs, structures holding them, or raw response text (vidfast's source bodies)
+    if isinstance(payload, str):
+        if payload.lstrip()[:1] in ('{', '['):
+            try: return urls_in(json.loads(payload))
+            except ValueError: pass
+        return list(dict.fromkeys(url.rstrip('.,;)') for url in URL.findall(payload.replace('\\/', '/'))))
+    if isinstance(payload, dict): payload = list(payload.values())
+    if isinstance(payload, (list, tuple)): return [url for item in payload for url in urls_in(item)]
+    return []
+
+def url_prefix(url):
+    # the directory a master playlist's variants and segments usually live under; None for URLs at the root,
+    # where a prefix would cover the whole host
+    parts = urlsplit(url)
+    directory = parts.path.rpartition('/')[0]
+    return f'{parts.scheme}://{parts.netloc}{directory}/' if directory else None
+
+def resolved(payload):
+    # extractors report "nothing captured" as None or as a tuple of Nones (vidfast); neither is worth caching
+    if isinstance(payload, (list, tuple)): return any(item is not None for item in payload)
+    return payload is not None
+
+def ttl_for(provider, payload, now=None):
+    now = now or time.time()
+    ttl = DEFAULT_TTLS.get(provider, DEFAULT_TTL)
+    expiries = [expiry for expiry in map(token_expiry, urls_in(payload)) if expiry]
+    if expiries: ttl = min(expiries) - now - EXPIRY_MARGIN
+    return ttl
+
+class StreamCache:
+    def __init__(self, path=CACHE_PATH):
+        if path != ':memory:': os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.lock = threading.Lock()
+        self.resolving = {}
+        self.stats = {'hits': 0, 'misses': 0, 'revoked': 0, 'stores': 0}
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS streams (provider TEXT, type TEXT, id TEXT, season INTEGER, episode INTEGER, payload TEXT, stored_at REAL, expires_at REAL, PRIMARY KEY (provider, type, id, season, episode))')
+            self.db.execute('CREATE TABLE IF NOT EXISTS stream_urls (url TEXT, provider TEXT, type TEXT, id TEXT, season INTEGER, episode INTEGER, prefix TEXT)')
+            # caches written before prefixes were kept match exactly until their entries are replaced
+            if 'prefix' not in [row[1] for row in self.db.execute('PRAGMA table_info(stream_urls)')]:
+                self.db.execute('ALTER TABLE stream_urls ADD COLUMN prefix TEXT')
+            self.db.execute('CREATE INDEX IF NOT EXISTS stream_urls_key ON stream_urls (provider, type, id, season, episode)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS revoked (url TEXT PRIMARY KEY, status INTEGER, revoked_at REAL)')
+
+    @staticmethod
+    def key(provider, type, id, season=None, episode=None):
+        # movies have no season/episode; store them as 0 so the primary key stays comparable
+        return (provider, type, str(id), int(season or 0) if type != 'movie' else 0, int(episode or 0) if type != 'movie' else 0)
+
+    def get(self, provider, type, id, season=None, episode=None):
+        key = self.key(provider, type, id, season, episode)
+        with self.lock:
+            row = self.db.execute('SELECT payload, stored_at FROM streams WHERE provider=? AND type=? AND id=? AND season=? AND episode=? AND expires_at > ?', key + (time.time(),)).fetchone()
+            revoked = row and self.db.execute(
+                'SELECT 1 FROM stream_urls u JOIN revoked r ON r.url = u.url OR substr(r.url, 1, length(u.prefix)) = u.prefix '
+                'WHERE u.provider=? AND u.type=? AND u.id=? AND u.season=? AND u.episode=? AND r.revoked_at >= ? LIMIT 1',
+                key + (row[1],)).fetchone()
+
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        if revoked:
+            self.stats['revoked'] += 1
+            self.invalidate(*key)
+            return None
+        self.stats['hits'] += 1
+        return json.loads(row[0])
+
+    def put(self, provider, type, id, season, episode, payload, ttl=None):
+        key = self.key(provider, type, id, season, episode)
+        now = time.time()
+        ttl = ttl_for(provider, payload, now) if ttl is None else ttl
+        if ttl <= 0: return False
+
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO streams VALUES (?, ?, ?, ?, ?, ?, ?, ?)', key + (json.dumps(payload), now, now + ttl))
+            self.db.execute('DELETE FROM stream_urls WHERE provider=? AND type=? AND id=? AND season=? AND episode=?', key)
+            self.db.executemany('INSERT INTO stream_urls VALUES (?, ?, ?, ?, ?, ?, ?)', [(url,) + key + (url_prefix(url),) for url in set(urls_in(payload))])
+        self.stats['stores'] += 1
+        return True
+
+    def invalidate(self, provider, type, id, season=None, episode=None):
+        key = self.key(provider, type, id, season, episode)
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM streams WHERE provider=? AND type=? AND id=? AND season=? AND episode=?', key)
+            self.db.execute('DELETE FROM stream_urls WHERE provider=? AND type=? AND id=? AND season=? AND episode=?', key)
+
+    def revoke(self, url, status=403):
+        # same record the proxy writes; for callers that find out about a dead URL themselves
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO revoked VALUES (?, ?, ?)', (url, status, time.time()))
+
+    def purge(self):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM streams WHERE expires_at <= ?', (now,))
+            self.db.execute('DELETE FROM stream_urls WHERE NOT EXISTS (SELECT 1 FROM streams s WHERE s.provider = stream_urls.provider AND s.type = stream_urls.type AND s.id = stream_urls.id AND s.season = stream_urls.season AND s.episode = stream_urls.episode)')
+            self.db.execute('DELETE FROM revoked WHERE revoked_at <= ?', (now - 24 * 60 * 60,))
+
+    async def resolve(self, provider, type, id, season, episode, fetch):
+        # fetch() is only awaited on a miss, and concurrent misses for one key share a single browser run
+        key = self.key(provider, type, id, season, episode)
+        cached = self.get(*key)
+        if cached is not None: return cached
+
+        task = self.resolving.get(key)
+        if task is None:
+            task = self.resolving[key] = asyncio.ensure_future(self.fetch_and_store(key, fetch))
+            task.add_done_callback(lambda done: self.finished(key, done))
+        # shielded for the caller that started it too: one caller giving up (a race cancelling its losing
+        # provider) must not cancel the lookup under everyone else waiting on it
+        return await asyncio.shield(task)
+
+    async def fetch_and_store(self, key, fetch):
+        # stores the result even when every caller has stopped waiting for it
+        payload = await fetch()
+        if resolved(payload): self.put(*key, payload)
+        return payload
+
+    def finished(self, key, task):
+        self.resolving.pop(key, None)
+        # nobody may be waiting any more; reading the exception keeps asyncio from reporting it as lost
+        if not task.cancelled(): task.exception()
+
+stream_caches = {}
+
+def get_stream_cache(path=CACHE_PATH):
+    if path not in stream_caches: stream_caches[path] = StreamCache(path)
+    return stream_caches[path]
@@ -0,0 +1,162 @@
+import asyncio, gc
+from . import browser as browser_module
+from .browser import BrowserPool, get_pool, pools
+
+class FakePlaywright:
+    # stands in for a started playwright; stop() is what takes the driver and its browsers down
+    def __init__(self, stopped):
+        self.stopped = stopped
+
+    async def stop(self):
+        self.stopped.append(self)
+
+def test_pool_is_closed_when_its_loop_ends():
+    stopped = []
+
+    async def borrow():
+        pool = get_pool()
+        assert get_pool() is pool
+        pool.playwright = FakePlaywright(stopped)
+        return pool
+
+    first = asyncio.run(borrow())
+    assert first.playwright is None and len(stopped) == 1
+
+    second = asyncio.run(borrow())
+    assert second is not first
+    assert second.playwright is None and len(stopped) == 2
+
+    gc.collect()
+    assert len(pools) == 0
+
+def test_explicit_close_then_shutdown():
+    stopped = []
+
+    async def borrow():
+        pool = get_pool()
+        pool.playwright = FakePlaywright(stopped)
+        await pool.close()
+        return pool
+
+    pool = asyncio.run(borrow())
+    assert pool.playwright is None and len(stopped) == 1
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+class FakeContext:
+    def __init__(self, browser, options):
+        self.browser = browser
+        self.options = options
+        self.cookies = []
+        self.handler = None
+        self.closed = False
+
+    async def add_cookies(self, cookies):
+        self.cookies += cookies
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        self.contexts.append(FakeContext(self, options))
+        return self.contexts[-1]
+
+    async def close(self):
+        self.connected = False
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = []
+
+    async def launch(self, headless):
+        self.launched.append(FakeBrowser())
+        return self.launched[-1]
+
+class FakeDriver(FakePlaywright):
+    def __init__(self, stopped):
+        super().__init__(stopped)
+        self.chromium = FakeChromium()
+
+    async def start(self):
+        return self
+
+def fake_playwright(monkeypatch):
+    stopped = []
+    driver = FakeDriver(stopped)
+    monkeypatch.setattr(browser_module, 'async_playwright', lambda: driver)
+    return driver
+
+def test_contexts_are_reused_then_recycled(monkeypatch):
+    driver = fake_playwright(monkeypatch)
+
+    async def main():
+        pool = BrowserPool(browsers=2, context_uses=3)
+        contexts = []
+        for _ in range(4):
+            async with pool.page('vidlink') as page: contexts.append(page.context)
+        await pool.close()
+        return pool, contexts
+
+    pool, contexts = asyncio.run(main())
+    # three lookups share a context, the fourth gets a fresh one after the first was closed
+    assert contexts[0] is contexts[1] is contexts[2] and contexts[3] is not contexts[0]
+    assert contexts[0].closed and contexts[3].closed
+    assert contexts[0].options == {'user_agent': browser_module.USER_AGENT} and contexts[0].cookies[0]['domain'] == '.vidlink.pro'
+    assert pool.stats['contexts'] == 2 and pool.stats['reused'] == 2 and pool.stats['recycled'] == 1
+    assert len(driver.chromium.launched) == 2 and len(driver.stopped) == 1
+
+def test_crashed_browser_is_relaunched(monkeypatch):
+    driver = fake_playwright(monkeypatch)
+
+    async def main():
+        pool = BrowserPool(browsers=1)
+        async with pool.page() as page: first = page.context
+        first.browser.connected = False
+        async with pool.page() as page: second = page.context
+        await pool.close()
+        return first, second, pool
+
+    first, second, pool = asyncio.run(main())
+    # the idle context died with its browser, so it is neither handed out nor kept
+    assert second is not first and second.browser is not first.browser
+    assert pool.stats['launches'] == 2 and pool.stats['reused'] == 0
+
+def test_pages_are_capped(monkeypatch):
+    fake_playwright(monkeypatch)
+
+    async def main():
+        pool = BrowserPool(browsers=1, max_pages=2)
+        open_pages, most = 0, 0
+        async def lookup():
+            nonlocal open_pages, most
+            async with pool.page():
+                open_pages += 1
+                most = max(most, open_pages)
+                await asyncio.sleep(0.01)
+                open_pages -= 1
+        await asyncio.gather(*(lookup() for _ in range(6)))
+        await pool.close()
+        return most, pool
+
+    most, pool = asyncio.run(main())
+    assert most == 2 and pool.stats['pages'] == 6
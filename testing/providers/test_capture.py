@@ -0,0 +1,84 @@
+import asyncio
+from .browser import BrowserPool, blocked_host, capture_response
+from .test_browser import fake_playwright
+
+class FakeRoute:
+    def __init__(self, url, resource_type):
+        self.request = type('Request', (), {'url': url, 'resource_type': resource_type})()
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = 'aborted'
+
+    async def continue_(self):
+        self.outcome = 'continued'
+
+def test_blocked_hosts_match_subdomains_only():
+    assert blocked_host('https://stats.g.doubleclick.net/collect') and blocked_host('https://yandex.ru/')
+    assert not blocked_host('https://notdoubleclick.net/') and not blocked_host('https://vidlink.pro/api')
+
+def test_heavy_resources_and_trackers_are_aborted(monkeypatch):
+    fake_playwright(monkeypatch)
+
+    async def routes(provider, requests):
+        pool = BrowserPool(browsers=1)
+        async with pool.page(provider) as page:
+            handled = [FakeRoute(url, kind) for url, kind in requests]
+            for route in handled: await page.context.handler(route)
+        await pool.close()
+        return [route.outcome for route in handled], pool.stats['blocked']
+
+    requests = [('https://vidlink.pro/api/b/movie/1', 'fetch'), ('https://vidlink.pro/poster.jpg', 'image'),
+                ('https://vidlink.pro/site.css', 'stylesheet'), ('https://www.googletagmanager.com/gtm.js', 'script')]
+    assert asyncio.run(routes('vidlink', requests)) == (['continued', 'aborted', 'aborted', 'aborted'], 3)
+    # onionflixer needs its stylesheet for the button it clicks
+    assert asyncio.run(routes('onionflixer', requests))[0] == ['continued', 'aborted', 'continued', 'aborted']
+
+class ResponseInfo:
+    def __init__(self, future):
+        self.future = future
+
+    @property
+    def value(self):
+        return self.future
+
+class FakeCapturePage:
+    # expect_response hands out the first response the predicate accepts
+    def __init__(self, responses, delay):
+        self.responses = responses
+        self.delay = delay
+
+    def expect_response(self, predicate, timeout):
+        page = self
+        class Waiter:
+            async def __aenter__(self):
+                self.future = asyncio.get_running_loop().create_future()
+                async def feed():
+                    for response in page.responses:
+                        await asyncio.sleep(page.delay)
+                        if predicate(response) and not self.future.done(): self.future.set_result(response)
+                self.feeder = asyncio.ensure_future(feed())
+                return ResponseInfo(self.future)
+            async def __aexit__(self, *exc):
+                return False
+        return Waiter()
+
+def test_capture_resolves_on_the_first_match():
+    async def main():
+        page = FakeCapturePage(['/ads', '/api/source?id=1', '/api/source?id=2'], delay=0.01)
+        clicked = []
+        async def action(): clicked.append(True)
+        started = asyncio.get_running_loop().time()
+        response = await capture_response(page, lambda url: '/api/source' in url, action, deadline=5)
+        return response, clicked, asyncio.get_running_loop().time() - started
+
+    response, clicked, elapsed = asyncio.run(main())
+    assert response == '/api/source?id=1' and clicked == [True] and elapsed < 1
+
+def test_capture_gives_up_at_the_deadline():
+    async def main():
+        page = FakeCapturePage(['/ads'] * 100, delay=0.01)
+        async def action(): pass
+        return await capture_response(page, lambda url: '/api/source' in url, action, deadline=0.1)
+
+    assert asyncio.run(main()) is None
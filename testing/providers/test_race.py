@@ -0,0 +1,47 @@
+import asyncio, sys
+from .race import ProviderStats, race
+from .streamcache import StreamCache
+
+# the package re-exports race() under the module's own name
+race_module = sys.modules[race.__module__]
+
+def use_fakes(monkeypatch, tmp_path, providers):
+    # providers: name -> async fetch(title); every playlist they return counts as playable
+    cache = StreamCache(str(tmp_path / 'streams.sqlite'))
+    async def playable(client, url, headers): return True
+    monkeypatch.setattr(race_module, 'get_stream_cache', lambda: cache)
+    monkeypatch.setattr(race_module, 'playable', playable)
+    for name, fetch in providers.items(): monkeypatch.setitem(race_module.PROVIDERS, name, fetch)
+    return cache
+
+def test_overlapping_races_share_a_cancelled_lookup(monkeypatch, tmp_path):
+    # race A wins with "fast" and cancels its "slow" lookup, which race B is waiting on too
+    runs = []
+    async def fast(title): return 'https://fast.example/a.m3u8'
+    async def slow(title):
+        runs.append(title['id'])
+        await asyncio.sleep(0.2)
+        return 'https://slow.example/a.m3u8'
+    cache = use_fakes(monkeypatch, tmp_path, {'fast': fast, 'slow': slow})
+
+    async def main():
+        first = asyncio.ensure_future(race('movie', 1, providers=['slow', 'fast'], stats=ProviderStats()))
+        await asyncio.sleep(0.05)
+        second = await race('movie', 1, providers=['slow'], stats=ProviderStats())
+        return await first, second
+
+    first, second = asyncio.run(main())
+    assert first['provider'] == 'fast'
+    assert second['provider'] == 'slow'
+    assert runs == [1]
+    assert cache.get('slow', 'movie', 1, 1, 1) == 'https://slow.example/a.m3u8'
+
+def test_cancelled_provider_counts_as_lost(monkeypatch, tmp_path):
+    async def gone(title): raise asyncio.CancelledError()
+    async def backup(title): return 'https://backup.example/a.m3u8'
+    use_fakes(monkeypatch, tmp_path, {'gone': gone, 'backup': backup})
+
+    stats = ProviderStats()
+    stats.entry('backup')['success'] = 0.0  # launch "gone" first
+    result = asyncio.run(race('movie', 2, providers=['gone', 'backup'], stats=stats))
+    assert result['provider'] == 'backup'
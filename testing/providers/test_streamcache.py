@@ -0,0 +1,80 @@
+import asyncio, base64, json, time
+from .streamcache import EXPIRY_MARGIN, StreamCache, token_expiry, ttl_for, urls_in
+
+def jwt(exp):
+    claims = base64.urlsafe_b64encode(json.dumps({'exp': exp}).encode()).decode().rstrip('=')
+    return f'eyJhbGciOiJIUzI1NiJ9.{claims}.c2ln'
+
+def vidfast_payload(expires):
+    # what vidfast's get_source hands back: the raw body of each source request
+    body = json.dumps({'url': f'https://cdn.example/hls/abc/master.m3u8?expires={int(expires)}', 'tracks': []})
+    return [body.replace('/', '\\/'), None, 'not found']
+
+def test_urls_are_found_in_text_and_structures():
+    assert urls_in('https://a.example/x.m3u8') == ['https://a.example/x.m3u8']
+    assert urls_in({'sources': [{'file': 'https://a.example/x.m3u8'}], 'name': 'A'}) == ['https://a.example/x.m3u8']
+    assert urls_in('{"file":"https:\\/\\/a.example\\/x.m3u8?t=1"}') == ['https://a.example/x.m3u8?t=1']
+    assert urls_in('playlist at https://a.example/x.m3u8, backup (https://b.example/y.m3u8).') == ['https://a.example/x.m3u8', 'https://b.example/y.m3u8']
+    assert urls_in('no urls here') == [] and urls_in(None) == []
+
+def test_expiry_comes_from_query_or_jwt():
+    assert token_expiry('https://a/x.m3u8?expires=2000000000') == 2000000000
+    assert token_expiry('https://a/x.m3u8?e=2000000000000') == 2000000000
+    assert token_expiry(f'https://a/x.m3u8?token={jwt(2000000000)}') == 2000000000
+    assert token_expiry('https://a/x.m3u8?t=12') is None
+
+def test_text_payloads_get_their_token_ttl():
+    now = time.time()
+    assert abs(ttl_for('vidfast', vidfast_payload(now + 600), now) - (600 - EXPIRY_MARGIN)) < 1
+    # already expired: not worth storing
+    cache = StreamCache(':memory:')
+    assert not cache.put('vidfast', 'movie', 1, None, None, vidfast_payload(now + 30))
+    assert cache.get('vidfast', 'movie', 1) is None
+
+def test_revoking_a_url_inside_a_text_payload_drops_the_entry():
+    cache = StreamCache(':memory:')
+    payload = vidfast_payload(time.time() + 3600)
+    assert cache.put('vidfast', 'tv', 7, 1, 2, payload)
+    assert cache.get('vidfast', 'tv', 7, 1, 2) == payload
+
+    cache.revoke(urls_in(payload)[0])
+    assert cache.get('vidfast', 'tv', 7, 1, 2) is None and cache.stats['revoked'] == 1
+
+def test_concurrent_misses_share_one_fetch():
+    calls = []
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'file': 'https://a.example/x.m3u8'}
+
+    async def main():
+        cache = StreamCache(':memory:')
+        results = await asyncio.gather(*(cache.resolve('vidlink', 'movie', 3, None, None, fetch) for _ in range(3)))
+        again = await cache.resolve('vidlink', 'movie', 3, None, None, fetch)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert len(calls) == 1 and results == [again] * 3
+
+def test_revoked_variant_or_segment_drops_its_master():
+    cache = StreamCache(':memory:')
+    master = 'https://cdn.example/hls/abc/master.m3u8?token=x'
+    assert cache.put('vidlink', 'movie', 5, None, None, {'file': master}, ttl=3600)
+    assert cache.put('vidlink', 'movie', 6, None, None, {'file': 'https://cdn.example/hls/abd/master.m3u8'}, ttl=3600)
+    assert cache.put('vidlink', 'movie', 7, None, None, {'file': 'https://cdn.example/master.m3u8?id=7'}, ttl=3600)
+
+    cache.revoke('https://cdn.example/hls/abc/720/seg-12.ts?token=x')
+    assert cache.get('vidlink', 'movie', 5) is None
+    # a sibling directory, or a master at the root of the host, isn't caught by someone else's segment
+    assert cache.get('vidlink', 'movie', 6) is not None and cache.get('vidlink', 'movie', 7) is not None
+
+def test_old_cache_files_gain_the_prefix_column(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'streams.sqlite')
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE stream_urls (url TEXT, provider TEXT, type TEXT, id TEXT, season INTEGER, episode INTEGER)')
+
+    cache = StreamCache(path)
+    assert cache.put('vidlink', 'movie', 5, None, None, {'file': 'https://cdn.example/hls/abc/master.m3u8'}, ttl=3600)
+    cache.revoke('https://cdn.example/hls/abc/720/index.m3u8')
+    assert cache.get('vidlink', 'movie', 5) is None
@@ -0,0 +1,67 @@
+import asyncio, base64, json
+import httpx
+import pytest
+from Crypto.Cipher import AES
+from . import vidsrcco
+from .vidsrcco import PayloadSplitter, decrypt, derive_key
+
+SOURCE = {'source': 'https://cdn.example/hls/master.m3u8', 'tracks': [{'file': 'https://cdn.example/en.vtt'}] * 4000}
+
+def encrypt(plaintext, password='pw', salt='0011223344556677', iv='00112233445566778899aabbccddeeff', iterations=1000):
+    key = derive_key(password, bytes.fromhex(salt), iterations)
+    padding = AES.block_size - len(plaintext) % AES.block_size
+    data = AES.new(key, AES.MODE_CBC, bytes.fromhex(iv)).encrypt(plaintext + bytes([padding]) * padding)
+    return {'algorithm': 'aes-256-cbc', 'iterations': iterations, 'salt': salt, 'iv': iv, 'key': password, 'encryptedData': base64.b64encode(data).decode()}
+
+def body(payload, key_last=False, escape=False):
+    # the server's JSON, optionally with the key fields after encryptedData and "/" escaped
+    order = ['encryptedData'] + [name for name in payload if name != 'encryptedData'] if key_last else list(payload)
+    text = json.dumps({name: payload[name] for name in order})
+    return text.replace('/', '\\/').encode() if escape else text.encode()
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def test_decrypt_round_trip():
+    payload = encrypt(json.dumps(SOURCE).encode())
+    assert json.loads(decrypt(payload)) == SOURCE
+    with pytest.raises(ValueError): decrypt(dict(payload, encryptedData=payload['encryptedData'][:-4]))
+
+@pytest.mark.parametrize('size', [1, 5, 7, 4096])
+@pytest.mark.parametrize('key_last, escape', [(False, False), (True, False), (False, True)])
+def test_splitter_streams_the_base64_out(size, key_last, escape):
+    payload = encrypt(json.dumps(SOURCE).encode())
+    splitter = PayloadSplitter()
+    text = b''.join(splitter.feed(chunk) for chunk in split(body(payload, key_last, escape), size))
+    assert text.decode() == payload['encryptedData']
+    assert splitter.fields() == dict(payload, encryptedData='')
+
+def serve(monkeypatch, content):
+    chunks = []
+    async def stream():
+        for chunk in split(content, 1000):
+            chunks.append(chunk)
+            yield chunk
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=stream()))
+    client = httpx.AsyncClient
+    monkeypatch.setattr(vidsrcco.httpx, 'AsyncClient', lambda **kwargs: client(transport=transport, **kwargs))
+    return chunks
+
+@pytest.mark.parametrize('key_last', [False, True])
+def test_get_server_decrypts_while_streaming(monkeypatch, key_last):
+    payload = encrypt(json.dumps(SOURCE).encode())
+    chunks = serve(monkeypatch, body(payload, key_last, escape=True))
+    feeds = []
+    feed = vidsrcco.StreamDecryptor.feed
+    def counting(self, chunk):
+        feeds.append(len(chunks))
+        return feed(self, chunk)
+    monkeypatch.setattr(vidsrcco.StreamDecryptor, 'feed', counting)
+
+    assert asyncio.run(vidsrcco.get_server('movie', 1)) == SOURCE
+    # with the key up front decryption starts on the first chunks, otherwise only once the body is in
+    assert (feeds[0] < len(chunks)) == (not key_last)
+
+def test_get_server_passes_plain_responses_through(monkeypatch):
+    serve(monkeypatch, json.dumps({'source': SOURCE['source']}).encode())
+    assert asyncio.run(vidsrcco.get_server('tv', 1, 1, 2)) == {'source': SOURCE['source']}
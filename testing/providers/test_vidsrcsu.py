@@ -0,0 +1,61 @@
+import asyncio
+import httpx
+import pytest
+from .vidsrcsu import ScriptScanner, get_many, get_servers, servers_in
+
+SCRIPT = """
+    const servers = [
+        { name: 'a', url: 'https://one.example/abc123.m3u8' },
+        { name: 'b', url: "https://two.example/def456.m3u8" },
+    ];
+"""
+PAGE = ('<html><head><script>var ignored = "url: \'https://head.example/no.m3u8\'";</script></head>'
+        f'<body class="player"><div></div><SCRIPT type="text/javascript">{SCRIPT}</script >'
+        '<script>var later = 1;</script>' + '<p>padding</p>' * 5000 + '</body></html>')
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize('size', [1, 3, 17, 1024, len(PAGE)])
+def test_scanner_finds_the_first_body_script_across_chunks(size):
+    scanner = ScriptScanner()
+    fed = 0
+    for chunk in split(PAGE, size):
+        scanner.feed(chunk)
+        fed += len(chunk)
+        if scanner.done: break
+    assert scanner.script == SCRIPT
+    # nothing after the closing tag is needed
+    assert fed < PAGE.index('var later') + size
+
+def test_servers_are_numbered_in_page_order():
+    assert servers_in(SCRIPT) == [
+        {'name': 'Server 1', 'url': 'https://one.example/abc123.m3u8', 'stem': 'https://one.example/abc123'},
+        {'name': 'Server 2', 'url': 'https://two.example/def456.m3u8', 'stem': 'https://two.example/def456'},
+    ]
+    assert servers_in(None) == []
+
+def site():
+    sent = {}
+    async def handler(request):
+        if request.url.path.endswith('/404'): return httpx.Response(404)
+        async def stream():
+            for chunk in split(PAGE.encode(), 512):
+                sent[request.url.path] = sent.get(request.url.path, 0) + len(chunk)
+                yield chunk
+        return httpx.Response(200, content=stream())
+    return httpx.MockTransport(handler), sent
+
+def test_download_stops_once_the_script_is_read():
+    transport, sent = site()
+    async def main():
+        async with httpx.AsyncClient(transport=transport) as client: return await get_servers('tv', 1, 2, 3, client=client)
+    assert [server['name'] for server in asyncio.run(main())] == ['Server 1', 'Server 2']
+    assert sent['/embed/tv/1/2/3'] < len(PAGE) // 4
+
+def test_many_lookups_keep_input_order(monkeypatch):
+    transport, _ = site()
+    client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, 'AsyncClient', lambda **kwargs: client(transport=transport, **kwargs))
+    results = asyncio.run(get_many([('movie', 1, None, None), ('movie', 404, None, None), ('tv', 2, 1, 1)], concurrency=2))
+    assert [len(servers) for servers in results] == [2, 0, 2]
@@ -0,0 +1,25 @@
+import json
+import httpx
+from .browser import DEADLINE, capture_response, get_pool
+
+def embed_url(type, id, season=1, episode=1):
+    if type == 'movie': return f"https://vidfast.pro/movie/{id}?autoPlay=false"
+    return f"https://vidfast.pro/tv/{id}/{season}/{episode}?autoPlay=false"
+
+def is_sources(response):
+    return 'YDGUTEY' in response.url and response.request.method == 'POST'
+
+async def get_data(type, id, season=1, episode=1, pool=None, deadline=DEADLINE):
+    async with (pool or get_pool()).page('vidfast') as page:
+        url = embed_url(type, id, season, episode)
+        response = await capture_response(page, is_sources, lambda: page.goto(url, wait_until='commit'), deadline)
+        if response is None: return None, None
+
+        url_parts = response.url.split('YDGUTEY')
+        return json.loads(await response.text()), f'{url_parts[0]}xo8XtbY-sVen/'
+
+async def get_source(sources, source_name, starter):
+    async with httpx.AsyncClient() as client:
+        for source in sources:
+            if source['name'] == source_name:
+                return (await client.post(f"{starter}{source['data']}")).text
@@ -0,0 +1,13 @@
+import json
+from .browser import DEADLINE, capture_response, get_pool
+
+def embed_url(type, id, season=1, episode=1):
+    if type == 'movie': return f"https://vidlink.pro/movie/{id}?autoplay=true"
+    return f"https://vidlink.pro/tv/{id}/{season}/{episode}?autoplay=true"
+
+async def get_data(type, id, season=1, episode=1, pool=None, deadline=DEADLINE):
+    async with (pool or get_pool()).page('vidlink') as page:
+        url = embed_url(type, id, season, episode)
+        is_sources = lambda response: f'/api/b/{type}' in response.url
+        response = await capture_response(page, is_sources, lambda: page.goto(url, wait_until='commit'), deadline)
+        return json.loads(await response.text()) if response else None
@@ -0,0 +1,28 @@
+import asyncio
+import httpx
+from .browser import DEADLINE, capture_response, get_pool
+
+SOURCE_HEADERS = {
+    'Origin': 'https://vidsrc.cc',
+    'Referer': 'https://vidsrc.cc',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+def embed_url(type, id, season=0, episode=0):
+    if type == 'movie': return f"https://vidsrc.cc/v3/embed/movie/{id}?autoPlay=true"
+    return f"https://vidsrc.cc/v2/embed/tv/{id}/{season}/{episode}?autoPlay=true"
+
+def is_servers(response):
+    return "https://vidsrc.cc/api/" in response.url and "/servers?type=" in response.url
+
+async def get_servers(type, id, season=0, episode=0, pool=None, deadline=DEADLINE):
+    async with (pool or get_pool()).page('vidsrccc') as page:
+        url = embed_url(type, id, season, episode)
+        response = await capture_response(page, is_servers, lambda: page.goto(url, wait_until='commit'), deadline)
+        return await response.json() if response else None
+
+async def get_sources(servers):
+    async with httpx.AsyncClient(headers=SOURCE_HEADERS) as client:
+        hashes = [source['hash'] for source in (servers or {}).get('data', []) if 'hash' in source]
+        responses = await asyncio.gather(*(client.get(f"https://vidsrc.cc/api/source/{hash}?opensubtiles=true") for hash in hashes))
+        return [response.text for response in responses]
@@ -0,0 +1,167 @@
+import base64, binascii, json, re
+from functools import lru_cache
+import httpx
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import PBKDF2
+
+# Payloads look like {"algorithm": "aes-256-cbc", "iterations", "salt", "iv", "key", "encryptedData"}; salt/iv are hex,
+# encryptedData is base64. The same password/salt pair comes back for every episode, so the key stretch is memoized.
+BLOCK_SIZE = AES.block_size
+READ_SIZE = 64 * 1024
+
+COOKIES = {
+    'OptanonConsent': 'isGpcEnabled=0&datestamp=Wed+Apr+30+2025+01%3A06%3A32+GMT%2B0200+(Central+European+Summer+Time)&version=202310.2.0&browserGpcFlag=0&isIABGlobal=false&hosts=&landingPath=NotLandingPage&groups=C0004%3A0%2CC0003%3A0%2CC0002%3A0%2CC0001%3A1&AwaitingReconsent=false'
+}
+
+class PaddingError(ValueError):
+    pass
+
+@lru_cache(maxsize=1024)
+def derive_key(password, salt, iterations):
+    return PBKDF2(password, salt, dkLen=32, count=iterations, hmac_hash_module=SHA256)
+
+def unpad(block):
+    padding_len = block[-1] if block else 0
+    if not 1 <= padding_len <= BLOCK_SIZE or block[-padding_len:] != bytes([padding_len]) * padding_len:
+        raise PaddingError("Invalid PKCS#7 padding")
+    return block[:-padding_len]
+
+def is_encrypted(payload):
+    return isinstance(payload, dict) and 'encryptedData' in payload
+
+def cipher_for(payload):
+    if payload.get('algorithm', 'aes-256-cbc').lower() != 'aes-256-cbc': raise ValueError(f"Unsupported algorithm: {payload['algorithm']}")
+    key = derive_key(payload['key'], bytes.fromhex(payload['salt']), int(payload['iterations']))
+    return AES.new(key, AES.MODE_CBC, bytes.fromhex(payload['iv']))
+
+class StreamDecryptor:
+    # base64 text (str or bytes) in as it arrives, plaintext out; the last ciphertext block is held back
+    # until finish() so its padding can be checked
+    def __init__(self, payload):
+        self.cipher = cipher_for(payload)
+        self.text = b''
+        self.ciphertext = b''
+
+    def feed(self, chunk):
+        self.text += (chunk.encode('ascii') if isinstance(chunk, str) else chunk).replace(b'\n', b'').replace(b'\r', b'')
+        usable = len(self.text) - len(self.text) % 4
+        try: self.ciphertext += base64.b64decode(self.text[:usable], validate=True)
+        except binascii.Error as e: raise ValueError(f"Invalid base64 in encryptedData: {e}")
+        self.text = self.text[usable:]
+
+        ready = len(self.ciphertext) - len(self.ciphertext) % BLOCK_SIZE
+        if ready <= BLOCK_SIZE: return b''
+        ready = ready - BLOCK_SIZE if ready == len(self.ciphertext) else ready
+        plaintext = self.cipher.decrypt(self.ciphertext[:ready])
+        self.ciphertext = self.ciphertext[ready:]
+        return plaintext
+
+    def finish(self):
+        if self.text or not self.ciphertext or len(self.ciphertext) % BLOCK_SIZE:
+            raise ValueError("encryptedData is not a whole number of AES blocks")
+        return unpad(self.cipher.decrypt(self.ciphertext))
+
+def decrypt_stream(payload, chunks=None):
+    # chunks default to slicing payload['encryptedData']
+    decryptor = StreamDecryptor(payload)
+    if chunks is None:
+        data = payload['encryptedData']
+        chunks = (data[i:i + READ_SIZE] for i in range(0, len(data), READ_SIZE))
+    for chunk in chunks:
+        plaintext = decryptor.feed(chunk)
+        if plaintext: yield plaintext
+    yield decryptor.finish()
+
+ENCRYPTED_DATA = re.compile(rb'"encryptedData"\s*:\s*"')
+
+class PayloadSplitter:
+    # splits a server response as it streams: the encryptedData string goes out in pieces (JSON escapes undone),
+    # everything around it is kept so the small fields can be parsed on their own
+    def __init__(self):
+        self.head = b''
+        self.tail = b''
+        self.value = None        # undecoded part of the encryptedData string, None until it starts
+        self.closed = False
+
+    def feed(self, chunk):
+        # -> base64 text that is ready
+        if self.closed:
+            self.tail += chunk
+            return b''
+        if self.value is None:
+            self.head += chunk
+            match = ENCRYPTED_DATA.search(self.head)
+            if not match: return b''
+            self.head, chunk = self.head[:match.end() - 1], self.head[match.end():]
+            self.value = b''
+
+        value = self.value + chunk
+        end = next((index for index in iter_quotes(value) if not escaped(value, index)), None)
+        if end is not None:
+            self.closed, self.tail = True, value[end + 1:]
+            value, self.value = value[:end], b''
+        else:
+            # an escape split across chunks waits for the rest of it
+            cut = value.rfind(b'\\', max(len(value) - 6, 0))
+            if cut != -1 and len(value) - cut < (6 if value[cut + 1:cut + 2] == b'u' else 2): value, self.value = value[:cut], value[cut:]
+            else: self.value = b''
+        return json.loads(b'"' + value + b'"').encode('ascii') if b'\\' in value else value
+
+    def fields(self, complete=True):
+        # -> the response with encryptedData emptied; before the end only what preceded encryptedData is known
+        if self.value is None: return json.loads(self.head)
+        return json.loads(self.head + b'""' + (self.tail if complete else b'}'))
+
+def iter_quotes(value):
+    index = value.find(b'"')
+    while index != -1:
+        yield index
+        index = value.find(b'"', index + 1)
+
+def escaped(value, index):
+    backslashes = 0
+    while index - backslashes > 0 and value[index - backslashes - 1:index - backslashes] == b'\\': backslashes += 1
+    return backslashes % 2 == 1
+
+def decrypt(payload):
+    return b''.join(decrypt_stream(payload)).decode('utf-8')
+
+def decrypt_many(payloads):
+    # one result per payload, None where it didn't decrypt; payloads sharing a key derive it once
+    results = []
+    for payload in payloads:
+        try: results.append(decrypt(payload))
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            print(f"Could not decrypt payload: {e}")
+            results.append(None)
+    return results
+
+def server_url(type, id, season=1, episode=1, server=1):
+    if type == 'movie': return f"https://player.vidsrc.co/api/server?id={id}&sr={server}"
+    return f"https://player.vidsrc.co/api/server?id={id}&sr={server}&ep={episode}&ss={season}"
+
+async def get_server(type, id, season=1, episode=1, server=1):
+    # the body is decrypted while it downloads; if the key fields only come after encryptedData, the base64 waits
+    async with httpx.AsyncClient(cookies=COOKIES, follow_redirects=True) as client:
+        async with client.stream('GET', server_url(type, id, season, episode, server)) as response:
+            response.raise_for_status()
+            splitter = PayloadSplitter()
+            decryptor, backlog, plaintext = None, [], []
+            async for chunk in response.aiter_bytes(READ_SIZE):
+                backlog.append(splitter.feed(chunk))
+                if decryptor is None and splitter.value is not None:
+                    try: decryptor = StreamDecryptor(splitter.fields(complete=False))
+                    except (ValueError, KeyError): continue
+                if decryptor is not None:
+                    plaintext += [decryptor.feed(part) for part in backlog]
+                    backlog = []
+
+    data = splitter.fields()
+    if not is_encrypted(data): return data
+    if decryptor is None:
+        decryptor = StreamDecryptor(data)
+        plaintext += [decryptor.feed(part) for part in backlog]
+    text = b''.join(plaintext + [decryptor.finish()]).decode('utf-8')
+    try: return json.loads(text)
+    except ValueError: return text
@@ -0,0 +1,75 @@
+import asyncio, re
+import httpx
+
+# The server list lives in the first <script> inside <body>. The page is scanned as it downloads and the
+# connection is dropped as soon as that script closes, so neither the rest of the HTML nor a DOM is ever built.
+PLAYLIST_URL = re.compile(r'url:\s*[\'"]((https?://[^/]+/[^/\'"]+)\.m3u8)[\'"]')
+BODY_OPEN = re.compile(r'<body\b[^>]*>', re.I)
+SCRIPT_OPEN = re.compile(r'<script\b[^>]*>', re.I)
+SCRIPT_CLOSE = re.compile(r'</script\s*>', re.I)
+CONCURRENCY = 8
+
+def embed_url(type, id, season=1, episode=1):
+    if type == 'movie': return f"https://vidsrc.su/embed/movie/{id}"
+    return f"https://vidsrc.su/embed/tv/{id}/{season}/{episode}"
+
+class ScriptScanner:
+    # feed() text as it arrives; done once the first body script has closed, script holds its content
+    def __init__(self):
+        self.buffer = ''
+        self.state = 'body'
+        self.script = None
+
+    @property
+    def done(self):
+        return self.state == 'done'
+
+    def feed(self, text):
+        # inside the script only the new text (plus enough overlap for a split closing tag) is searched again
+        start = max(len(self.buffer) - 16, 0) if self.state == 'content' else 0
+        self.buffer += text
+        while not self.done:
+            pattern = {'body': BODY_OPEN, 'script': SCRIPT_OPEN, 'content': SCRIPT_CLOSE}[self.state]
+            match = pattern.search(self.buffer, start)
+            start = 0
+            if match is None:
+                # a tag can straddle two chunks; outside the script only a short tail is worth keeping
+                if self.state != 'content': self.buffer = self.buffer[-256:]
+                return
+
+            if self.state == 'content':
+                self.script = self.buffer[:match.start()]
+                self.buffer = ''
+                self.state = 'done'
+            else:
+                self.buffer = self.buffer[match.end():]
+                self.state = 'script' if self.state == 'body' else 'content'
+
+def servers_in(script):
+    return [{'name': f"Server {index}", 'url': full_url, 'stem': stem} for index, (full_url, stem) in enumerate(PLAYLIST_URL.findall(script or ''), 1)]
+
+async def scan(client, url):
+    scanner = ScriptScanner()
+    async with client.stream('GET', url) as response:
+        async for text in response.aiter_text():
+            scanner.feed(text)
+            if scanner.done: break
+    return scanner.script
+
+async def get_servers(type, id, season=1, episode=1, client=None):
+    if client is not None: return servers_in(await scan(client, embed_url(type, id, season, episode)))
+    async with httpx.AsyncClient(follow_redirects=True) as client:
+        return servers_in(await scan(client, embed_url(type, id, season, episode)))
+
+async def get_many(titles, concurrency=CONCURRENCY):
+    # titles: (type, id, season, episode) tuples; one shared client, results in input order, [] where a lookup failed
+    slots = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(follow_redirects=True) as client:
+        async def lookup(title):
+            async with slots:
+                try: return await get_servers(*title, client=client)
+                except httpx.HTTPError as e:
+                    print(f"vidsrc.su lookup {title} failed: {e}")
+                    return []
+
+        return await asyncio.gather(*(lookup(title) for title in titles))
@@ -0,0 +1,12 @@
+import asyncio
+from providers import get_pool
+from providers.race import race, shared_stats
+
+async def main():
+    try:
+        print(await race('tv', 66573, 1, 1))
+        print(await race('movie', 123, collect=True))
+        print(shared_stats.snapshot())
+    finally: await get_pool().close()
+
+asyncio.run(main())